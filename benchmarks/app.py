@@ -0,0 +1,157 @@
+"""Benchmark application and in-process ASGI client."""
+
+import asyncio
+import dataclasses
+import typing
+
+from starlette.applications import Starlette
+from starlette.authentication import AuthCredentials, AuthenticationBackend, BaseUser
+from starlette.middleware import Middleware
+from starlette.middleware.authentication import AuthenticationMiddleware
+from starlette.middleware.sessions import SessionMiddleware
+from starlette.requests import HTTPConnection, Request
+from starlette.responses import PlainTextResponse, Response
+from starlette.routing import Route
+from starlette.types import ASGIApp, Message
+from starsessions import InMemoryStore, SessionAutoloadMiddleware, SessionMiddleware as StarsessionsMiddleware
+
+from starlette_auth import (
+    BackendCondition,
+    confirm_login,
+    login,
+    LoginRequiredMiddleware,
+    logout,
+    MultiBackend,
+    SessionBackend,
+)
+
+SECRET_KEY = "benchmark"
+SessionKind = typing.Literal["cookie", "starsessions"]
+
+
+@dataclasses.dataclass
+class User(BaseUser):
+    username: str
+
+    @property
+    def identity(self) -> str:
+        return self.username
+
+    @property
+    def is_authenticated(self) -> bool:
+        return True
+
+    @property
+    def display_name(self) -> str:
+        return self.username
+
+
+class TokenBackend(AuthenticationBackend):
+    condition = BackendCondition(header="authorization")
+
+    async def authenticate(self, conn: HTTPConnection) -> tuple[AuthCredentials, BaseUser] | None:
+        if conn.headers.get("authorization") == "Bearer token":
+            return AuthCredentials(), User(username="token")
+        return None
+
+
+def create_user_loader(latency: float) -> typing.Callable[[HTTPConnection, str], typing.Awaitable[BaseUser | None]]:
+    async def user_loader(conn: HTTPConnection, user_id: str) -> BaseUser | None:
+        if latency:
+            await asyncio.sleep(latency)
+        return User(username=user_id)
+
+    return user_loader
+
+
+async def login_view(request: Request) -> Response:
+    await login(request, User(username=request.query_params.get("username", "root")), secret_key=SECRET_KEY)
+    return PlainTextResponse("ok")
+
+
+async def logout_view(request: Request) -> Response:
+    await logout(request)
+    return PlainTextResponse("ok")
+
+
+async def confirm_view(request: Request) -> Response:
+    confirm_login(request)
+    return PlainTextResponse("ok")
+
+
+async def index_view(request: Request) -> Response:
+    return PlainTextResponse(request.user.identity)
+
+
+def create_app(session: SessionKind = "cookie", loader_latency: float = 0) -> Starlette:
+    """Create application protected by LoginRequiredMiddleware."""
+    session_middleware = (
+        [Middleware(SessionMiddleware, secret_key=SECRET_KEY)]
+        if session == "cookie"
+        else [Middleware(StarsessionsMiddleware, store=InMemoryStore()), Middleware(SessionAutoloadMiddleware)]
+    )
+    return Starlette(
+        routes=[
+            Route("/", index_view),
+            Route("/login", login_view, name="login"),
+            Route("/logout", logout_view),
+            Route("/confirm", confirm_view),
+        ],
+        middleware=[
+            *session_middleware,
+            Middleware(
+                AuthenticationMiddleware,
+                backend=MultiBackend(
+                    [TokenBackend(), SessionBackend(create_user_loader(loader_latency), secret_key=SECRET_KEY)]
+                ),
+            ),
+            Middleware(LoginRequiredMiddleware, public_paths=["/login"]),
+        ],
+    )
+
+
+@dataclasses.dataclass
+class ASGIResponse:
+    status: int
+    headers: list[tuple[bytes, bytes]]
+    body: bytes
+
+    def get_cookie(self) -> bytes | None:
+        for name, value in self.headers:
+            if name == b"set-cookie":
+                return value.split(b";", 1)[0]
+        return None
+
+
+async def call_app(
+    app: ASGIApp, path: str, *, query_string: bytes = b"", headers: list[tuple[bytes, bytes]] | None = None
+) -> ASGIResponse:
+    """Send one GET request to the application without network and threads."""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": query_string,
+        "headers": [(b"host", b"testserver"), *(headers or [])],
+        "server": ("testserver", 80),
+        "client": ("127.0.0.1", 50000),
+    }
+    response = ASGIResponse(status=0, headers=[], body=b"")
+
+    async def receive() -> Message:
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message: Message) -> None:
+        if message["type"] == "http.response.start":
+            response.status = message["status"]
+            response.headers = list(message.get("headers", []))
+        elif message["type"] == "http.response.body":
+            response.body += message.get("body", b"")
+
+    await app(scope, receive, send)
+    return response
@@ -0,0 +1,227 @@
+"""Load test of the authentication stack with many concurrent virtual clients.
+
+Every client keeps its own cookie jar and performs a random mix of actions against the application
+in the same process: login, browse protected pages, confirm login and logout.
+No network is used, so the load test runs anywhere, including CI.
+
+Usage:
+    python -m benchmarks.load                                  # 1000 clients, 20 requests each
+    python -m benchmarks.load -c 5000 -r 10 --latency 0.002    # more clients, slow user loader
+    python -m benchmarks.load --session starsessions           # server side sessions
+    python -m benchmarks.load --mix browse=90,logout=10        # custom action weights
+    python -m benchmarks.load --max-errors 0 --max-lag-ms 500  # exit with error when limits are exceeded
+"""
+
+import argparse
+import asyncio
+import dataclasses
+import random
+import statistics
+import sys
+import time
+import typing
+
+from starlette.types import ASGIApp
+
+from benchmarks.app import ASGIResponse, call_app, create_app, SessionKind
+
+Action = typing.Literal["login", "browse", "confirm", "logout"]
+DEFAULT_MIX: dict[Action, float] = {"login": 10, "browse": 70, "confirm": 10, "logout": 10}
+
+
+class CookieJar:
+    """Minimal cookie storage, enough for session cookies of the test application."""
+
+    def __init__(self) -> None:
+        self.cookies: dict[str, str] = {}
+
+    def update(self, response: ASGIResponse) -> None:
+        for name, value in response.headers:
+            if name != b"set-cookie":
+                continue
+            cookie, *attributes = value.decode("latin-1").split(";")
+            cookie_name, _, cookie_value = cookie.strip().partition("=")
+            expired = any(attribute.strip().lower() in {"max-age=0", "max-age=-1"} for attribute in attributes)
+            if expired or not cookie_value.strip('"'):
+                self.cookies.pop(cookie_name, None)
+            else:
+                self.cookies[cookie_name] = cookie_value
+
+    def headers(self) -> list[tuple[bytes, bytes]]:
+        if not self.cookies:
+            return []
+        return [(b"cookie", "; ".join(f"{name}={value}" for name, value in self.cookies.items()).encode("latin-1"))]
+
+
+@dataclasses.dataclass
+class Report:
+    clients: int
+    requests: int = 0
+    errors: int = 0
+    elapsed: float = 0
+    latencies: dict[str, list[int]] = dataclasses.field(default_factory=dict)
+    loop_lag: list[float] = dataclasses.field(default_factory=list)
+
+    @property
+    def throughput(self) -> float:
+        return self.requests / self.elapsed if self.elapsed else 0.0
+
+    def record(self, action: str, duration_ns: int) -> None:
+        self.requests += 1
+        self.latencies.setdefault(action, []).append(duration_ns)
+
+
+def _percentiles(values: typing.Sequence[float]) -> tuple[float, float, float, float]:
+    """Return p50, p95, p99 and max."""
+    if len(values) < 2:
+        value = values[0] if values else 0.0
+        return value, value, value, value
+    quantiles = statistics.quantiles(values, n=100, method="inclusive")
+    return quantiles[49], quantiles[94], quantiles[98], max(values)
+
+
+class VirtualClient:
+    def __init__(self, app: ASGIApp, report: Report, rng: random.Random, mix: dict[Action, float]) -> None:
+        self.app = app
+        self.report = report
+        self.rng = rng
+        self.actions = list(mix)
+        self.weights = list(mix.values())
+        self.cookies = CookieJar()
+        self.logged_in = False
+
+    async def request(self, action: Action, path: str, query_string: bytes = b"") -> ASGIResponse:
+        started_at = time.perf_counter_ns()
+        response = await call_app(self.app, path, query_string=query_string, headers=self.cookies.headers())
+        self.report.record(action, time.perf_counter_ns() - started_at)
+        self.cookies.update(response)
+        return response
+
+    async def step(self) -> None:
+        action: Action = self.rng.choices(self.actions, self.weights)[0]
+        if action != "browse" and not self.logged_in:
+            action = "login"  # anonymous clients can only log in or hit the login redirect
+
+        if action == "login":
+            username = f"user{self.rng.randrange(1_000_000)}".encode()
+            response = await self.request(action, "/login", b"username=" + username)
+            self.logged_in = response.status == 200
+            expected = 200
+        elif action == "browse":
+            response = await self.request(action, "/", b"page=1")
+            expected = 200 if self.logged_in else 302
+        elif action == "confirm":
+            response = await self.request(action, "/confirm")
+            expected = 200
+        else:
+            response = await self.request(action, "/logout")
+            self.logged_in = False
+            expected = 200
+
+        if response.status != expected:
+            self.report.errors += 1
+
+    async def run(self, requests: int, think_time: float) -> None:
+        for _ in range(requests):
+            await self.step()
+            await asyncio.sleep(think_time)  # also lets other clients run when the app never suspends
+
+
+async def monitor_loop_lag(report: Report, interval: float, stop: asyncio.Event) -> None:
+    """Measure how late the event loop wakes up a sleeping task."""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected_at = loop.time() + interval
+        await asyncio.sleep(interval)
+        report.loop_lag.append(max(0.0, loop.time() - expected_at))
+
+
+async def run(
+    *,
+    clients: int,
+    requests: int,
+    session: SessionKind,
+    loader_latency: float,
+    mix: dict[Action, float],
+    think_time: float = 0,
+    seed: int = 0,
+    lag_interval: float = 0.01,
+) -> Report:
+    app = create_app(session, loader_latency=loader_latency)
+    report = Report(clients=clients)
+    rng = random.Random(seed)
+    virtual_clients = [VirtualClient(app, report, random.Random(rng.random()), mix) for _ in range(clients)]
+
+    stop = asyncio.Event()
+    monitor = asyncio.create_task(monitor_loop_lag(report, lag_interval, stop))
+    started_at = time.perf_counter()
+    await asyncio.gather(*[client.run(requests, think_time) for client in virtual_clients])
+    report.elapsed = time.perf_counter() - started_at
+    stop.set()
+    await monitor
+    return report
+
+
+def print_report(report: Report, session: str, loader_latency: float) -> None:
+    print(f"session={session} clients={report.clients} loader latency={loader_latency * 1000:.1f}ms")
+    print(f"requests={report.requests} errors={report.errors} elapsed={report.elapsed:.2f}s")
+    print(f"throughput={report.throughput:.0f} req/sec\n")
+    print(f"{'action':<10} {'count':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    all_latencies = [value for values in report.latencies.values() for value in values]
+    for action, latencies in [("all", all_latencies), *sorted(report.latencies.items())]:
+        p50, p95, p99, maximum = (value / 1_000_000 for value in _percentiles(latencies))
+        print(f"{action:<10} {len(latencies):>8} {p50:>9.2f} {p95:>9.2f} {p99:>9.2f} {maximum:>9.2f}")
+
+    p50, p95, p99, maximum = (value * 1000 for value in _percentiles(report.loop_lag))
+    print(f"\nevent loop lag: p50={p50:.2f}ms p99={p99:.2f}ms max={maximum:.2f}ms")
+
+
+def parse_mix(value: str) -> dict[Action, float]:
+    mix: dict[Action, float] = {}
+    for item in value.split(","):
+        action, _, weight = item.partition("=")
+        if action not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"Unknown action: {action}")
+        mix[action] = float(weight or 1)
+    return mix
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-c", "--clients", type=int, default=1000, help="number of virtual clients")
+    parser.add_argument("-r", "--requests", type=int, default=20, help="requests per client")
+    parser.add_argument("--session", choices=["cookie", "starsessions"], default="cookie")
+    parser.add_argument("--latency", type=float, default=0, help="simulated user loader latency, in seconds")
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX, help="action weights, e.g. browse=80,login=20")
+    parser.add_argument("--think", type=float, default=0, help="pause between requests of a client, in seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-errors", type=int, help="exit with error when more requests failed")
+    parser.add_argument("--max-lag-ms", type=float, help="exit with error when max event loop lag is higher")
+    args = parser.parse_args()
+
+    report = asyncio.run(
+        run(
+            clients=args.clients,
+            requests=args.requests,
+            session=args.session,
+            loader_latency=args.latency,
+            mix=args.mix,
+            think_time=args.think,
+            seed=args.seed,
+        )
+    )
+    print_report(report, args.session, args.latency)
+
+    failures = []
+    if args.max_errors is not None and report.errors > args.max_errors:
+        failures.append(f"{report.errors} errors, allowed {args.max_errors}")
+    if args.max_lag_ms is not None and (lag := max(report.loop_lag, default=0) * 1000) > args.max_lag_ms:
+        failures.append(f"event loop lag {lag:.1f}ms, allowed {args.max_lag_ms:.1f}ms")
+    if failures:
+        print("\nFailed:", *failures, sep="\n  ", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,175 @@
+"""Benchmarks for authentication hot paths.
+
+Usage:
+    python -m benchmarks.run                                # run and print results
+    python -m benchmarks.run --json base.json               # store results, e.g. of the base branch
+    python -m benchmarks.run --baseline base.json --compare # fail if ops/sec dropped by more than threshold
+
+Absolute numbers depend on the machine, compare only results measured on the same machine.
+"""
+
+import argparse
+import asyncio
+import dataclasses
+import gc
+import json
+import pathlib
+import statistics
+import sys
+import time
+import tracemalloc
+import typing
+
+from starlette.types import ASGIApp
+
+from benchmarks.app import ASGIResponse, call_app, create_app, SessionKind
+
+Operation = typing.Callable[[], typing.Awaitable[ASGIResponse]]
+
+
+@dataclasses.dataclass
+class Result:
+    name: str
+    iterations: int
+    ops_per_sec: float
+    p50_us: float
+    p99_us: float
+    alloc_kib: float
+
+
+async def _login(app: ASGIApp) -> list[tuple[bytes, bytes]]:
+    response = await call_app(app, "/login")
+    cookie = response.get_cookie()
+    assert cookie, "login did not set a session cookie"
+    return [(b"cookie", cookie)]
+
+
+async def setup_session_backend(app: ASGIApp) -> Operation:
+    headers = await _login(app)
+    return lambda: call_app(app, "/", headers=headers)
+
+
+async def setup_login(app: ASGIApp) -> Operation:
+    return lambda: call_app(app, "/login", query_string=b"username=root")
+
+
+async def setup_confirm_login(app: ASGIApp) -> Operation:
+    headers = await _login(app)
+    return lambda: call_app(app, "/confirm", headers=headers)
+
+
+async def setup_multi_backend_token(app: ASGIApp) -> Operation:
+    headers = [(b"authorization", b"Bearer token")]
+    return lambda: call_app(app, "/", headers=headers)
+
+
+async def setup_login_required_redirect(app: ASGIApp) -> Operation:
+    return lambda: call_app(app, "/private", query_string=b"page=1")
+
+
+SCENARIOS: dict[str, typing.Callable[[ASGIApp], typing.Awaitable[Operation]]] = {
+    "session_backend": setup_session_backend,
+    "login": setup_login,
+    "confirm_login": setup_confirm_login,
+    "multi_backend_token": setup_multi_backend_token,
+    "login_required_redirect": setup_login_required_redirect,
+}
+
+
+async def measure(name: str, operation: Operation, iterations: int) -> Result:
+    for _ in range(min(iterations, 100)):  # warm up
+        await operation()
+
+    gc.collect()
+    timings: list[int] = []
+    started_at = time.perf_counter()
+    for _ in range(iterations):
+        op_started_at = time.perf_counter_ns()
+        await operation()
+        timings.append(time.perf_counter_ns() - op_started_at)
+    elapsed = time.perf_counter() - started_at
+
+    # memory is traced in a separate pass because tracing slows everything down
+    alloc_samples = min(iterations, 200)
+    tracemalloc.start()
+    peak_total = 0
+    for _ in range(alloc_samples):
+        tracemalloc.reset_peak()
+        current, _ = tracemalloc.get_traced_memory()
+        await operation()
+        peak_total += tracemalloc.get_traced_memory()[1] - current
+    tracemalloc.stop()
+
+    quantiles = statistics.quantiles(timings, n=100)
+    return Result(
+        name=name,
+        iterations=iterations,
+        ops_per_sec=iterations / elapsed,
+        p50_us=quantiles[49] / 1000,
+        p99_us=quantiles[98] / 1000,
+        alloc_kib=peak_total / alloc_samples / 1024,
+    )
+
+
+async def run(iterations: int, loader_latency: float, only: list[str]) -> list[Result]:
+    results = []
+    sessions: list[SessionKind] = ["cookie", "starsessions"]
+    for session in sessions:
+        for scenario, setup in SCENARIOS.items():
+            name = f"{scenario}[{session}]"
+            if only and not any(pattern in name for pattern in only):
+                continue
+            app = create_app(session, loader_latency=loader_latency)
+            results.append(await measure(name, await setup(app), iterations))
+    return results
+
+
+def print_results(results: list[Result], baseline: dict[str, typing.Any]) -> None:
+    print(f"{'benchmark':<40} {'ops/sec':>10} {'p50 us':>9} {'p99 us':>9} {'alloc KiB':>10} {'vs base':>8}")
+    for result in results:
+        change = ""
+        if base := baseline.get(result.name):
+            change = f"{(result.ops_per_sec / base['ops_per_sec'] - 1) * 100:+.1f}%"
+        print(
+            f"{result.name:<40} {result.ops_per_sec:>10.0f} {result.p50_us:>9.1f} "
+            f"{result.p99_us:>9.1f} {result.alloc_kib:>10.1f} {change:>8}"
+        )
+
+
+def find_regressions(results: list[Result], baseline: dict[str, typing.Any], threshold: float) -> list[str]:
+    regressions = []
+    for result in results:
+        if (base := baseline.get(result.name)) and result.ops_per_sec < base["ops_per_sec"] * (1 - threshold):
+            regressions.append(f"{result.name}: {result.ops_per_sec:.0f} ops/sec, baseline {base['ops_per_sec']:.0f}")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-n", "--iterations", type=int, default=2000)
+    parser.add_argument("--latency", type=float, default=0, help="simulated user loader latency, in seconds")
+    parser.add_argument("--baseline", type=pathlib.Path, help="results of another run on this machine, see --json")
+    parser.add_argument("--compare", action="store_true", help="exit with error on regressions against --baseline")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed ops/sec drop, default 25%%")
+    parser.add_argument("--json", type=pathlib.Path, help="write results to this file")
+    parser.add_argument("only", nargs="*", help="run benchmarks which names contain these substrings")
+    args = parser.parse_args()
+    if args.compare and not args.baseline:
+        parser.error("--compare requires --baseline")
+
+    baseline = json.loads(args.baseline.read_text()) if args.baseline else {}
+    results = asyncio.run(run(args.iterations, args.latency, args.only))
+    print_results(results, baseline)
+
+    data = {result.name: dataclasses.asdict(result) for result in results}
+    if args.json:
+        args.json.write_text(json.dumps(data, indent=2) + "\n")
+
+    if args.compare and (regressions := find_regressions(results, baseline, args.threshold)):
+        print("\nRegressions:", *regressions, sep="\n  ", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
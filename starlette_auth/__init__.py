@@ -1,7 +1,12 @@
 from starlette_auth.authentication import (
+    BackendCondition,
+    BackendTiming,
+    ConditionalBackend,
     confirm_login,
+    ensure_user,
     is_authenticated,
     is_confirmed,
+    LazyUser,
     login,
     LoginRequiredMiddleware,
     LoginScopes,
@@ -9,6 +14,20 @@ from starlette_auth.authentication import (
     MultiBackend,
     SessionBackend,
 )
+from starlette_auth.api_keys import APIKeyBackend, APIKeyRecord, generate_api_key, InMemoryAPIKeySource
+from starlette_auth.caching import CachedUserLoader
+from starlette_auth.invalidation import InProcessInvalidationBus, LocalSocketInvalidationBus, set_default_bus
+from starlette_auth.loaders import BatchUserLoader
+from starlette_auth.middleware import AuthMiddleware, AuthPolicy, ScopeRequirementsMiddleware
+from starlette_auth.passwords import HashingOverloaded, PasswordVerifier, PBKDF2Hasher, ScryptHasher
+from starlette_auth.remember_me import InMemoryRememberMeStore, RememberMeBackend, set_remember_me_cookie
+from starlette_auth.revocation import InMemoryGenerationStore, SessionGenerations
+from starlette_auth.scopes import scope_registry, ScopeRegistry
+from starlette_auth.shared_cache import SharedCachedUserLoader, SharedUserCache
+from starlette_auth.sessions import session_write_stats
+from starlette_auth.throttling import InMemoryThrottleBackend, LoginThrottle, TooManyAttempts
+from starlette_auth.tokens import set_token_cookie, SignedTokenBackend
+from starlette_auth.websockets import WebSocketRevalidator
 
 __all__ = [
     "login",
@@ -17,8 +36,45 @@ __all__ = [
     "LoginRequiredMiddleware",
     "LoginScopes",
     "MultiBackend",
+    "BackendCondition",
+    "BackendTiming",
+    "ConditionalBackend",
     "SessionBackend",
     "confirm_login",
     "is_confirmed",
+    "ensure_user",
+    "LazyUser",
     "LoginScopes",
+    "CachedUserLoader",
+    "BatchUserLoader",
+    "SignedTokenBackend",
+    "set_token_cookie",
+    "ScopeRegistry",
+    "scope_registry",
+    "SessionGenerations",
+    "InMemoryGenerationStore",
+    "APIKeyBackend",
+    "APIKeyRecord",
+    "InMemoryAPIKeySource",
+    "generate_api_key",
+    "LoginThrottle",
+    "InMemoryThrottleBackend",
+    "TooManyAttempts",
+    "session_write_stats",
+    "RememberMeBackend",
+    "InMemoryRememberMeStore",
+    "set_remember_me_cookie",
+    "WebSocketRevalidator",
+    "AuthMiddleware",
+    "AuthPolicy",
+    "ScopeRequirementsMiddleware",
+    "SharedUserCache",
+    "SharedCachedUserLoader",
+    "InProcessInvalidationBus",
+    "LocalSocketInvalidationBus",
+    "set_default_bus",
+    "PasswordVerifier",
+    "PBKDF2Hasher",
+    "ScryptHasher",
+    "HashingOverloaded",
 ]
@@ -0,0 +1,155 @@
+import abc
+import asyncio
+import dataclasses
+import hashlib
+import logging
+import secrets
+import time
+import typing
+
+from starlette.authentication import AuthCredentials, AuthenticationBackend, BaseUser
+from starlette.requests import HTTPConnection
+
+from starlette_auth.authentication import BackendCondition
+from starlette_auth.scopes import scope_registry
+
+logger = logging.getLogger(__name__)
+
+
+def hash_api_key(key: str) -> str:
+    """Compute API key digest. Only digests are stored, never the keys."""
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def generate_api_key(nbytes: int = 32) -> tuple[str, str]:
+    """Generate new API key. Returns the key (show it to the user once) and its digest (store it)."""
+    key = secrets.token_urlsafe(nbytes)
+    return key, hash_api_key(key)
+
+
+@dataclasses.dataclass(frozen=True)
+class APIKeyRecord:
+    digest: str
+    user: BaseUser
+    scopes: tuple[str, ...] = ()
+
+
+@dataclasses.dataclass(frozen=True)
+class APIKeyChanges:
+    """Keys added or changed, and digests removed since the previous cursor."""
+
+    updated: typing.Sequence[APIKeyRecord] = ()
+    deleted: typing.Sequence[str] = ()
+    cursor: typing.Any = None
+
+
+class APIKeySource(abc.ABC):  # pragma: no cover
+    @abc.abstractmethod
+    async def fetch_changes(self, cursor: typing.Any) -> APIKeyChanges:
+        """Return changes since the cursor. Cursor is None on the first call, return all keys then."""
+        raise NotImplementedError
+
+
+class InMemoryAPIKeySource(APIKeySource):
+    """Reference key source that keeps a change log in memory."""
+
+    def __init__(self, records: typing.Iterable[APIKeyRecord] = ()) -> None:
+        self._log: list[tuple[APIKeyRecord | None, str]] = []
+        for record in records:
+            self.add(record)
+
+    def add(self, record: APIKeyRecord) -> None:
+        self._log.append((record, record.digest))
+
+    def delete(self, digest: str) -> None:
+        self._log.append((None, digest))
+
+    async def fetch_changes(self, cursor: typing.Any) -> APIKeyChanges:
+        start = cursor or 0
+        updated: dict[str, APIKeyRecord] = {}
+        deleted: set[str] = set()
+        for record, digest in self._log[start:]:
+            if record is None:
+                updated.pop(digest, None)
+                deleted.add(digest)
+            else:
+                deleted.discard(digest)
+                updated[digest] = record
+        return APIKeyChanges(updated=list(updated.values()), deleted=list(deleted), cursor=len(self._log))
+
+
+class APIKeyBackend(AuthenticationBackend):
+    """Authenticate machine clients by API keys.
+
+    Key digests are indexed in memory and the index is refreshed from `source`
+    every `refresh_interval` seconds, loading only changes since the previous refresh.
+    When the source fails, the stale index is served until the next refresh attempt.
+
+    By default, the key is read from "Authorization: ApiKey <key>" header.
+    Set `scheme` to None to read the whole header value, e.g. `header="x-api-key", scheme=None`.
+    """
+
+    def __init__(
+        self,
+        source: APIKeySource,
+        *,
+        header: str = "authorization",
+        scheme: str | None = "apikey",
+        refresh_interval: float = 30,
+        clock: typing.Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.source = source
+        self.header = header.lower()
+        self.scheme = scheme.lower() if scheme else None
+        self.refresh_interval = refresh_interval
+        self.clock = clock
+        self.condition = BackendCondition(header=self.header)
+        self._index: dict[str, APIKeyRecord] = {}
+        self._cursor: typing.Any = None
+        self._refresh_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def read_key(self, conn: HTTPConnection) -> str | None:
+        value = conn.headers.get(self.header)
+        if not value or self.scheme is None:
+            return value
+
+        scheme, _, key = value.partition(" ")
+        return key.strip() if key and scheme.lower() == self.scheme else None
+
+    async def refresh(self, force: bool = False) -> None:
+        """Apply changes from the key source."""
+        async with self._lock:
+            if not force and self._refresh_at > self.clock():
+                return  # refreshed by a concurrent request
+            try:
+                changes = await self.source.fetch_changes(self._cursor)
+            except Exception:
+                # back off, do not hit the failing source on every request
+                self._refresh_at = self.clock() + self.refresh_interval
+                raise
+            for digest in changes.deleted:
+                self._index.pop(digest, None)
+            for record in changes.updated:
+                self._index[record.digest] = record
+            self._cursor = changes.cursor
+            self._refresh_at = self.clock() + self.refresh_interval
+
+    async def authenticate(self, conn: HTTPConnection) -> tuple[AuthCredentials, BaseUser] | None:
+        if not (key := self.read_key(conn)):
+            return None
+
+        if self._refresh_at <= self.clock():
+            try:
+                await self.refresh()
+            except Exception:
+                logger.exception("Failed to refresh API keys, serving stale index.")
+
+        # the lookup is by digest of the key, so timing does not leak the key itself
+        record = self._index.get(hash_api_key(key))
+        if record is None:
+            return None
+        return scope_registry.credentials(record.scopes), record.user
+
+    def __len__(self) -> int:
+        return len(self._index)
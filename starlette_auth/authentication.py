@@ -1,19 +1,86 @@
+import asyncio
+import dataclasses
 import enum
-import hashlib
+import functools
 import hmac
+import re
+import time
 import typing
+import urllib.parse
+import weakref
 
 from starlette.authentication import AuthCredentials, AuthenticationBackend, BaseUser, UnauthenticatedUser
 from starlette.datastructures import URL
-from starlette.requests import HTTPConnection, Request
-from starlette.responses import RedirectResponse
+from starlette.requests import HTTPConnection
+from starlette.status import WS_1008_POLICY_VIOLATION
 from starlette.types import ASGIApp, Receive, Scope, Send
 
+from starlette_auth import instrumentation, invalidation
+from starlette_auth.hashing import compact_digest, default_session_auth_hasher, is_compact_digest, SessionAuthHasher
+from starlette_auth.instrumentation import AuthEventType
+from starlette_auth.invalidation import user_key
+from starlette_auth.revocation import SessionGenerations
+from starlette_auth.scopes import scope_registry
+from starlette_auth.sessions import clear_session, pop_session_value, set_session_value
+from starlette_auth.throttling import LoginThrottle
+
 SESSION_KEY = "__user_id__"
 SESSION_HASH = "__user_hash__"
+# compact format: "<version>.<compact session auth hash>.<user id>" under a single short key
+SESSION_COMPACT = "_a"
+SESSION_FORMAT_VERSION = "1"
+# unix time of the last login with credentials, grants `LoginScopes.FRESH` for a while
+SESSION_LOGIN_AT = "_f"
 ByIdUserFinder = typing.Callable[[HTTPConnection, str], typing.Awaitable[BaseUser | None]]
 
 
+def read_session_auth(session: typing.Mapping[str, typing.Any]) -> tuple[str, str]:
+    """Return user id and session auth hash stored in the session in either format."""
+    if value := session.get(SESSION_COMPACT):
+        version, _, payload = str(value).partition(".")
+        if version != SESSION_FORMAT_VERSION:
+            return "", ""
+        session_auth_hash, _, user_id = payload.partition(".")
+        return user_id, session_auth_hash
+    return session.get(SESSION_KEY, ""), session.get(SESSION_HASH, "")
+
+
+def write_session_auth(
+    session: typing.MutableMapping[str, typing.Any],
+    user_id: str | None = None,
+    session_auth_hash: str | None = None,
+    *,
+    compact: bool | None = None,
+) -> None:
+    """Store user id and session auth hash, None keeps the stored value.
+    `compact` selects the session format, None keeps the current one.
+    Hashes are truncated in the compact format, see `compact_digest`."""
+    if compact is None:
+        compact = SESSION_COMPACT in session
+
+    if not compact:
+        if SESSION_COMPACT in session:
+            stored_user_id, stored_hash = read_session_auth(session)
+            pop_session_value(session, SESSION_COMPACT)
+            user_id = stored_user_id if user_id is None else user_id
+            session_auth_hash = stored_hash if session_auth_hash is None else session_auth_hash
+        if user_id is not None:
+            set_session_value(session, SESSION_KEY, user_id)
+        if session_auth_hash is not None:
+            set_session_value(session, SESSION_HASH, session_auth_hash)
+        return
+
+    stored_user_id, stored_hash = read_session_auth(session)
+    user_id = stored_user_id if user_id is None else user_id
+    session_auth_hash = stored_hash if session_auth_hash is None else session_auth_hash
+    if session_auth_hash and not is_compact_digest(session_auth_hash):
+        session_auth_hash = compact_digest(session_auth_hash)
+    set_session_value(session, SESSION_COMPACT, f"{SESSION_FORMAT_VERSION}.{session_auth_hash}.{user_id}")
+    if SESSION_KEY in session or SESSION_HASH in session:
+        pop_session_value(session, SESSION_KEY)
+        pop_session_value(session, SESSION_HASH)
+
+
 class UserWithScopes(typing.Protocol):  # pragma: no cover
     def get_scopes(self) -> list[str]: ...
 
@@ -35,9 +102,24 @@ def confirm_login(connection: HTTPConnection) -> None:
     Fresh login is the one where user provided credentials."""
     credentials: AuthCredentials = connection.auth
     if LoginScopes.REMEMBERED in credentials.scopes:
-        credentials.scopes.remove(LoginScopes.REMEMBERED)
-        credentials.scopes.append(LoginScopes.FRESH)
-        connection.session[SESSION_KEY] = connection.user.identity
+        connection.scope["auth"] = scope_registry.replace(credentials, LoginScopes.REMEMBERED, LoginScopes.FRESH)
+        write_session_auth(connection.session, connection.user.identity)
+        mark_fresh_login(connection.session)
+
+
+def mark_fresh_login(session: typing.MutableMapping[str, typing.Any]) -> None:
+    """Remember that the user has just provided credentials, see `SessionBackend.fresh_max_age`.
+    Repeated logins within a few seconds keep the stored time, so the session is not rewritten."""
+    now = int(time.time())
+    login_at = session.get(SESSION_LOGIN_AT)
+    if not isinstance(login_at, int) or not 0 <= now - login_at < 10:
+        set_session_value(session, SESSION_LOGIN_AT, now)
+
+
+def is_fresh_login(session: typing.Mapping[str, typing.Any], max_age: float) -> bool:
+    """Test if the user provided credentials at most `max_age` seconds ago."""
+    login_at = session.get(SESSION_LOGIN_AT)
+    return isinstance(login_at, int) and time.time() - login_at <= max_age
 
 
 def is_confirmed(connection: HTTPConnection) -> bool:
@@ -45,65 +127,386 @@ def is_confirmed(connection: HTTPConnection) -> bool:
     return LoginScopes.FRESH in connection.auth.scopes
 
 
+class LazyUser(BaseUser):
+    """A placeholder for the session user that is loaded on demand.
+
+    The identity is known from the session, everything else requires the real user.
+    Call `await ensure_user(connection)` to load it. Until then, the user is
+    considered authenticated because the session references it, `display_name` is the identity,
+    and other attributes of the real user are missing (AttributeError), so `hasattr`
+    and `getattr` with defaults work."""
+
+    def __init__(self, user_id: str, loader: typing.Callable[[], typing.Awaitable[BaseUser | None]]) -> None:
+        self._user_id = user_id
+        self._loader = loader
+        self._user: BaseUser | None = None
+        self._resolved = False
+
+    @property
+    def identity(self) -> str:
+        return self._user_id
+
+    @property
+    def is_authenticated(self) -> bool:
+        if self._resolved:
+            return self._user is not None and self._user.is_authenticated
+        return True
+
+    @property
+    def is_resolved(self) -> bool:
+        return self._resolved
+
+    @property
+    def display_name(self) -> str:
+        # templates may render the name of a user that is not loaded, fall back to the identity
+        return self._user.display_name if self._user is not None else self._user_id
+
+    @property
+    def user(self) -> BaseUser:
+        """Return the loaded user."""
+        if not self._resolved:
+            raise RuntimeError("User is not loaded yet. Call `await ensure_user(connection)` first.")
+        if self._user is None:
+            raise RuntimeError("User could not be loaded.")
+        return self._user
+
+    async def resolve(self) -> BaseUser | None:
+        """Load the user. The loader is called only once."""
+        if not self._resolved:
+            self._user = await self._loader()
+            self._resolved = True
+        return self._user
+
+    def __getattr__(self, name: str) -> typing.Any:
+        # called only for attributes missing on LazyUser itself
+        if name.startswith("_") or not self._resolved:
+            raise AttributeError(f"{type(self).__name__!r} object has no attribute {name!r}, the user is not loaded.")
+        if self._user is None:
+            raise AttributeError(f"{type(self).__name__!r} object has no attribute {name!r}, the user does not exist.")
+        return getattr(self._user, name)
+
+    def __repr__(self) -> str:
+        return f"<LazyUser: {self._user_id}>"
+
+
+async def ensure_user(connection: HTTPConnection) -> BaseUser:
+    """Load lazy user and replace it in the connection scope with the real one.
+    If the user cannot be loaded (deleted or session hash is invalid), the connection becomes anonymous."""
+    user = connection.scope.get("user")
+    if isinstance(user, LazyUser):
+        if resolved := await user.resolve():
+            # login scopes are granted by the backend, keep them
+            credentials = connection.scope.get("auth")
+            login_scopes = [scope for scope in LoginScopes if credentials and scope in credentials.scopes]
+            connection.scope["user"] = resolved
+            connection.scope["auth"] = scope_registry.credentials((*get_scopes(resolved), *login_scopes))
+        else:
+            connection.scope["user"] = UnauthenticatedUser()
+            connection.scope["auth"] = scope_registry.credentials()
+    return typing.cast(BaseUser, connection.scope["user"])
+
+
 class SessionBackend(AuthenticationBackend):
-    """Authentication backend that uses session to store user information."""
+    """Authentication backend that uses session to store user information.
+
+    In lazy mode, the user loader is not called during authentication.
+    Instead, the connection gets a `LazyUser` and credentials with login scopes only,
+    use `ensure_user` to load the user and its scopes.
+    Note that `LazyUser.is_authenticated` is True until the user is loaded: only the user id is known then,
+    neither the existence of the user nor the session auth hash is checked yet. Call `ensure_user`
+    before trusting the user, `LoginRequiredMiddleware` and `AuthMiddleware` with `login_required` do it for you.
 
-    def __init__(self, user_loader: ByIdUserFinder, secret_key: str) -> None:
+    When `generations` is set, sessions revoked via `SessionGenerations` are rejected
+    before the user loader is called.
+
+    When `forget_invalid_users` is set, user id and session auth hash are removed from the session
+    if the user no longer exists or the hash is invalid, so next requests skip the lookup.
+
+    Sessions in both formats are accepted. When `compact_session` is set,
+    sessions of successfully loaded users are migrated to the compact format.
+
+    Users who logged in with credentials (`login` or `confirm_login`) at most `fresh_max_age` seconds ago
+    get `LoginScopes.FRESH` scope, so views requiring it are reachable after the login redirect."""
+
+    def __init__(
+        self,
+        user_loader: ByIdUserFinder,
+        secret_key: str,
+        *,
+        lazy: bool = False,
+        generations: SessionGenerations | None = None,
+        forget_invalid_users: bool = False,
+        compact_session: bool = False,
+        fresh_max_age: float = 300,
+    ) -> None:
         self.user_loader = user_loader
         self.secret_key = secret_key
+        self.lazy = lazy
+        self.generations = generations
+        self.forget_invalid_users = forget_invalid_users
+        self.compact_session = compact_session
+        self.fresh_max_age = fresh_max_age
 
     async def authenticate(self, conn: HTTPConnection) -> tuple[AuthCredentials, BaseUser] | None:
-        user_id: str = conn.session.get(SESSION_KEY, "")
-        if user_id and (user := await self.user_loader(conn, user_id)):
-            if isinstance(user, HasSessionAuthHash) and not validate_session_auth_hash(
-                conn, user.get_session_auth_hash(self.secret_key)
-            ):
+        user_id, _ = read_session_auth(conn.session)
+        if not user_id:
+            return None
+
+        if self.generations and not await self.generations.is_valid(conn, user_id):
+            # session has been revoked
+            return None
+
+        login_scopes = [LoginScopes.FRESH] if is_fresh_login(conn.session, self.fresh_max_age) else []
+        if self.lazy:
+            lazy_user = LazyUser(user_id, functools.partial(self.load_user, conn, user_id))
+            return scope_registry.credentials(login_scopes), lazy_user
+
+        if user := await self.load_user(conn, user_id):
+            return scope_registry.credentials((*get_scopes(user), *login_scopes)), user
+        return None
+
+    async def load_user(self, conn: HTTPConnection, user_id: str) -> BaseUser | None:
+        """Load user and validate session auth hash."""
+        if instrumented := bool(instrumentation.observers):
+            started_at = time.perf_counter()
+        user = await self.user_loader(conn, user_id)
+        if instrumented:
+            instrumentation.emit(
+                AuthEventType.USER_LOADED, time.perf_counter() - started_at, found="yes" if user else "no"
+            )
+
+        if user:
+            if isinstance(user, HasSessionAuthHash) and not verify_session_auth_hash(conn, user, self.secret_key):
                 # avoid authentication if session hash is invalid
                 # this may happen when user changes password OR
                 # session is hijacked
+                if instrumentation.observers:
+                    instrumentation.emit(AuthEventType.SESSION_HASH_INVALID)
+                self._forget_user(conn)
                 return None
-            return AuthCredentials(scopes=get_scopes(user)), user
+            if self.compact_session and SESSION_COMPACT not in conn.session:
+                write_session_auth(conn.session, compact=True)
+            return user
+
+        self._forget_user(conn)
         return None
 
+    def _forget_user(self, conn: HTTPConnection) -> None:
+        if self.forget_invalid_users:
+            if SESSION_COMPACT in conn.session:
+                pop_session_value(conn.session, SESSION_COMPACT)
+            pop_session_value(conn.session, SESSION_KEY)
+            pop_session_value(conn.session, SESSION_HASH)
+
+
+@dataclasses.dataclass(frozen=True)
+class BackendCondition:
+    """A cheap precondition that must hold for a backend to run.
+    All given criteria must match."""
+
+    header: str | None = None
+    cookie: str | None = None
+    path_prefix: str | None = None
+
+    def matches(self, conn: HTTPConnection) -> bool:
+        if self.header is not None and self.header not in conn.headers:
+            return False
+        if self.cookie is not None and self.cookie not in conn.cookies:
+            return False
+        if self.path_prefix is not None and not conn.scope.get("path", "").startswith(self.path_prefix):
+            return False
+        return True
+
+
+class ConditionalBackend(AuthenticationBackend):
+    """Run the backend only when the condition matches.
+    Backends may also declare `condition` attribute themselves.
+
+    Usage:
+        MultiBackend([ConditionalBackend(TokenBackend(), header="authorization"), SessionBackend(...)])
+    """
+
+    def __init__(
+        self,
+        backend: AuthenticationBackend,
+        *,
+        header: str | None = None,
+        cookie: str | None = None,
+        path_prefix: str | None = None,
+    ) -> None:
+        self.backend = backend
+        self.condition = BackendCondition(
+            header=header.lower() if header else None, cookie=cookie, path_prefix=path_prefix
+        )
+
+    async def authenticate(self, conn: HTTPConnection) -> tuple[AuthCredentials, BaseUser] | None:
+        if not self.condition.matches(conn):
+            return None
+        return await self.backend.authenticate(conn)
+
+
+@dataclasses.dataclass
+class BackendTiming:
+    """Accumulated timing of a backend."""
+
+    name: str
+    calls: int = 0
+    hits: int = 0
+    total_time: float = 0.0
+    max_time: float = 0.0
+
+    @property
+    def average_time(self) -> float:
+        return self.total_time / self.calls if self.calls else 0.0
+
+    def record(self, elapsed: float, hit: bool) -> None:
+        self.calls += 1
+        self.hits += hit
+        self.total_time += elapsed
+        self.max_time = max(self.max_time, elapsed)
+
 
 class MultiBackend(AuthenticationBackend):
-    """Authenticate user using multiple backends."""
+    """Authenticate user using multiple backends.
+
+    Backends that declare a `condition` attribute (see `BackendCondition`) are indexed
+    by header and cookie names, and only those which match the connection are called.
+
+    Strategies:
+    - sequential: call backends one by one, stop at the first success
+    - race: call matching backends concurrently, return the first success in the order of backends
+    """
 
-    def __init__(self, backends: list[AuthenticationBackend]) -> None:
+    def __init__(
+        self,
+        backends: list[AuthenticationBackend],
+        *,
+        strategy: typing.Literal["sequential", "race"] = "sequential",
+    ) -> None:
+        assert strategy in ("sequential", "race"), f"Unsupported strategy: {strategy}"
         self.backends = backends
+        self.strategy = strategy
+        self.timings = [BackendTiming(name=type(backend).__name__) for backend in backends]
+        self._conditions: list[BackendCondition | None] = [getattr(b, "condition", None) for b in backends]
+        self._unconditional: list[int] = []
+        self._by_header: dict[str, list[int]] = {}
+        self._by_cookie: dict[str, list[int]] = {}
+        self._by_path: list[int] = []
+        for index, condition in enumerate(self._conditions):
+            if condition is None:
+                self._unconditional.append(index)
+            elif condition.header is not None:
+                self._by_header.setdefault(condition.header.lower(), []).append(index)
+            elif condition.cookie is not None:
+                self._by_cookie.setdefault(condition.cookie, []).append(index)
+            else:
+                self._by_path.append(index)
+
+    def select_backends(self, conn: HTTPConnection) -> list[int]:
+        """Return indexes of backends whose conditions match the connection."""
+        if len(self._unconditional) == len(self.backends):
+            return self._unconditional
+
+        candidates = self._unconditional + self._by_path
+        for header, indexes in self._by_header.items():
+            if header in conn.headers:
+                candidates = candidates + indexes
+        if self._by_cookie:
+            cookies = conn.cookies
+            for cookie, indexes in self._by_cookie.items():
+                if cookie in cookies:
+                    candidates = candidates + indexes
+
+        conditions = self._conditions
+        return sorted(
+            index for index in candidates if (condition := conditions[index]) is None or condition.matches(conn)
+        )
 
     async def authenticate(self, conn: HTTPConnection) -> tuple[AuthCredentials, BaseUser] | None:
-        for backend in self.backends:
-            if result := await backend.authenticate(conn):
+        indexes = self.select_backends(conn)
+        if self.strategy == "race" and len(indexes) > 1:
+            return await self._race(conn, indexes)
+
+        for index in indexes:
+            if result := await self._call_backend(index, conn):
                 return result
         return None
 
+    async def _call_backend(self, index: int, conn: HTTPConnection) -> tuple[AuthCredentials, BaseUser] | None:
+        started_at = time.perf_counter()
+        result = await self.backends[index].authenticate(conn)
+        elapsed = time.perf_counter() - started_at
+        timing = self.timings[index]
+        timing.record(elapsed, result is not None)
+        if instrumentation.observers:
+            instrumentation.emit(
+                AuthEventType.BACKEND_CALLED, elapsed, backend=timing.name, result="hit" if result else "miss"
+            )
+        return result
+
+    async def _race(self, conn: HTTPConnection, indexes: list[int]) -> tuple[AuthCredentials, BaseUser] | None:
+        tasks = [asyncio.create_task(self._call_backend(index, conn)) for index in indexes]
+        try:
+            for task in tasks:
+                if result := await task:
+                    return result
+            return None
+        finally:
+            for task in tasks:
+                task.cancel()
+
 
 class HasSessionAuthHash:  # pragma: no cover
+    session_auth_hasher: typing.ClassVar[SessionAuthHasher] = default_session_auth_hasher
+
     def get_password_hash(self) -> str:
         raise NotImplementedError
 
     def get_session_auth_hash(self, secret_key: str) -> str:
         """Compute current user session auth hash."""
-        key = hashlib.sha256(("starlette_dispatch." + secret_key).encode()).digest()
-        return hmac.new(key, msg=self.get_password_hash().encode(), digestmod=hashlib.sha256).hexdigest()
+        return self.session_auth_hasher.hash(secret_key, self.get_password_hash())
 
 
 def update_session_auth_hash(connection: HTTPConnection, user: HasSessionAuthHash, secret_key: str) -> None:
     """Update session auth hash.
     Call this function each time you change user's password.
-    Otherwise, the session will be instantly invalidated."""
-    connection.session[SESSION_HASH] = user.get_session_auth_hash(secret_key)
+    Otherwise, the session will be instantly invalidated.
+    Cached copies of the user are invalidated on all nodes via the default invalidation bus."""
+    write_session_auth(connection.session, session_auth_hash=user.get_session_auth_hash(secret_key))
+    if isinstance(user, BaseUser):
+        invalidation.publish(user_key(user.identity))
 
 
 def validate_session_auth_hash(connection: HTTPConnection, session_auth_hash: str) -> bool:
     """Validate session auth hash."""
-    return hmac.compare_digest(connection.session.get(SESSION_HASH, ""), session_auth_hash)
-
-
-async def login(connection: HTTPConnection, user: BaseUser, secret_key: str) -> None:
-    """Login user."""
-
+    stored_hash = read_session_auth(connection.session)[1]
+    if is_compact_digest(stored_hash) and session_auth_hash and not is_compact_digest(session_auth_hash):
+        session_auth_hash = compact_digest(session_auth_hash)
+    return hmac.compare_digest(stored_hash, session_auth_hash)
+
+
+def verify_session_auth_hash(connection: HTTPConnection, user: HasSessionAuthHash, secret_key: str) -> bool:
+    """Validate session auth hash of the user.
+    Hashes computed by an outdated algorithm are accepted and replaced with the current ones."""
+    if validate_session_auth_hash(connection, user.get_session_auth_hash(secret_key)):
+        return True
+
+    session_auth_hash = read_session_auth(connection.session)[1]
+    hasher = user.session_auth_hasher
+    if hasher.needs_update(session_auth_hash) and hasher.verify(
+        secret_key, user.get_password_hash(), session_auth_hash
+    ):
+        # same password, only the hash format changes, cached users stay valid
+        write_session_auth(connection.session, session_auth_hash=user.get_session_auth_hash(secret_key))
+        return True
+    return False
+
+
+def start_session(
+    connection: HTTPConnection, user: BaseUser, secret_key: str, *, compact_session: bool | None = None
+) -> None:
+    """Store user id and session auth hash in the session of a newly authenticated user.
+    Session data of another user is cleared and starsessions session id is regenerated."""
     # there is a chance that session may already contain data of another user
     # this may happen if you don't clear session property on logout, or
     # SESSION_KEY is set from the outside. In this case we need to run several
@@ -112,23 +515,19 @@ async def login(connection: HTTPConnection, user: BaseUser, secret_key: str) ->
     if isinstance(user, HasSessionAuthHash):
         session_auth_hash = user.get_session_auth_hash(secret_key)
 
-    if SESSION_KEY in connection.session:
+    if stored_user_id := read_session_auth(connection.session)[0]:
         if any(
             [
                 # if we have other user id in the session and this is not the same user
                 # OR user does not implement HasSessionAuthHash interface, then don't trust session and clear it
-                connection.session[SESSION_KEY] != user.identity,
+                stored_user_id != user.identity,
                 # ok, we have the same user id in the session, let's check the session auth hash
                 # or session has previously set hash, and hashes are not equal
                 # this may happen when user changes password
-                session_auth_hash and not validate_session_auth_hash(connection, session_auth_hash),
+                isinstance(user, HasSessionAuthHash) and not verify_session_auth_hash(connection, user, secret_key),
             ]
         ):
-            connection.session.clear()
-
-    connection.scope["auth"] = AuthCredentials(scopes=get_scopes(user) + [LoginScopes.FRESH])
-    connection.scope["user"] = user
-    connection.session[SESSION_KEY] = user.identity
+            clear_session(connection.session)
 
     # Regenerate session id to prevent session fixation.
     # Note, in case of standard Starlette session middleware, session id is regenerated automatically
@@ -140,16 +539,70 @@ async def login(connection: HTTPConnection, user: BaseUser, secret_key: str) ->
 
         regenerate_session_id(connection)
 
-    # Generate and store session auth hash.
+    # Store user id and session auth hash.
     # Session auth has is used to invalidate session when user's password changes.
-    connection.session[SESSION_HASH] = session_auth_hash
+    write_session_auth(connection.session, user.identity, session_auth_hash, compact=compact_session)
+
+
+async def login(
+    connection: HTTPConnection,
+    user: BaseUser,
+    secret_key: str,
+    *,
+    issue_token: bool = False,
+    generations: SessionGenerations | None = None,
+    throttle: LoginThrottle | None = None,
+    throttle_identity: str | None = None,
+    compact_session: bool | None = None,
+) -> None:
+    """Login user.
+    When `issue_token` is set, a signed token for `SignedTokenBackend` is stored in `connection.scope["auth_token"]`.
+    When `generations` is set, current session generations are stored in the session.
+    When `throttle` is set, login is refused with `TooManyAttempts` if the limit is exceeded,
+    otherwise failed attempts are reset. Pass the same `throttle_identity` (user identity by default)
+    you use in `throttle.record_failure()`.
+    `compact_session` selects the format of user id and session auth hash, by default the format
+    of the current session is kept, so sessions migrated by `SessionBackend` are not converted back."""
+    started_at = time.perf_counter()
+    if throttle:
+        throttle_identity = throttle_identity or user.identity
+        await throttle.check(connection, throttle_identity)
+
+    connection.scope["auth"] = scope_registry.credentials((*get_scopes(user), LoginScopes.FRESH))
+    connection.scope["user"] = user
+    start_session(connection, user, secret_key, compact_session=compact_session)
+    mark_fresh_login(connection.session)
+
+    if generations:
+        await generations.remember(connection, user.identity)
+
+    if throttle:
+        await throttle.reset(connection, throttle_identity or user.identity)
+
+    if issue_token:
+        from starlette_auth.tokens import create_token, TOKEN_SCOPE_KEY
+
+        connection.scope[TOKEN_SCOPE_KEY] = create_token(user, secret_key)
+
+    if instrumentation.observers:
+        instrumentation.emit(AuthEventType.LOGIN, time.perf_counter() - started_at)
 
 
 async def logout(connection: HTTPConnection) -> None:
-    connection.session.clear()  # wipe all data
-    connection.scope["auth"] = AuthCredentials()
+    """Logout user and publish invalidation of their cached data to the default invalidation bus."""
+    if (user := connection.scope.get("user")) and user.is_authenticated:
+        invalidation.publish(user_key(user.identity))
+    clear_session(connection.session)  # wipe all data
+    connection.scope["auth"] = scope_registry.credentials()
     connection.scope["user"] = UnauthenticatedUser()
 
+    from starlette_auth.tokens import TOKEN_SCOPE_KEY
+
+    if TOKEN_SCOPE_KEY in connection.scope:
+        connection.scope[TOKEN_SCOPE_KEY] = ""  # signal that the token must be removed from the client
+    if instrumentation.observers:
+        instrumentation.emit(AuthEventType.LOGOUT)
+
 
 def is_authenticated(connection: HTTPConnection) -> bool:
     """Check if user is authenticated."""
@@ -157,7 +610,40 @@ def is_authenticated(connection: HTTPConnection) -> bool:
     return value
 
 
+def path_to_regex(path: str) -> str:
+    """Convert path to regular expression. Paths ending with "*" match as prefixes."""
+    return re.escape(path[:-1]) if path.endswith("*") else re.escape(path) + r"\Z"
+
+
+def compile_path_patterns(paths: typing.Iterable[str]) -> re.Pattern[str] | None:
+    """Compile paths into a single regular expression.
+    Paths ending with "*" match as prefixes, other paths must match exactly."""
+    patterns = [path_to_regex(path) for path in paths]
+    if not patterns:
+        return None
+    return re.compile("|".join(f"(?:{pattern})" for pattern in patterns))
+
+
+def build_redirect_location(redirect_to: str, scope: Scope) -> str:
+    """Build Location header value that points to `redirect_to` with the current path in `next` query param."""
+    next_url = scope["path"]
+    if query_string := scope.get("query_string"):
+        next_url += "?" + query_string.decode()
+
+    if "?" in redirect_to or "#" in redirect_to:
+        location = str(URL(redirect_to).include_query_params(next=next_url))
+    else:
+        location = redirect_to + "?next=" + urllib.parse.quote_plus(next_url, safe="")
+    return urllib.parse.quote(location, safe=":/%#?=@[]!$&'()*+,;")
+
+
 class LoginRequiredMiddleware:
+    """Redirect unauthenticated users to the login page.
+
+    Paths listed in `public_paths` are not protected. A path ending with "*" is treated as a prefix:
+        LoginRequiredMiddleware(app, public_paths=["/login", "/static/*"])
+    """
+
     def __init__(
         self,
         app: ASGIApp,
@@ -165,24 +651,73 @@ class LoginRequiredMiddleware:
         *,
         path_name: str | None = "login",
         path_params: dict[str, typing.Any] | None = None,
+        public_paths: typing.Iterable[str] = (),
     ) -> None:
         assert redirect_url or path_name
         self.app = app
         self.redirect_url = redirect_url
         self.path_name = path_name
         self.path_params = path_params or {}
+        self.public_paths = compile_path_patterns(public_paths)
+        self._redirect_urls: weakref.WeakKeyDictionary[typing.Any, tuple[tuple[int, int], str]] = (
+            weakref.WeakKeyDictionary()
+        )
+
+    def get_redirect_url(self, app: typing.Any) -> str:
+        """Resolve redirect URL. Resolved URLs are cached per application until its routes change."""
+        if self.redirect_url:
+            return self.redirect_url
+
+        assert self.path_name
+        routes = app.router.routes
+        routes_version = (id(routes), len(routes))
+        cached = self._redirect_urls.get(app)
+        if cached is None or cached[0] != routes_version:
+            cached = (routes_version, str(app.url_path_for(self.path_name, **self.path_params)))
+            self._redirect_urls[app] = cached
+        return cached[1]
 
     async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
         if scope["type"] not in {"http", "websocket"}:
             await self.app(scope, receive, send)
             return
 
+        if self.public_paths and self.public_paths.match(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        await self.require_login(scope, receive, send)
+
+    async def require_login(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Call the app if the user is authenticated, otherwise redirect http and close websocket connections."""
         user = typing.cast(BaseUser, scope.get("user"))
-        if not user.is_authenticated:
-            request = Request(scope, receive, send)
-            redirect_to = self.redirect_url or request.app.url_path_for(self.path_name, **self.path_params)
-            url = URL(redirect_to).include_query_params(next=str(request.url.replace(scheme="", netloc="")))
-            response = RedirectResponse(url, 302)
-            await response(scope, receive, send)
-        else:
+        if isinstance(user, LazyUser):
+            user = await ensure_user(HTTPConnection(scope))
+        if user.is_authenticated:
             await self.app(scope, receive, send)
+            return
+
+        await self.redirect_to_login(scope, send)
+
+    async def redirect_to_login(self, scope: Scope, send: Send) -> None:
+        """Redirect http connections to the login page, close websocket connections."""
+        if instrumentation.observers:
+            instrumentation.emit(AuthEventType.REDIRECT, type=scope["type"])
+
+        if scope["type"] == "websocket":
+            # websockets cannot follow redirects, reject the connection instead
+            await send({"type": "websocket.close", "code": WS_1008_POLICY_VIOLATION})
+            return
+
+        redirect_to = self.get_redirect_url(scope["app"])
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 302,
+                "headers": [
+                    (b"location", build_redirect_location(redirect_to, scope).encode("latin-1")),
+                    (b"content-length", b"0"),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": b""})
@@ -0,0 +1,160 @@
+import asyncio
+import collections
+import time
+import typing
+
+from starlette.authentication import BaseUser
+from starlette.requests import HTTPConnection
+
+from starlette_auth import instrumentation
+from starlette_auth.authentication import ByIdUserFinder
+from starlette_auth.instrumentation import AuthEventType
+from starlette_auth.invalidation import InvalidationBus, USER_PREFIX, user_key
+
+
+class CachedUserLoader:
+    """Cache results of a user loader in memory.
+
+    Entries expire after `ttl` seconds and the least recently used entries are evicted
+    once the cache holds more than `max_entries` users.
+    Concurrent lookups of the same user id share a single loader call.
+
+    When `negative_ttl` is set, ids the loader returned None for (deleted or disabled users)
+    are remembered for that many seconds, at most `max_negative_entries` of them.
+
+    When `bus` is set, `invalidate` is published to other nodes and their invalidations are applied here,
+    so long TTLs do not serve stale users.
+
+    Usage:
+        backend = SessionBackend(user_loader=CachedUserLoader(user_loader), secret_key="key")
+    """
+
+    def __init__(
+        self,
+        user_loader: ByIdUserFinder,
+        *,
+        ttl: float = 60,
+        max_entries: int = 1024,
+        negative_ttl: float = 0,
+        max_negative_entries: int = 1024,
+        clock: typing.Callable[[], float] = time.monotonic,
+        bus: InvalidationBus | None = None,
+    ) -> None:
+        assert max_entries > 0, "max_entries must be positive"
+        self.user_loader = user_loader
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.negative_ttl = negative_ttl
+        self.max_negative_entries = max_negative_entries
+        self.clock = clock
+        self._entries: collections.OrderedDict[str, tuple[float, BaseUser]] = collections.OrderedDict()
+        self._misses: collections.OrderedDict[str, float] = collections.OrderedDict()
+        self._pending: dict[str, asyncio.Task[BaseUser | None]] = {}
+        self._invalidations: dict[str, int] = {}  # invalidation counters of ids being loaded
+        self.bus = bus
+        if bus:
+            bus.subscribe(self._on_invalidate)
+
+    async def __call__(self, conn: HTTPConnection, user_id: str) -> BaseUser | None:
+        if (user := self.get(user_id)) is not None:
+            if instrumentation.observers:
+                instrumentation.emit(AuthEventType.CACHE_HIT, cache="user")
+            return user
+
+        if self._misses and self.is_known_missing(user_id):
+            if instrumentation.observers:
+                instrumentation.emit(AuthEventType.CACHE_HIT, cache="missing_user")
+            return None
+
+        if instrumentation.observers:
+            instrumentation.emit(AuthEventType.CACHE_MISS, cache="user")
+
+        if (task := self._pending.get(user_id)) is None:
+            # the load runs detached, so cancellation of the first caller does not fail the others
+            task = asyncio.create_task(self._load(conn, user_id))
+            self._pending[user_id] = task
+            task.add_done_callback(lambda _: self._finish_load(user_id))
+        return await asyncio.shield(task)
+
+    async def _load(self, conn: HTTPConnection, user_id: str) -> BaseUser | None:
+        invalidations = self._invalidations.get(user_id, 0)
+        user = await self.user_loader(conn, user_id)
+        if self._invalidations.get(user_id, 0) != invalidations:
+            return user  # invalidated during the load, the result may be stale
+
+        if user is not None:
+            self.set(user_id, user)
+        elif self.negative_ttl:
+            self.set_missing(user_id)
+        return user
+
+    def _finish_load(self, user_id: str) -> None:
+        task = self._pending.pop(user_id)
+        self._invalidations.pop(user_id, None)
+        if not task.cancelled():
+            task.exception()  # mark as retrieved when all callers are gone
+
+    def get(self, user_id: str) -> BaseUser | None:
+        """Return cached user or None if the entry is missing or expired."""
+        if (entry := self._entries.get(user_id)) is None:
+            return None
+
+        expires_at, user = entry
+        if expires_at <= self.clock():
+            del self._entries[user_id]
+            return None
+
+        self._entries.move_to_end(user_id)
+        return user
+
+    def set(self, user_id: str, user: BaseUser) -> None:
+        """Put user into the cache."""
+        self._entries[user_id] = (self.clock() + self.ttl, user)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def is_known_missing(self, user_id: str) -> bool:
+        """Test if the loader recently returned no user for this id."""
+        if (expires_at := self._misses.get(user_id)) is None:
+            return False
+
+        if expires_at <= self.clock():
+            del self._misses[user_id]
+            return False
+        return True
+
+    def set_missing(self, user_id: str) -> None:
+        """Remember that there is no user with this id."""
+        self._misses[user_id] = self.clock() + self.negative_ttl
+        self._misses.move_to_end(user_id)
+        while len(self._misses) > self.max_negative_entries:
+            self._misses.popitem(last=False)
+
+    def invalidate(self, user_id: str) -> None:
+        """Remove user from the cache.
+        Call this function when user data changes, e.g. after password change."""
+        self._forget(user_id)
+        if self.bus:
+            self.bus.publish(user_key(user_id))
+
+    def _on_invalidate(self, keys: typing.Sequence[str]) -> None:
+        for key in keys:
+            if key.startswith(USER_PREFIX):
+                self._forget(key[len(USER_PREFIX) :])
+
+    def _forget(self, user_id: str) -> None:
+        self._entries.pop(user_id, None)
+        self._misses.pop(user_id, None)
+        if user_id in self._pending:
+            self._invalidations[user_id] = self._invalidations.get(user_id, 0) + 1
+
+    def clear(self) -> None:
+        """Remove all users from the cache."""
+        self._entries.clear()
+        self._misses.clear()
+        for user_id in self._pending:
+            self._invalidations[user_id] = self._invalidations.get(user_id, 0) + 1
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,111 @@
+import base64
+import collections
+import hashlib
+import hmac
+import typing
+
+HashAlgorithm = typing.Literal["sha256", "blake2b"]
+
+_BLAKE2B_PREFIX = "b2$"
+COMPACT_DIGEST_SIZE = 16  # bytes, 22 characters in base64url
+
+
+def compact_digest(digest: str) -> str:
+    """Shorten hex digest to the first COMPACT_DIGEST_SIZE bytes encoded as base64url.
+    The algorithm prefix is kept. Other strings (e.g. custom session auth hashes) are hashed with SHA-256 first."""
+    prefix = _BLAKE2B_PREFIX if digest.startswith(_BLAKE2B_PREFIX) else ""
+    try:
+        raw = bytes.fromhex(digest[len(prefix) :])
+    except ValueError:
+        prefix, raw = "", hashlib.sha256(digest.encode()).digest()
+    return prefix + base64.urlsafe_b64encode(raw[:COMPACT_DIGEST_SIZE]).rstrip(b"=").decode()
+
+
+def is_compact_digest(digest: str) -> bool:
+    return len(digest.removeprefix(_BLAKE2B_PREFIX)) < 64
+
+
+def derive_key(secret_key: str) -> bytes:
+    """Derive session auth hash key from the application secret."""
+    return hashlib.sha256(("starlette_dispatch." + secret_key).encode()).digest()
+
+
+class SessionAuthHasher:
+    """Compute and verify session auth hashes.
+
+    Keyed hash objects are created once per secret key and cloned for every digest,
+    computed digests are memoized in a bounded LRU cache.
+
+    Two formats are supported:
+    - sha256: HMAC-SHA256 hex digest without prefix (the original format)
+    - blake2b: keyed BLAKE2b hex digest prefixed with "b2$"
+
+    `verify` accepts digests in any supported format, full or compact (see `compact_digest`),
+    so switching the algorithm does not invalidate existing sessions. Use `needs_update` to find out whether
+    the stored digest should be replaced with one in the current format.
+    """
+
+    def __init__(self, algorithm: HashAlgorithm = "sha256", *, max_entries: int = 1024) -> None:
+        assert algorithm in ("sha256", "blake2b"), f"Unsupported algorithm: {algorithm}"
+        self.algorithm = algorithm
+        self.max_entries = max_entries
+        self._hmac_keys: dict[str, hmac.HMAC] = {}
+        self._blake2b_keys: dict[str, hashlib.blake2b] = {}
+        self._digests: collections.OrderedDict[tuple[str, str, str], str] = collections.OrderedDict()
+
+    def hash(self, secret_key: str, password_hash: str) -> str:
+        """Compute session auth hash using current algorithm."""
+        return self._compute(self.algorithm, secret_key, password_hash)
+
+    def verify(self, secret_key: str, password_hash: str, session_auth_hash: str) -> bool:
+        """Check session auth hash computed by any supported algorithm."""
+        if not session_auth_hash:
+            return False
+        algorithm: HashAlgorithm = "blake2b" if session_auth_hash.startswith(_BLAKE2B_PREFIX) else "sha256"
+        expected = self._compute(algorithm, secret_key, password_hash)
+        if is_compact_digest(session_auth_hash):
+            expected = compact_digest(expected)
+        return hmac.compare_digest(expected, session_auth_hash)
+
+    def needs_update(self, session_auth_hash: str) -> bool:
+        """Test if the session auth hash was computed by an outdated algorithm."""
+        return session_auth_hash.startswith(_BLAKE2B_PREFIX) != (self.algorithm == "blake2b")
+
+    def clear(self) -> None:
+        """Forget all derived keys and memoized digests."""
+        self._hmac_keys.clear()
+        self._blake2b_keys.clear()
+        self._digests.clear()
+
+    def _compute(self, algorithm: HashAlgorithm, secret_key: str, password_hash: str) -> str:
+        cache_key = (algorithm, secret_key, password_hash)
+        if (digest := self._digests.get(cache_key)) is not None:
+            self._digests.move_to_end(cache_key)
+            return digest
+
+        if algorithm == "blake2b":
+            digest = _BLAKE2B_PREFIX + self._blake2b(secret_key, password_hash)
+        else:
+            digest = self._hmac_sha256(secret_key, password_hash)
+
+        self._digests[cache_key] = digest
+        if len(self._digests) > self.max_entries:
+            self._digests.popitem(last=False)
+        return digest
+
+    def _hmac_sha256(self, secret_key: str, password_hash: str) -> str:
+        if (keyed := self._hmac_keys.get(secret_key)) is None:
+            keyed = self._hmac_keys[secret_key] = hmac.new(derive_key(secret_key), digestmod=hashlib.sha256)
+        mac = keyed.copy()
+        mac.update(password_hash.encode())
+        return mac.hexdigest()
+
+    def _blake2b(self, secret_key: str, password_hash: str) -> str:
+        if (keyed := self._blake2b_keys.get(secret_key)) is None:
+            keyed = self._blake2b_keys[secret_key] = hashlib.blake2b(key=derive_key(secret_key), digest_size=32)
+        mac = keyed.copy()
+        mac.update(password_hash.encode())
+        return mac.hexdigest()
+
+
+default_session_auth_hasher = SessionAuthHasher()
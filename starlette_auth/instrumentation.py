@@ -0,0 +1,138 @@
+import bisect
+import contextlib
+import dataclasses
+import enum
+import typing
+
+
+class AuthEventType(enum.StrEnum):
+    USER_LOADED = "user_loaded"
+    BACKEND_CALLED = "backend_called"
+    SESSION_HASH_INVALID = "session_hash_invalid"
+    LOGIN = "login"
+    LOGOUT = "logout"
+    REDIRECT = "redirect"
+    CACHE_HIT = "cache_hit"
+    CACHE_MISS = "cache_miss"
+
+
+@dataclasses.dataclass(frozen=True)
+class AuthEvent:
+    """Instrumentation event.
+    `duration` is in seconds, zero for events that are not timed."""
+
+    type: AuthEventType
+    duration: float = 0.0
+    labels: typing.Mapping[str, str] = dataclasses.field(default_factory=dict)
+
+
+Observer = typing.Callable[[AuthEvent], None]
+
+_O = typing.TypeVar("_O", bound=Observer)
+
+observers: list[Observer] = []
+
+
+def add_observer(observer: Observer) -> None:
+    """Subscribe observer to authentication events."""
+    observers.append(observer)
+
+
+def remove_observer(observer: Observer) -> None:
+    """Unsubscribe observer from authentication events."""
+    with contextlib.suppress(ValueError):
+        observers.remove(observer)
+
+
+@contextlib.contextmanager
+def observe(observer: _O) -> typing.Generator[_O, None, None]:
+    """Subscribe observer for the duration of the context."""
+    add_observer(observer)
+    try:
+        yield observer
+    finally:
+        remove_observer(observer)
+
+
+def emit(event_type: AuthEventType, duration: float = 0.0, **labels: str) -> None:
+    """Send event to all observers.
+    Callers on hot paths should check `observers` first to avoid building events nobody listens to."""
+    event = AuthEvent(type=event_type, duration=duration, labels=labels)
+    for observer in observers:
+        observer(event)
+
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+
+@dataclasses.dataclass
+class Histogram:
+    buckets: tuple[float, ...] = DEFAULT_BUCKETS
+    counts: list[int] = dataclasses.field(default_factory=list)
+    sum: float = 0.0
+    count: int = 0
+
+    def __post_init__(self) -> None:
+        self.counts = [0] * (len(self.buckets) + 1)
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsObserver:
+    """Collect events as Prometheus-style counters and histograms.
+
+    Every event increments `starlette_auth_events_total`, timed events are also observed
+    by `starlette_auth_event_duration_seconds` histogram. Use `render` to produce
+    Prometheus text exposition format, or copy values into your metrics library.
+
+    Usage:
+        metrics = MetricsObserver()
+        add_observer(metrics)
+    """
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        self.buckets = buckets
+        self.counters: dict[tuple[str, tuple[tuple[str, str], ...]], int] = {}
+        self.histograms: dict[tuple[str, tuple[tuple[str, str], ...]], Histogram] = {}
+
+    def __call__(self, event: AuthEvent) -> None:
+        key = (str(event.type), tuple(sorted(event.labels.items())))
+        self.counters[key] = self.counters.get(key, 0) + 1
+        if event.duration:
+            if (histogram := self.histograms.get(key)) is None:
+                histogram = self.histograms[key] = Histogram(self.buckets)
+            histogram.observe(event.duration)
+
+    def count(self, event_type: AuthEventType, **labels: str) -> int:
+        """Return counter value of the event with exactly these labels."""
+        return self.counters.get((str(event_type), tuple(sorted(labels.items()))), 0)
+
+    def render(self) -> str:
+        """Render metrics in Prometheus text exposition format."""
+        lines = ["# TYPE starlette_auth_events_total counter"]
+        for (event_type, labels), value in sorted(self.counters.items()):
+            lines.append(f"starlette_auth_events_total{_format_labels(event_type, labels)} {value}")
+
+        lines.append("# TYPE starlette_auth_event_duration_seconds histogram")
+        for (event_type, labels), histogram in sorted(self.histograms.items()):
+            cumulative = 0
+            for bucket, count in zip([*map(str, histogram.buckets), "+Inf"], histogram.counts):
+                cumulative += count
+                bucket_labels = _format_labels(event_type, (*labels, ("le", bucket)))
+                lines.append(f"starlette_auth_event_duration_seconds_bucket{bucket_labels} {cumulative}")
+            series_labels = _format_labels(event_type, labels)
+            lines.append(f"starlette_auth_event_duration_seconds_sum{series_labels} {histogram.sum}")
+            lines.append(f"starlette_auth_event_duration_seconds_count{series_labels} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(event_type: str, labels: tuple[tuple[str, str], ...]) -> str:
+    values = ",".join(f'{name}="{_escape(value)}"' for name, value in (("event", event_type), *labels))
+    return "{" + values + "}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
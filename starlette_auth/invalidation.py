@@ -0,0 +1,203 @@
+import abc
+import asyncio
+import contextlib
+import json
+import os
+import pathlib
+import socket
+import typing
+import uuid
+
+Subscriber = typing.Callable[[typing.Sequence[str]], None]
+
+USER_PREFIX = "user:"
+
+
+def user_key(user_id: str) -> str:
+    """Invalidation key of cached user data."""
+    return USER_PREFIX + user_id
+
+
+class InvalidationBus(abc.ABC):
+    """Deliver cache invalidations to all subscribers, on this node and on others.
+
+    Published keys are collected for `delay` seconds and delivered as one batch,
+    duplicate keys within a batch are coalesced. Subscribers receive unique keys and must treat them
+    idempotently: invalidating a key twice has the same effect as once.
+
+    The bus is bound to the event loop it is started, subscribed or published in. Keys published
+    from other threads (e.g. sync views running in the thread pool) are handed over to that loop.
+    Publishing before the bus is bound to a loop raises RuntimeError, call `await bus.start()`
+    at application startup.
+    """
+
+    def __init__(self, *, delay: float = 0.01, max_batch_size: int = 500) -> None:
+        assert max_batch_size > 0, "max_batch_size must be positive"
+        self.delay = delay
+        self.max_batch_size = max_batch_size
+        self.subscribers: list[Subscriber] = []
+        self._pending: dict[str, None] = {}  # ordered set
+        self._flush_task: asyncio.Task[None] | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    async def start(self) -> None:
+        """Bind the bus to the running event loop."""
+        self._loop = asyncio.get_running_loop()
+
+    def subscribe(self, subscriber: Subscriber) -> None:
+        self.subscribers.append(subscriber)
+        with contextlib.suppress(RuntimeError):
+            self._loop = self._loop or asyncio.get_running_loop()
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        with contextlib.suppress(ValueError):
+            self.subscribers.remove(subscriber)
+
+    def publish(self, key: str) -> None:
+        """Schedule invalidation of the key. Safe to call from any thread."""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            if self._loop is None or self._loop.is_closed():
+                raise RuntimeError("Invalidation bus is not bound to an event loop, call `await bus.start()`.")
+            self._loop.call_soon_threadsafe(self.publish, key)
+            return
+
+        self._loop = loop
+        self._pending[key] = None
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = loop.create_task(self._flush_later())
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.delay)
+        await self.flush()
+
+    async def flush(self) -> None:
+        """Send all pending keys now."""
+        keys, self._pending = list(self._pending), {}
+        for start in range(0, len(keys), self.max_batch_size):
+            await self.send(keys[start : start + self.max_batch_size])
+
+    def deliver(self, keys: typing.Sequence[str]) -> None:
+        """Pass received keys to the subscribers of this node."""
+        for subscriber in list(self.subscribers):
+            subscriber(keys)
+
+    @abc.abstractmethod
+    async def send(self, keys: typing.Sequence[str]) -> None:  # pragma: no cover
+        """Transport a batch of keys to subscribers of all nodes, including this one."""
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        """Send pending keys and stop."""
+        if self._flush_task is not None and not self._flush_task.done():
+            self._flush_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._flush_task
+        await self.flush()
+
+
+class InProcessInvalidationBus(InvalidationBus):
+    """Deliver invalidations within the process. Use it for single-process deployments and tests."""
+
+    async def send(self, keys: typing.Sequence[str]) -> None:
+        self.deliver(keys)
+
+
+class LocalSocketInvalidationBus(InvalidationBus):
+    """Deliver invalidations to all processes of a host via unix datagram sockets.
+
+    Every node binds a socket in `directory` and sends batches to all sockets found there.
+    Batches carry the node id, the boot id of the bus and a sequence number, so repeated batches are dropped
+    and a node restarted with the same `node_id` is not mistaken for replays.
+    Datagrams to busy or dead peers are dropped, keep cache TTLs as a safety net.
+    A fixed `node_id` must be unique among running nodes, `start` replaces the socket left by a crashed node.
+    This is a stand-in for a message broker in deployments without one.
+
+    Usage:
+        bus = LocalSocketInvalidationBus("/run/myapp/invalidation")
+        await bus.start()
+    """
+
+    def __init__(
+        self,
+        directory: str | os.PathLike[str],
+        *,
+        node_id: str | None = None,
+        delay: float = 0.01,
+        max_batch_size: int = 500,
+    ) -> None:
+        super().__init__(delay=delay, max_batch_size=max_batch_size)
+        self.directory = pathlib.Path(directory)
+        self.node_id = node_id or uuid.uuid4().hex
+        self.path = self.directory / f"{self.node_id}.sock"
+        self.boot_id = uuid.uuid4().hex
+        self._sequence = 0
+        self._last_seen: dict[tuple[str, str], int] = {}
+        self._socket: socket.socket | None = None
+
+    async def start(self) -> None:
+        await super().start()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._socket.setblocking(False)
+        with contextlib.suppress(FileNotFoundError):
+            self.path.unlink()  # left by a crashed node with the same node id
+        self._socket.bind(str(self.path))
+        asyncio.get_running_loop().add_reader(self._socket.fileno(), self._receive)
+
+    async def send(self, keys: typing.Sequence[str]) -> None:
+        self.deliver(keys)
+        if self._socket is None:
+            return
+
+        self._sequence += 1
+        message = json.dumps(
+            {"node": self.node_id, "boot": self.boot_id, "seq": self._sequence, "keys": list(keys)}
+        ).encode()
+        for peer in self.directory.glob("*.sock"):
+            if peer == self.path:
+                continue
+            with contextlib.suppress(OSError):  # peer is gone or its buffer is full
+                self._socket.sendto(message, str(peer))
+
+    def _receive(self) -> None:
+        assert self._socket
+        while True:
+            try:
+                data = self._socket.recv(1 << 20)
+            except (BlockingIOError, InterruptedError):
+                return
+            try:
+                message = json.loads(data)
+                sender, sequence, keys = (message["node"], message["boot"]), message["seq"], message["keys"]
+            except (ValueError, KeyError, TypeError):
+                continue
+            if sequence <= self._last_seen.get(sender, 0):
+                continue  # already delivered
+            self._last_seen[sender] = sequence
+            self.deliver(keys)
+
+    async def close(self) -> None:
+        await super().close()
+        if self._socket is not None:
+            asyncio.get_running_loop().remove_reader(self._socket.fileno())
+            self._socket.close()
+            self._socket = None
+            with contextlib.suppress(FileNotFoundError):
+                self.path.unlink()
+
+
+default_bus: InvalidationBus | None = None
+
+
+def set_default_bus(bus: InvalidationBus | None) -> None:
+    """Set the bus that `update_session_auth_hash` and `logout` publish to."""
+    global default_bus
+    default_bus = bus
+
+
+def publish(key: str) -> None:
+    """Publish the key to the default bus, if any."""
+    if default_bus is not None:
+        default_bus.publish(key)
@@ -0,0 +1,115 @@
+import asyncio
+import dataclasses
+import time
+import typing
+
+from starlette.authentication import BaseUser
+from starlette.requests import HTTPConnection
+
+BulkUserFinder = typing.Callable[[list[str]], typing.Awaitable[typing.Mapping[str, BaseUser]]]
+
+
+@dataclasses.dataclass
+class BatchStats:
+    """Accumulated statistics of batched loads."""
+
+    batches: int = 0
+    loaded_ids: int = 0
+    total_latency: float = 0.0
+    max_latency: float = 0.0
+    last_latency: float = 0.0
+    max_batch_size: int = 0
+
+    @property
+    def average_latency(self) -> float:
+        return self.total_latency / self.batches if self.batches else 0.0
+
+    @property
+    def average_batch_size(self) -> float:
+        return self.loaded_ids / self.batches if self.batches else 0.0
+
+    def record(self, size: int, latency: float) -> None:
+        self.batches += 1
+        self.loaded_ids += size
+        self.total_latency += latency
+        self.last_latency = latency
+        self.max_latency = max(self.max_latency, latency)
+        self.max_batch_size = max(self.max_batch_size, size)
+
+
+class BatchUserLoader:
+    """Collect user ids requested during the same event loop tick (or `delay` seconds)
+    and load them with a single call to `load_many`.
+
+    `load_many` receives a list of unique user ids and returns a mapping of id to user.
+    Ids missing from the mapping resolve to None.
+
+    Usage:
+        async def load_many(ids: list[str]) -> dict[str, User]:
+            return {user.id: user for user in await db.fetch_users(ids)}
+
+        backend = SessionBackend(user_loader=BatchUserLoader(load_many), secret_key="key")
+    """
+
+    def __init__(
+        self,
+        load_many: BulkUserFinder,
+        *,
+        max_batch_size: int = 100,
+        delay: float = 0,
+        clock: typing.Callable[[], float] = time.perf_counter,
+    ) -> None:
+        assert max_batch_size > 0, "max_batch_size must be positive"
+        self.load_many = load_many
+        self.max_batch_size = max_batch_size
+        self.delay = delay
+        self.clock = clock
+        self.stats = BatchStats()
+        self._queue: dict[str, asyncio.Future[BaseUser | None]] = {}
+        self._dispatcher: asyncio.Task[None] | None = None
+        self._running: set[asyncio.Task[None]] = set()
+
+    async def __call__(self, conn: HTTPConnection, user_id: str) -> BaseUser | None:
+        return await self.load(user_id)
+
+    async def load(self, user_id: str) -> BaseUser | None:
+        """Schedule user id for loading and wait for the batch to complete."""
+        if (future := self._queue.get(user_id)) is None:
+            future = asyncio.get_running_loop().create_future()
+            self._queue[user_id] = future
+            if len(self._queue) >= self.max_batch_size:
+                self._dispatch(self._take_queue())
+            elif self._dispatcher is None:
+                self._dispatcher = asyncio.create_task(self._dispatch_later())
+        return await asyncio.shield(future)
+
+    def _take_queue(self) -> dict[str, asyncio.Future[BaseUser | None]]:
+        queue, self._queue = self._queue, {}
+        return queue
+
+    async def _dispatch_later(self) -> None:
+        await asyncio.sleep(self.delay)
+        self._dispatcher = None
+        if self._queue:
+            await self._run_batch(self._take_queue())
+
+    def _dispatch(self, batch: dict[str, asyncio.Future[BaseUser | None]]) -> None:
+        task = asyncio.create_task(self._run_batch(batch))
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+
+    async def _run_batch(self, batch: dict[str, asyncio.Future[BaseUser | None]]) -> None:
+        started_at = self.clock()
+        try:
+            users = await self.load_many(list(batch))
+        except Exception as ex:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(ex)
+            return
+        finally:
+            self.stats.record(len(batch), self.clock() - started_at)
+
+        for user_id, future in batch.items():
+            if not future.done():
+                future.set_result(users.get(user_id))
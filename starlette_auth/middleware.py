@@ -0,0 +1,257 @@
+import enum
+import re
+import typing
+import weakref
+
+from starlette.authentication import AuthenticationBackend, AuthenticationError, UnauthenticatedUser
+from starlette.requests import HTTPConnection
+from starlette.responses import PlainTextResponse, Response
+from starlette.routing import BaseRoute, Match
+from starlette.status import WS_1008_POLICY_VIOLATION
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from starlette_auth.authentication import (
+    ensure_user,
+    LazyUser,
+    LoginRequiredMiddleware,
+    LoginScopes,
+    MultiBackend,
+    path_to_regex,
+)
+from starlette_auth.scopes import scope_registry, Scopes
+
+
+class AuthPolicy(enum.StrEnum):
+    ANONYMOUS = "anonymous"  # do not authenticate
+    SESSION = "session"  # session backends only
+    TOKEN = "token"  # token backends only
+    ANY = "any"  # session backends, then token backends
+
+
+class AuthMiddleware(LoginRequiredMiddleware):
+    """Authenticate connections with backends selected by path policy.
+    Replaces the pair of Starlette's AuthenticationMiddleware and LoginRequiredMiddleware.
+
+    `policies` maps paths to policies, the first matching path wins. Paths ending with "*" match as prefixes.
+    Connections to other paths use `default_policy`. Anonymous paths skip authentication completely.
+
+    When `login_required` is set, unauthenticated users are redirected to the login page
+    (websocket connections are closed) unless the path is anonymous or listed in `public_paths`.
+
+    Usage:
+        AuthMiddleware(
+            app,
+            session_backends=[SessionBackend(user_loader, secret_key="key")],
+            token_backends=[SignedTokenBackend(user_loader, secret_key="key")],
+            policies={"/static/*": AuthPolicy.ANONYMOUS, "/api/*": AuthPolicy.TOKEN, "/login": AuthPolicy.SESSION},
+            login_required=True,
+            public_paths=["/login", "/api/*"],
+        )
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        *,
+        session_backends: typing.Sequence[AuthenticationBackend] = (),
+        token_backends: typing.Sequence[AuthenticationBackend] = (),
+        policies: typing.Mapping[str, AuthPolicy] | None = None,
+        default_policy: AuthPolicy = AuthPolicy.ANY,
+        strategy: typing.Literal["sequential", "race"] = "sequential",
+        login_required: bool = False,
+        redirect_url: str | None = None,
+        path_name: str | None = "login",
+        path_params: dict[str, typing.Any] | None = None,
+        public_paths: typing.Iterable[str] = (),
+        on_error: typing.Callable[[HTTPConnection, AuthenticationError], Response] | None = None,
+    ) -> None:
+        super().__init__(
+            app, redirect_url=redirect_url, path_name=path_name, path_params=path_params, public_paths=public_paths
+        )
+        self.login_required = login_required
+        self.default_policy = AuthPolicy(default_policy)
+        self.on_error = on_error or self.default_on_error
+        self.backends: dict[AuthPolicy, MultiBackend | None] = {
+            AuthPolicy.ANONYMOUS: None,
+            AuthPolicy.SESSION: MultiBackend(list(session_backends), strategy=strategy),
+            AuthPolicy.TOKEN: MultiBackend(list(token_backends), strategy=strategy),
+            AuthPolicy.ANY: MultiBackend([*session_backends, *token_backends], strategy=strategy),
+        }
+
+        # every path gets a named group, the name of the matched group tells the policy
+        self._policies: list[AuthPolicy] = []
+        patterns: list[str] = []
+        for index, (path, policy) in enumerate((policies or {}).items()):
+            self._policies.append(AuthPolicy(policy))
+            patterns.append(f"(?P<p{index}>{path_to_regex(path)})")
+        self._policy_pattern = re.compile("|".join(patterns)) if patterns else None
+
+    def get_policy(self, path: str) -> AuthPolicy:
+        if self._policy_pattern and (match := self._policy_pattern.match(path)):
+            return self._policies[int(typing.cast(str, match.lastgroup)[1:])]
+        return self.default_policy
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] not in {"http", "websocket"}:
+            await self.app(scope, receive, send)
+            return
+
+        policy = self.get_policy(scope["path"])
+        if (backend := self.backends[policy]) is None:
+            scope["auth"], scope["user"] = scope_registry.credentials(), UnauthenticatedUser()
+            await self.app(scope, receive, send)
+            return
+
+        conn = HTTPConnection(scope)
+        try:
+            result = await backend.authenticate(conn)
+        except AuthenticationError as exc:
+            if scope["type"] == "websocket":
+                await send({"type": "websocket.close", "code": 1000})
+            else:
+                await self.on_error(conn, exc)(scope, receive, send)
+            return
+
+        scope["auth"], scope["user"] = result or (scope_registry.credentials(), UnauthenticatedUser())
+        if not self.login_required or (self.public_paths and self.public_paths.match(scope["path"])):
+            await self.app(scope, receive, send)
+            return
+
+        await self.require_login(scope, receive, send)
+
+    @staticmethod
+    def default_on_error(conn: HTTPConnection, exc: AuthenticationError) -> Response:
+        return PlainTextResponse(str(exc), status_code=400)
+
+
+ScopeRequirement = typing.Sequence[str] | typing.Mapping[str, typing.Sequence[str]]
+_Requirement = tuple[dict[str, frozenset[str]], frozenset[str]]
+_RouteTable = dict[int, tuple[BaseRoute, dict[str, frozenset[str]], frozenset[str]]]
+
+
+def _granted_scopes(scope: Scope) -> frozenset[str]:
+    if (credentials := scope.get("auth")) is None:
+        return frozenset()
+    scopes = credentials.scopes
+    return scopes.members if isinstance(scopes, Scopes) else frozenset(scopes)
+
+
+class ScopeRequirementsMiddleware(LoginRequiredMiddleware):
+    """Enforce required scopes per route and HTTP method.
+
+    `requirements` maps route names (with mount namespaces, e.g. "admin:users") to scopes
+    required for all methods, or to a mapping of methods to scopes where "*" applies to other methods.
+    HEAD requests use the GET requirement unless HEAD is configured explicitly.
+    Requirements are compiled into a lookup table keyed by route once per application, every connection
+    then costs one route lookup and one set containment test. Routes of the application are not modified.
+    Connections that lack `LoginScopes.FRESH` are redirected to the login page to re-enter credentials,
+    other missing scopes result in 403. Websocket connections are closed instead.
+
+    Add this middleware after the authentication middleware. Requirements of routes the application
+    does not have raise ValueError on startup.
+
+    Usage:
+        ScopeRequirementsMiddleware(
+            app,
+            requirements={
+                "users": {"POST": ["users:write"], "*": ["users:read"]},
+                "change_password": [LoginScopes.FRESH],
+            },
+        )
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        requirements: typing.Mapping[str, ScopeRequirement],
+        *,
+        redirect_url: str | None = None,
+        path_name: str | None = "login",
+        path_params: dict[str, typing.Any] | None = None,
+    ) -> None:
+        super().__init__(app, redirect_url=redirect_url, path_name=path_name, path_params=path_params)
+        self.requirements: dict[str, _Requirement] = {}
+        for name, requirement in requirements.items():
+            if isinstance(requirement, typing.Mapping):
+                by_method = {method.upper(): frozenset(scopes) for method, scopes in requirement.items()}
+                if "GET" in by_method:
+                    by_method.setdefault("HEAD", by_method["GET"])
+                self.requirements[name] = by_method, by_method.pop("*", frozenset())
+            else:
+                scopes = [requirement] if isinstance(requirement, str) else requirement
+                self.requirements[name] = {}, frozenset(scopes)
+        self._tables: weakref.WeakKeyDictionary[typing.Any, tuple[tuple[int, int], _RouteTable]] = (
+            weakref.WeakKeyDictionary()
+        )
+
+    def compile(self, app: typing.Any) -> _RouteTable:
+        """Return the table of requirements keyed by route id, built once per application.
+        Raises ValueError when requirements name routes the application does not have,
+        so a typo does not leave a route unprotected."""
+        routes = app.router.routes
+        routes_version = (id(routes), len(routes))
+        if (compiled := self._tables.get(app)) and compiled[0] == routes_version:
+            return compiled[1]
+
+        table: _RouteTable = {}
+        found: set[str] = set()
+        self._collect(routes, "", table, found)
+        if missing := sorted(set(self.requirements) - found):
+            raise ValueError(f"Scope requirements reference unknown routes: {', '.join(missing)}.")
+        self._tables[app] = routes_version, table
+        return table
+
+    def _collect(
+        self, routes: typing.Iterable[typing.Any], namespace: str, table: _RouteTable, found: set[str]
+    ) -> None:
+        for route in routes:
+            name = namespace + route.name if getattr(route, "name", None) else ""
+            if isinstance(child_routes := getattr(route, "routes", None), list):
+                self._collect(child_routes, name + ":" if name else namespace, table, found)
+            elif name in self.requirements:
+                # keep the route referenced, so its id is not reused while the table exists
+                table[id(route)] = route, *self.requirements[name]
+                found.add(name)
+
+    @staticmethod
+    def resolve(routes: typing.Iterable[BaseRoute], scope: Scope) -> BaseRoute | None:
+        """Return the route that the router selects for the connection, like Router does it."""
+        for route in routes:
+            match, child_scope = route.matches(scope)
+            if match != Match.FULL:
+                continue
+            if isinstance(child_routes := getattr(route, "routes", None), list):
+                return ScopeRequirementsMiddleware.resolve(child_routes, {**scope, **child_scope})
+            return route
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "lifespan" and "app" in scope:
+            self.compile(scope["app"])  # fail on startup when requirements reference unknown routes
+        if scope["type"] not in {"http", "websocket"} or "app" not in scope:
+            await self.app(scope, receive, send)
+            return
+
+        app = scope["app"]
+        if table := self.compile(app):
+            route = self.resolve(app.router.routes, scope)
+            if route is not None and (entry := table.get(id(route))):
+                _, by_method, default = entry
+                required = by_method.get(scope.get("method", ""), default)
+                if required and isinstance(scope.get("user"), LazyUser):
+                    await ensure_user(HTTPConnection(scope))  # scopes of lazy users are known once loaded
+                if required and not required <= _granted_scopes(scope):
+                    await self.deny(scope, receive, send, required)
+                    return
+        await self.app(scope, receive, send)
+
+    async def deny(self, scope: Scope, receive: Receive, send: Send, required: frozenset[str]) -> None:
+        """Redirect to re-login when fresh login is required, otherwise respond with 403."""
+        if LoginScopes.FRESH in required and LoginScopes.FRESH not in _granted_scopes(scope):
+            await self.redirect_to_login(scope, send)
+            return
+
+        if scope["type"] == "websocket":
+            await send({"type": "websocket.close", "code": WS_1008_POLICY_VIOLATION})
+            return
+        await PlainTextResponse("Forbidden", status_code=403)(scope, receive, send)
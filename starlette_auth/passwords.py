@@ -0,0 +1,233 @@
+import abc
+import asyncio
+import base64
+import concurrent.futures
+import functools
+import hashlib
+import hmac
+import secrets
+import typing
+
+_T = typing.TypeVar("_T")
+
+
+class HashingOverloaded(Exception):
+    """Too many password hashing operations are waiting for the executor."""
+
+
+class PasswordHasher(abc.ABC):
+    """Password hash format. Encoded hashes look like "<algorithm>$<parameters>$<salt>$<hash>",
+    so parameters can be changed without invalidating stored hashes."""
+
+    algorithm: typing.ClassVar[str]
+
+    @abc.abstractmethod
+    def encode(self, password: str, salt: str) -> str:  # pragma: no cover
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def decode(self, encoded: str) -> tuple[str, dict[str, int]]:  # pragma: no cover
+        """Return salt and parameters of the encoded hash. Raises ValueError for malformed hashes."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def parameters(self) -> dict[str, int]:  # pragma: no cover
+        """Return current parameters."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def with_parameters(self, parameters: dict[str, int]) -> "PasswordHasher":  # pragma: no cover
+        raise NotImplementedError
+
+    def salt(self) -> str:
+        return secrets.token_urlsafe(16)
+
+    def verify(self, password: str, encoded: str) -> bool:
+        try:
+            salt, parameters = self.decode(encoded)
+        except ValueError:
+            return False
+        hasher = self if parameters == self.parameters() else self.with_parameters(parameters)
+        return hmac.compare_digest(hasher.encode(password, salt).encode(), encoded.encode())
+
+    def must_update(self, encoded: str) -> bool:
+        """Test if the hash was computed with other parameters."""
+        try:
+            return self.decode(encoded)[1] != self.parameters()
+        except ValueError:
+            return True
+
+
+def _b64(data: bytes) -> str:
+    return base64.b64encode(data).decode("ascii").strip()
+
+
+class PBKDF2Hasher(PasswordHasher):
+    """PBKDF2-HMAC-SHA256, the format is compatible with Django."""
+
+    algorithm = "pbkdf2_sha256"
+
+    def __init__(self, iterations: int = 600_000) -> None:
+        self.iterations = iterations
+
+    def encode(self, password: str, salt: str) -> str:
+        digest = hashlib.pbkdf2_hmac("sha256", password.encode(), salt.encode(), self.iterations)
+        return f"{self.algorithm}${self.iterations}${salt}${_b64(digest)}"
+
+    def decode(self, encoded: str) -> tuple[str, dict[str, int]]:
+        algorithm, iterations, salt, _ = encoded.split("$", 3)
+        if algorithm != self.algorithm:
+            raise ValueError(f"Not a {self.algorithm} hash.")
+        return salt, {"iterations": int(iterations)}
+
+    def parameters(self) -> dict[str, int]:
+        return {"iterations": self.iterations}
+
+    def with_parameters(self, parameters: dict[str, int]) -> "PBKDF2Hasher":
+        return PBKDF2Hasher(**parameters)
+
+
+class ScryptHasher(PasswordHasher):
+    """scrypt, the format is compatible with Django."""
+
+    algorithm = "scrypt"
+
+    def __init__(self, n: int = 2**14, r: int = 8, p: int = 1) -> None:
+        self.n = n
+        self.r = r
+        self.p = p
+
+    def encode(self, password: str, salt: str) -> str:
+        digest = hashlib.scrypt(
+            password.encode(), salt=salt.encode(), n=self.n, r=self.r, p=self.p, maxmem=256 * self.n * self.r, dklen=64
+        )
+        return f"{self.algorithm}${self.n}${salt}${self.r}${self.p}${_b64(digest)}"
+
+    def decode(self, encoded: str) -> tuple[str, dict[str, int]]:
+        algorithm, n, salt, r, p, _ = encoded.split("$", 5)
+        if algorithm != self.algorithm:
+            raise ValueError(f"Not a {self.algorithm} hash.")
+        return salt, {"n": int(n), "r": int(r), "p": int(p)}
+
+    def parameters(self) -> dict[str, int]:
+        return {"n": self.n, "r": self.r, "p": self.p}
+
+    def with_parameters(self, parameters: dict[str, int]) -> "ScryptHasher":
+        return ScryptHasher(**parameters)
+
+
+class PasswordVerifier:
+    """Hash and verify passwords without blocking the event loop.
+
+    Hashing runs in `executor` (a thread pool by default, hashlib releases the GIL while hashing),
+    at most `max_concurrency` operations at once. When `max_queue` operations are already waiting,
+    new ones fail with `HashingOverloaded` instead of piling up behind slow logins.
+
+    The first of `hashers` hashes new passwords, the others only verify old hashes.
+    `verify_and_update` returns a new hash when the stored one uses another format or parameters,
+    store it to upgrade hashes transparently on login.
+
+    For unknown users pass None as the stored hash, a dummy hash is verified then,
+    so the response time does not reveal whether the user exists.
+
+    Usage:
+        verifier = PasswordVerifier([ScryptHasher(), PBKDF2Hasher()])
+
+        async def login_view(request):
+            user = await find_user(username)
+            valid, new_hash = await verifier.verify_and_update(password, user.password if user else None)
+            if not valid:
+                ...
+            if new_hash:
+                await save_password_hash(user, new_hash)
+            await login(request, user, secret_key=...)
+    """
+
+    def __init__(
+        self,
+        hashers: typing.Sequence[PasswordHasher] | None = None,
+        *,
+        executor: concurrent.futures.Executor | None = None,
+        max_concurrency: int = 4,
+        max_queue: int = 64,
+    ) -> None:
+        self.hashers = list(hashers or [PBKDF2Hasher()])
+        assert self.hashers, "at least one hasher is required"
+        self.max_queue = max_queue
+        self._executor = executor
+        self._own_executor = executor is None
+        self._max_concurrency = max_concurrency
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._waiting = 0
+        self._dummy_hash: str | None = None
+
+    @property
+    def preferred(self) -> PasswordHasher:
+        return self.hashers[0]
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of operations waiting for a free executor slot."""
+        return self._waiting
+
+    def identify(self, encoded: str) -> PasswordHasher | None:
+        algorithm = encoded.split("$", 1)[0]
+        return next((hasher for hasher in self.hashers if hasher.algorithm == algorithm), None)
+
+    async def hash(self, password: str) -> str:
+        """Hash password with the preferred hasher."""
+        return await self._run(self.preferred.encode, password, self.preferred.salt())
+
+    async def verify(self, password: str, encoded: str | None) -> bool:
+        """Check password against the stored hash."""
+        hasher = self.identify(encoded) if encoded else None
+        if encoded is None or hasher is None:
+            # spend the same time as for existing users
+            await self._run(self.preferred.verify, password, await self._get_dummy_hash())
+            return False
+        return await self._run(hasher.verify, password, encoded)
+
+    async def verify_and_update(self, password: str, encoded: str | None) -> tuple[bool, str | None]:
+        """Check password and return new hash if the stored one is outdated."""
+        if not await self.verify(password, encoded):
+            return False, None
+
+        assert encoded
+        if self.needs_update(encoded):
+            return True, await self.hash(password)
+        return True, None
+
+    def needs_update(self, encoded: str) -> bool:
+        """Test if the hash was computed by an outdated hasher or with outdated parameters."""
+        return self.identify(encoded) is not self.preferred or self.preferred.must_update(encoded)
+
+    async def close(self) -> None:
+        if self._own_executor and self._executor:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    async def _get_dummy_hash(self) -> str:
+        if self._dummy_hash is None:
+            self._dummy_hash = await self.hash(secrets.token_urlsafe(16))
+        return self._dummy_hash
+
+    async def _run(self, fn: typing.Callable[..., _T], *args: typing.Any) -> _T:
+        if self._semaphore.locked():
+            if self._waiting >= self.max_queue:
+                raise HashingOverloaded("Too many password hashing operations are waiting.")
+            self._waiting += 1
+            try:
+                await self._semaphore.acquire()
+            finally:
+                self._waiting -= 1
+        else:
+            await self._semaphore.acquire()
+
+        try:
+            if self._executor is None:
+                self._executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=self._max_concurrency, thread_name_prefix="password_hasher"
+                )
+            return await asyncio.get_running_loop().run_in_executor(self._executor, functools.partial(fn, *args))
+        finally:
+            self._semaphore.release()
@@ -0,0 +1,258 @@
+import abc
+import asyncio
+import contextlib
+import dataclasses
+import hashlib
+import hmac
+import secrets
+import time
+import typing
+
+from starlette.authentication import AuthCredentials, AuthenticationBackend, BaseUser
+from starlette.requests import HTTPConnection
+from starlette.responses import Response
+
+from starlette_auth.authentication import (
+    BackendCondition,
+    ByIdUserFinder,
+    get_scopes,
+    LoginScopes,
+    start_session,
+)
+from starlette_auth.revocation import SessionGenerations
+from starlette_auth.scopes import scope_registry
+
+REMEMBER_ME_SCOPE_KEY = "remember_me_token"
+
+
+@dataclasses.dataclass
+class RememberMeToken:
+    series: str
+    token_hash: str
+    user_id: str
+    created_at: float
+    last_used_at: float
+    # global and user session generations at issue time, see `SessionGenerations`
+    generations: tuple[int, int] | None = None
+
+
+class RememberMeStore(abc.ABC):  # pragma: no cover
+    @abc.abstractmethod
+    async def get(self, series: str) -> RememberMeToken | None:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def save(self, token: RememberMeToken) -> None:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def delete(self, series: str) -> None:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def delete_for_user(self, user_id: str) -> None:
+        """Delete all tokens of the user."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def update_last_used(self, timestamps: typing.Mapping[str, float]) -> None:
+        """Update last use time of many tokens at once. Unknown series are ignored."""
+        raise NotImplementedError
+
+
+class InMemoryRememberMeStore(RememberMeStore):
+    def __init__(self) -> None:
+        self.tokens: dict[str, RememberMeToken] = {}
+
+    async def get(self, series: str) -> RememberMeToken | None:
+        return self.tokens.get(series)
+
+    async def save(self, token: RememberMeToken) -> None:
+        self.tokens[token.series] = token
+
+    async def delete(self, series: str) -> None:
+        self.tokens.pop(series, None)
+
+    async def delete_for_user(self, user_id: str) -> None:
+        for series in [series for series, token in self.tokens.items() if token.user_id == user_id]:
+            del self.tokens[series]
+
+    async def update_last_used(self, timestamps: typing.Mapping[str, float]) -> None:
+        for series, last_used_at in timestamps.items():
+            if token := self.tokens.get(series):
+                token.last_used_at = last_used_at
+
+
+def _hash_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class RememberMeBackend(AuthenticationBackend):
+    """Authenticate users by persistent remember-me cookies.
+
+    The cookie holds a series id and a token, the store keeps only token hashes.
+    The token is rotated on every use. A known series with a wrong token means
+    the cookie was stolen and used, all tokens of the user are deleted then.
+
+    Successful authentication logs the user into the session with `LoginScopes.REMEMBERED` scope,
+    like `login` does, so put this backend after `SessionBackend` and use the same `secret_key`.
+    Call `confirm_login` after the user re-enters credentials.
+
+    When `generations` is set, tokens issued before `SessionGenerations.revoke` or `revoke_all` are rejected
+    and deleted, `revoke` deletes all tokens of the user at once. Pass the same `generations` to `SessionBackend`,
+    the backend stores them in the session of remembered users.
+
+    Last use timestamps are buffered and written to the store in batches every `flush_interval` seconds.
+    Call `close` on application shutdown to write the rest, e.g. in the lifespan handler.
+
+    Usage:
+        backend = RememberMeBackend(InMemoryRememberMeStore(), user_loader, secret_key="key")
+        # login view
+        await backend.remember(request, user)
+        set_remember_me_cookie(response, request, backend)
+        # logout view
+        await backend.forget(request)
+        set_remember_me_cookie(response, request, backend)
+        # lifespan handler, on shutdown
+        await backend.close()
+    """
+
+    def __init__(
+        self,
+        store: RememberMeStore,
+        user_loader: ByIdUserFinder,
+        *,
+        secret_key: str,
+        generations: SessionGenerations | None = None,
+        cookie_name: str = "remember_me",
+        max_age: int = 60 * 60 * 24 * 30,
+        flush_interval: float = 5,
+        clock: typing.Callable[[], float] = time.time,
+    ) -> None:
+        self.store = store
+        self.user_loader = user_loader
+        self.secret_key = secret_key
+        self.generations = generations
+        if generations:
+            generations.revoke_callbacks.append(store.delete_for_user)
+        self.cookie_name = cookie_name
+        self.max_age = max_age
+        self.flush_interval = flush_interval
+        self.clock = clock
+        self.condition = BackendCondition(cookie=cookie_name)
+        self._last_used: dict[str, float] = {}
+        self._flush_at = 0.0
+        self._flush_task: asyncio.Task[None] | None = None
+
+    def read_cookie(self, conn: HTTPConnection) -> tuple[str, str] | None:
+        series, _, token = conn.cookies.get(self.cookie_name, "").partition(":")
+        return (series, token) if series and token else None
+
+    async def authenticate(self, conn: HTTPConnection) -> tuple[AuthCredentials, BaseUser] | None:
+        if not (cookie := self.read_cookie(conn)):
+            return None
+
+        series, token = cookie
+        if not (record := await self.store.get(series)):
+            return None
+
+        now = self.clock()
+        if record.created_at + self.max_age < now:
+            await self.store.delete(series)
+            return None
+
+        if not hmac.compare_digest(record.token_hash, _hash_token(token)):
+            # the series was used with another token, the cookie has been stolen
+            await self.store.delete_for_user(record.user_id)
+            return None
+
+        if self.generations and (record.generations or (0, 0)) != await self.generations.current(record.user_id):
+            # sessions of the user have been revoked after the token was issued
+            await self.store.delete(series)
+            return None
+
+        if not (user := await self.user_loader(conn, record.user_id)):
+            return None
+
+        new_token = secrets.token_urlsafe(32)
+        record.token_hash = _hash_token(new_token)
+        await self.store.save(record)
+        conn.scope[REMEMBER_ME_SCOPE_KEY] = f"{series}:{new_token}"
+        self._touch(series, now)
+
+        if "session" in conn.scope:
+            start_session(conn, user, self.secret_key)
+            if self.generations:
+                await self.generations.remember(conn, user.identity)
+        return scope_registry.credentials((*get_scopes(user), LoginScopes.REMEMBERED)), user
+
+    async def remember(self, conn: HTTPConnection, user: BaseUser) -> str:
+        """Issue new remember-me token for the user.
+        The cookie value is stored in `conn.scope["remember_me_token"]`."""
+        now = self.clock()
+        series, token = secrets.token_urlsafe(16), secrets.token_urlsafe(32)
+        generations = await self.generations.current(user.identity) if self.generations else None
+        await self.store.save(
+            RememberMeToken(
+                series=series,
+                token_hash=_hash_token(token),
+                user_id=user.identity,
+                created_at=now,
+                last_used_at=now,
+                generations=generations,
+            )
+        )
+        cookie_value = conn.scope[REMEMBER_ME_SCOPE_KEY] = f"{series}:{token}"
+        return cookie_value
+
+    async def forget(self, conn: HTTPConnection) -> None:
+        """Delete current remember-me token."""
+        if cookie := self.read_cookie(conn):
+            await self.store.delete(cookie[0])
+            self._last_used.pop(cookie[0], None)
+        conn.scope[REMEMBER_ME_SCOPE_KEY] = ""
+
+    async def flush(self) -> None:
+        """Write buffered last use timestamps to the store."""
+        timestamps, self._last_used = self._last_used, {}
+        self._flush_at = self.clock() + self.flush_interval
+        if timestamps:
+            await self.store.update_last_used(timestamps)
+
+    async def close(self) -> None:
+        """Stop the flush timer and write buffered last use timestamps."""
+        if self._flush_task is not None and not self._flush_task.done():
+            self._flush_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._flush_task
+        self._flush_task = None
+        await self.flush()
+
+    def _touch(self, series: str, now: float) -> None:
+        self._last_used[series] = now
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self) -> None:
+        # the timer writes timestamps even when no other remembered request comes
+        await asyncio.sleep(max(0.0, self._flush_at - self.clock()))
+        await self.flush()
+
+
+def set_remember_me_cookie(
+    response: Response,
+    connection: HTTPConnection,
+    backend: RememberMeBackend,
+    *,
+    secure: bool = True,
+) -> None:
+    """Send issued or rotated remember-me cookie, or delete it after `RememberMeBackend.forget`."""
+    if REMEMBER_ME_SCOPE_KEY not in connection.scope:
+        return
+
+    if value := connection.scope[REMEMBER_ME_SCOPE_KEY]:
+        response.set_cookie(
+            backend.cookie_name, value, max_age=backend.max_age, secure=secure, httponly=True, samesite="lax"
+        )
+    else:
+        response.delete_cookie(backend.cookie_name, secure=secure, httponly=True, samesite="lax")
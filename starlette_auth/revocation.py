@@ -0,0 +1,115 @@
+import abc
+import collections
+import time
+import typing
+
+from starlette.requests import HTTPConnection
+
+from starlette_auth.sessions import set_session_value
+
+SESSION_GENERATION = "__user_gen__"
+GLOBAL_GENERATION_KEY = ""
+
+
+class GenerationStore(abc.ABC):  # pragma: no cover
+    """Storage of session generations.
+    Global generation is stored under the empty key."""
+
+    @abc.abstractmethod
+    async def get_many(self, keys: typing.Sequence[str]) -> list[int]:
+        """Return generations of the keys, unknown keys have generation 0."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def increment(self, key: str) -> int:
+        """Increment generation of the key and return the new value."""
+        raise NotImplementedError
+
+
+class InMemoryGenerationStore(GenerationStore):
+    """Keep generations in process memory. Suitable for tests and single process deployments."""
+
+    def __init__(self) -> None:
+        self.generations: dict[str, int] = {}
+
+    async def get_many(self, keys: typing.Sequence[str]) -> list[int]:
+        return [self.generations.get(key, 0) for key in keys]
+
+    async def increment(self, key: str) -> int:
+        self.generations[key] = self.generations.get(key, 0) + 1
+        return self.generations[key]
+
+
+class SessionGenerations:
+    """Revoke sessions in bulk by bumping generation counters.
+
+    Every session stores the global and the user's generation at login time.
+    The session is valid while both numbers match current values.
+    Current values are cached in process memory for `refresh_interval` seconds,
+    so validation is an integer comparison most of the time.
+
+    Note, with several processes a revocation takes up to `refresh_interval` seconds to propagate.
+
+    `revoke_callbacks` are awaited with the user id on `revoke`, e.g. to delete remember-me tokens.
+
+    Usage:
+        generations = SessionGenerations(InMemoryGenerationStore())
+        backend = SessionBackend(user_loader, secret_key="key", generations=generations)
+        await login(request, user, secret_key="key", generations=generations)
+        await generations.revoke(user.identity)  # logout user everywhere
+        await generations.revoke_all()  # logout everybody
+    """
+
+    def __init__(
+        self,
+        store: GenerationStore,
+        *,
+        refresh_interval: float = 5,
+        max_entries: int = 10_000,
+        clock: typing.Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.store = store
+        self.refresh_interval = refresh_interval
+        self.max_entries = max_entries
+        self.clock = clock
+        self._cache: collections.OrderedDict[str, tuple[float, int]] = collections.OrderedDict()
+        self._global: tuple[float, int] = (0.0, 0)
+        self.revoke_callbacks: list[typing.Callable[[str], typing.Awaitable[None]]] = []
+
+    async def current(self, user_id: str) -> tuple[int, int]:
+        """Return current global and user generations."""
+        now = self.clock()
+        user_entry = self._cache.get(user_id)
+        if user_entry and user_entry[0] > now and self._global[0] > now:
+            self._cache.move_to_end(user_id)
+            return self._global[1], user_entry[1]
+
+        global_generation, user_generation = await self.store.get_many([GLOBAL_GENERATION_KEY, user_id])
+        self._global = (now + self.refresh_interval, global_generation)
+        self._remember(user_id, user_generation)
+        return global_generation, user_generation
+
+    async def is_valid(self, connection: HTTPConnection, user_id: str) -> bool:
+        """Check session generation. Sessions created before generations were enabled have generation 0."""
+        global_generation, user_generation = connection.session.get(SESSION_GENERATION) or (0, 0)
+        return (global_generation, user_generation) == await self.current(user_id)
+
+    async def remember(self, connection: HTTPConnection, user_id: str) -> None:
+        """Store current generations in the session."""
+        set_session_value(connection.session, SESSION_GENERATION, list(await self.current(user_id)))
+
+    async def revoke(self, user_id: str) -> None:
+        """Invalidate all sessions of the user."""
+        self._remember(user_id, await self.store.increment(user_id))
+        for callback in self.revoke_callbacks:
+            await callback(user_id)
+
+    async def revoke_all(self) -> None:
+        """Invalidate all sessions of all users."""
+        self._global = (self.clock() + self.refresh_interval, await self.store.increment(GLOBAL_GENERATION_KEY))
+
+    def _remember(self, key: str, generation: int) -> None:
+        self._cache[key] = (self.clock() + self.refresh_interval, generation)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
@@ -0,0 +1,93 @@
+import sys
+import typing
+
+from starlette.authentication import AuthCredentials
+
+
+def _immutable(*args: typing.Any, **kwargs: typing.Any) -> typing.NoReturn:
+    raise TypeError("Scopes are immutable, create new credentials with ScopeRegistry.credentials().")
+
+
+class Scopes(list[str]):
+    """Immutable list of scopes with O(1) membership checks.
+
+    It is a list subclass, so it compares equal to plain lists and works everywhere
+    Starlette expects `AuthCredentials.scopes`."""
+
+    __slots__ = ("_members",)
+
+    def __init__(self, scopes: typing.Iterable[str] = ()) -> None:
+        super().__init__(dict.fromkeys(scopes))
+        self._members = frozenset(self)
+
+    @property
+    def members(self) -> frozenset[str]:
+        return self._members
+
+    def __contains__(self, scope: object) -> bool:
+        return scope in self._members
+
+    def __hash__(self) -> int:  # type: ignore[override]
+        return hash(self._members)
+
+    # list copies and unpickles by appending items, which is not allowed here
+    def __reduce__(self) -> tuple[type["Scopes"], tuple[list[str]]]:
+        return Scopes, (list(self),)
+
+    def __copy__(self) -> "Scopes":
+        return self
+
+    def __deepcopy__(self, memo: dict[int, typing.Any]) -> "Scopes":
+        return self
+
+    append = extend = insert = remove = pop = clear = sort = reverse = _immutable
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _immutable
+
+
+class SharedCredentials(AuthCredentials):
+    """Credentials shared between all connections with the same set of scopes.
+    Do not modify, ask `ScopeRegistry` for another instance instead."""
+
+    scopes: Scopes
+
+    def __init__(self, scopes: Scopes) -> None:
+        self.scopes = scopes
+
+    def __repr__(self) -> str:
+        return f"<SharedCredentials: {list(self.scopes)}>"
+
+
+class ScopeRegistry:
+    """Intern scope strings and share immutable credentials between connections with identical scope sets.
+
+    At most `max_entries` distinct scope sets are cached, others get new instances on every call."""
+
+    def __init__(self, max_entries: int = 4096) -> None:
+        self.max_entries = max_entries
+        self._credentials: dict[frozenset[str], SharedCredentials] = {}
+
+    def credentials(self, scopes: typing.Iterable[str] = ()) -> SharedCredentials:
+        """Return shared credentials for the scopes."""
+        if not isinstance(scopes, typing.Collection):
+            scopes = tuple(scopes)
+        key = scopes.members if isinstance(scopes, Scopes) else frozenset(scopes)
+        if (credentials := self._credentials.get(key)) is not None:
+            return credentials
+
+        credentials = SharedCredentials(Scopes(sys.intern(str(scope)) for scope in scopes))
+        if len(self._credentials) < self.max_entries:
+            self._credentials[key] = credentials
+        return credentials
+
+    def replace(self, credentials: AuthCredentials, old: str, new: str) -> SharedCredentials:
+        """Return shared credentials where `old` scope is replaced with `new` one."""
+        return self.credentials([new if scope == old else scope for scope in credentials.scopes])
+
+    def clear(self) -> None:
+        self._credentials.clear()
+
+    def __len__(self) -> int:
+        return len(self._credentials)
+
+
+scope_registry = ScopeRegistry()
@@ -0,0 +1,56 @@
+import dataclasses
+import typing
+
+_missing = object()
+
+
+@dataclasses.dataclass
+class SessionWriteStats:
+    """Counters of session writes made by starlette_auth helpers.
+    Every performed write makes the session middleware send a new cookie or update the session store."""
+
+    performed: int = 0
+    avoided: int = 0
+
+    def reset(self) -> None:
+        self.performed = 0
+        self.avoided = 0
+
+
+session_write_stats = SessionWriteStats()
+
+
+def set_session_value(session: typing.MutableMapping[str, typing.Any], key: str, value: typing.Any) -> bool:
+    """Store value in the session unless it already holds the same one.
+    Returns True if the session was modified."""
+    if session.get(key, _missing) == value:
+        session_write_stats.avoided += 1
+        return False
+
+    session[key] = value
+    session_write_stats.performed += 1
+    return True
+
+
+def pop_session_value(session: typing.MutableMapping[str, typing.Any], key: str) -> bool:
+    """Remove value from the session if present.
+    Returns True if the session was modified."""
+    if key not in session:
+        session_write_stats.avoided += 1
+        return False
+
+    del session[key]
+    session_write_stats.performed += 1
+    return True
+
+
+def clear_session(session: typing.MutableMapping[str, typing.Any]) -> bool:
+    """Remove all data from non-empty session.
+    Returns True if the session was modified."""
+    if not session:
+        session_write_stats.avoided += 1
+        return False
+
+    session.clear()
+    session_write_stats.performed += 1
+    return True
@@ -0,0 +1,283 @@
+import contextlib
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+import typing
+
+from starlette.authentication import BaseUser
+from starlette.requests import HTTPConnection
+
+from starlette_auth import instrumentation
+from starlette_auth.authentication import ByIdUserFinder
+from starlette_auth.instrumentation import AuthEventType
+from starlette_auth.invalidation import InvalidationBus, USER_PREFIX, user_key
+
+_MAGIC = b"SAUC\x00\x00\x00\x01"
+# magic, number of slots, slot size, cache epoch
+_HEADER = struct.Struct("<8sIIQ")
+_HEADER_SIZE = 64
+# generation, key hash, cache epoch, expires at, key length, value length
+_SLOT = struct.Struct("<QQQdHIxx")
+_GENERATION = struct.Struct("<Q")
+# number of invalidations, follows the header fields
+_INVALIDATIONS_OFFSET = 24
+
+
+def _hash_key(key: bytes) -> int:
+    # builtin hash() is randomized per process, all workers must agree on slot positions
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little")
+
+
+class SharedUserCache:
+    """Fixed-slot hash table in a memory-mapped file shared by all worker processes of a host.
+
+    Every slot is guarded by a generation counter (seqlock). Writers make it odd while the slot changes
+    and even when done, readers copy the slot and retry if the generation changed meanwhile,
+    so reads never take locks. Writers are serialized by a file lock.
+
+    A key is stored in one of `probes` consecutive slots; when all of them are taken,
+    the entry that expires first is replaced. Values larger than `slot_size` are not cached.
+    `clear` bumps the cache epoch, which invalidates all entries at once.
+    The header counts invalidations, so writers can skip values loaded before a concurrent invalidation.
+
+    Put the file on a memory backed filesystem, e.g. /dev/shm. Processes must use the same `slots` and `slot_size`.
+    """
+
+    def __init__(
+        self,
+        path: str | os.PathLike[str],
+        *,
+        slots: int = 4096,
+        slot_size: int = 1024,
+        probes: int = 4,
+        clock: typing.Callable[[], float] = time.time,
+    ) -> None:
+        assert slots > 0, "slots must be positive"
+        assert slot_size > _SLOT.size, f"slot_size must be larger than {_SLOT.size}"
+        self.path = os.fspath(path)
+        self.slots = slots
+        self.slot_size = slot_size
+        self.probes = min(probes, slots)
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            self._map = self._open(_HEADER_SIZE + slots * slot_size)
+        except BaseException:
+            os.close(self._fd)
+            raise
+
+    def _open(self, size: int) -> mmap.mmap:
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            if os.fstat(self._fd).st_size == 0:
+                os.ftruncate(self._fd, size)
+                memory = mmap.mmap(self._fd, size)
+                _HEADER.pack_into(memory, 0, _MAGIC, self.slots, self.slot_size, 0)
+                return memory
+
+            memory = mmap.mmap(self._fd, 0)
+            magic, slots, slot_size, _ = _HEADER.unpack_from(memory, 0)
+            if magic != _MAGIC or (slots, slot_size) != (self.slots, self.slot_size) or len(memory) != size:
+                memory.close()
+                raise ValueError(f"Shared cache file {self.path} has incompatible layout.")
+            return memory
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    @property
+    def epoch(self) -> int:
+        return typing.cast(int, _GENERATION.unpack_from(self._map, 16)[0])
+
+    @property
+    def invalidations(self) -> int:
+        """Number of `invalidate` and `clear` calls in all processes."""
+        return typing.cast(int, _GENERATION.unpack_from(self._map, _INVALIDATIONS_OFFSET)[0])
+
+    def _offsets(self, key_hash: int) -> typing.Iterator[int]:
+        for probe in range(self.probes):
+            yield _HEADER_SIZE + (key_hash + probe) % self.slots * self.slot_size
+
+    def _read(self, offset: int) -> tuple[int, int, int, float, bytes, bytes] | None:
+        """Copy consistent slot contents. Returns None if writers keep changing the slot."""
+        for _ in range(3):
+            generation = _GENERATION.unpack_from(self._map, offset)[0]
+            if generation & 1:
+                continue  # write in progress
+
+            _, key_hash, epoch, expires_at, key_length, value_length = _SLOT.unpack_from(self._map, offset)
+            start = offset + _SLOT.size
+            if key_length + value_length > self.slot_size - _SLOT.size:
+                continue  # torn read of lengths
+            key = self._map[start : start + key_length]
+            value = self._map[start + key_length : start + key_length + value_length]
+            if _GENERATION.unpack_from(self._map, offset)[0] == generation:
+                return generation, key_hash, epoch, expires_at, key, value
+        return None
+
+    def get(self, key: str) -> bytes | None:
+        """Return cached value or None if the entry is missing or expired."""
+        raw_key = key.encode()
+        key_hash = _hash_key(raw_key)
+        epoch, now = self.epoch, self.clock()
+        for offset in self._offsets(key_hash):
+            if (slot := self._read(offset)) is None:
+                continue
+            _, slot_hash, slot_epoch, expires_at, slot_key, value = slot
+            if slot_hash == key_hash and slot_key == raw_key and slot_epoch == epoch and expires_at > now:
+                return value
+        return None
+
+    def set(self, key: str, value: bytes, ttl: float, *, invalidations: int | None = None) -> bool:
+        """Store value for `ttl` seconds. Returns False if the value does not fit into a slot.
+        When `invalidations` is given, the value is stored only if nothing was invalidated
+        since `self.invalidations` had that value, otherwise False is returned as well."""
+        raw_key = key.encode()
+        if len(raw_key) + len(value) > self.slot_size - _SLOT.size:
+            return False
+
+        key_hash = _hash_key(raw_key)
+        with self._locked():
+            if invalidations is not None and invalidations != self.invalidations:
+                return False
+
+            epoch, now = self.epoch, self.clock()
+            # reuse the slot of the same key, else the first free slot, else the one that expires first
+            target, target_rank = 0, float("inf")
+            for offset in self._offsets(key_hash):
+                _, slot_hash, slot_epoch, expires_at, key_length, _ = _SLOT.unpack_from(self._map, offset)
+                start = offset + _SLOT.size
+                if slot_hash == key_hash and self._map[start : start + key_length] == raw_key:
+                    target = offset
+                    break
+                is_free = key_length == 0 or slot_epoch != epoch or expires_at <= now
+                if (rank := 0 if is_free else expires_at) < target_rank:
+                    target, target_rank = offset, rank
+            self._write(target, key_hash, epoch, now + ttl, raw_key, value)
+        return True
+
+    def invalidate(self, key: str) -> None:
+        """Remove the entry. The change is visible to all processes immediately."""
+        raw_key = key.encode()
+        key_hash = _hash_key(raw_key)
+        with self._locked():
+            self._count_invalidation()
+            for offset in self._offsets(key_hash):
+                _, slot_hash, _, _, key_length, _ = _SLOT.unpack_from(self._map, offset)
+                start = offset + _SLOT.size
+                if slot_hash == key_hash and self._map[start : start + key_length] == raw_key:
+                    self._write(offset, 0, 0, 0, b"", b"")
+
+    def clear(self) -> None:
+        """Invalidate all entries in all processes."""
+        with self._locked():
+            self._count_invalidation()
+            _GENERATION.pack_into(self._map, 16, self.epoch + 1)
+
+    def close(self) -> None:
+        self._map.close()
+        os.close(self._fd)
+
+    def __enter__(self) -> "SharedUserCache":
+        return self
+
+    def __exit__(self, *args: typing.Any) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        epoch, now = self.epoch, self.clock()
+        count = 0
+        for index in range(self.slots):
+            offset = _HEADER_SIZE + index * self.slot_size
+            _, _, slot_epoch, expires_at, key_length, _ = _SLOT.unpack_from(self._map, offset)
+            count += key_length > 0 and slot_epoch == epoch and expires_at > now
+        return count
+
+    def _write(self, offset: int, key_hash: int, epoch: int, expires_at: float, key: bytes, value: bytes) -> None:
+        generation = _GENERATION.unpack_from(self._map, offset)[0]
+        _GENERATION.pack_into(self._map, offset, generation + 1)
+        _SLOT.pack_into(self._map, offset, generation + 1, key_hash, epoch, expires_at, len(key), len(value))
+        start = offset + _SLOT.size
+        self._map[start : start + len(key) + len(value)] = key + value
+        _GENERATION.pack_into(self._map, offset, generation + 2)
+
+    def _count_invalidation(self) -> None:
+        _GENERATION.pack_into(self._map, _INVALIDATIONS_OFFSET, self.invalidations + 1)
+
+    @contextlib.contextmanager
+    def _locked(self) -> typing.Iterator[None]:
+        # the file lock excludes other processes, the thread lock - other threads of this process
+        with self._lock:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+
+class SharedCachedUserLoader:
+    """Cache results of a user loader in a cache shared by worker processes.
+
+    Users are converted to bytes by `dumps` and back by `loads`, e.g. JSON of user fields.
+    Wrap it into `CachedUserLoader` to keep hot users in process memory as well.
+    Pass `bus` to exchange invalidations with other hosts.
+
+    Usage:
+        cache = SharedUserCache("/dev/shm/myapp-users")
+        user_loader = SharedCachedUserLoader(load_user, cache, dumps=user_to_bytes, loads=user_from_bytes)
+        backend = SessionBackend(user_loader=user_loader, secret_key="key")
+        # in any worker, after user data changed
+        user_loader.invalidate(user_id)
+    """
+
+    def __init__(
+        self,
+        user_loader: ByIdUserFinder,
+        cache: SharedUserCache,
+        *,
+        dumps: typing.Callable[[BaseUser], bytes],
+        loads: typing.Callable[[bytes], BaseUser],
+        ttl: float = 60,
+        bus: InvalidationBus | None = None,
+    ) -> None:
+        self.user_loader = user_loader
+        self.cache = cache
+        self.dumps = dumps
+        self.loads = loads
+        self.ttl = ttl
+        self.bus = bus
+        if bus:
+            bus.subscribe(self._on_invalidate)
+
+    async def __call__(self, conn: HTTPConnection, user_id: str) -> BaseUser | None:
+        if (data := self.cache.get(user_id)) is not None:
+            if instrumentation.observers:
+                instrumentation.emit(AuthEventType.CACHE_HIT, cache="shared_user")
+            return self.loads(data)
+
+        if instrumentation.observers:
+            instrumentation.emit(AuthEventType.CACHE_MISS, cache="shared_user")
+
+        # skip caching if the user is invalidated by any process while it is loaded
+        invalidations = self.cache.invalidations
+        if (user := await self.user_loader(conn, user_id)) is not None:
+            self.cache.set(user_id, self.dumps(user), self.ttl, invalidations=invalidations)
+        return user
+
+    def invalidate(self, user_id: str) -> None:
+        """Remove user from the cache of all processes, and of other nodes when `bus` is set."""
+        self.cache.invalidate(user_id)
+        if self.bus:
+            self.bus.publish(user_key(user_id))
+
+    def _on_invalidate(self, keys: typing.Sequence[str]) -> None:
+        for key in keys:
+            if key.startswith(USER_PREFIX):
+                self.cache.invalidate(key[len(USER_PREFIX) :])
+
+    def clear(self) -> None:
+        self.cache.clear()
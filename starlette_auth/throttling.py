@@ -0,0 +1,159 @@
+import abc
+import collections
+import math
+import time
+import typing
+
+from starlette.requests import HTTPConnection
+
+
+class TooManyAttempts(Exception):
+    def __init__(self, retry_after: float) -> None:
+        super().__init__(f"Too many login attempts, retry after {retry_after:.0f} seconds.")
+        self.retry_after = retry_after
+
+
+class ThrottleBackend(abc.ABC):  # pragma: no cover
+    """Storage of attempt counters. Implement it to share limits between processes."""
+
+    @abc.abstractmethod
+    async def hit(self, key: str, window: float) -> None:
+        """Count an attempt."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def count(self, key: str, window: float) -> tuple[float, float]:
+        """Return the number of attempts during the last `window` seconds and seconds until it decreases."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def reset(self, key: str) -> None:
+        """Forget all attempts."""
+        raise NotImplementedError
+
+
+# window start, attempts in the current window, attempts in the previous window
+_Counter = list[float]
+
+
+class InMemoryThrottleBackend(ThrottleBackend):
+    """Count attempts using sliding window counters.
+
+    Every key keeps counts of the current and the previous fixed window,
+    the sliding count is interpolated between them, so updates are O(1).
+    Keys are distributed between `shards` dictionaries ordered by the last attempt. When a shard reaches
+    `max_keys_per_shard`, expired keys and then the least recently hit keys are evicted from its head,
+    so every key is evicted at most once and updates stay O(1) even when attackers try many keys."""
+
+    def __init__(
+        self,
+        *,
+        shards: int = 16,
+        max_keys_per_shard: int = 10_000,
+        clock: typing.Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.max_keys_per_shard = max_keys_per_shard
+        self.clock = clock
+        self._shards = [collections.OrderedDict[str, _Counter]() for _ in range(shards)]
+
+    def _shard(self, key: str) -> collections.OrderedDict[str, _Counter]:
+        return self._shards[hash(key) % len(self._shards)]
+
+    def _roll(self, counter: _Counter, window: float, now: float) -> _Counter:
+        elapsed_windows = math.floor((now - counter[0]) / window)
+        if elapsed_windows >= 2:
+            return [now - (now - counter[0]) % window, 0.0, 0.0]
+        if elapsed_windows == 1:
+            return [counter[0] + window, 0.0, counter[1]]
+        return counter
+
+    async def hit(self, key: str, window: float) -> None:
+        now = self.clock()
+        shard = self._shard(key)
+        if (counter := shard.get(key)) is None:
+            if len(shard) >= self.max_keys_per_shard:
+                self._evict(shard, window, now)
+            counter = [now, 0.0, 0.0]
+        else:
+            shard.move_to_end(key)
+        counter = self._roll(counter, window, now)
+        counter[1] += 1
+        shard[key] = counter
+
+    async def count(self, key: str, window: float) -> tuple[float, float]:
+        if (counter := self._shard(key).get(key)) is None:
+            return 0.0, 0.0
+
+        now = self.clock()
+        window_start, current, previous = self._roll(counter, window, now)
+        elapsed = now - window_start
+        return previous * (1 - elapsed / window) + current, window - elapsed
+
+    async def reset(self, key: str) -> None:
+        self._shard(key).pop(key, None)
+
+    def _evict(self, shard: collections.OrderedDict[str, _Counter], window: float, now: float) -> None:
+        # the head holds the least recently hit keys, stop at the first live key once there is room
+        while shard:
+            key, counter = next(iter(shard.items()))
+            if len(shard) < self.max_keys_per_shard and now - counter[0] < 2 * window:
+                break
+            del shard[key]
+
+
+class LoginThrottle:
+    """Limit failed login attempts per identity (e.g. username) and per client address.
+
+    Usage:
+        throttle = LoginThrottle(max_attempts=5, window=300)
+
+        async def login_view(request):
+            await throttle.check(request, username)  # raises TooManyAttempts
+            if not (user := await verify_credentials(username, password)):
+                await throttle.record_failure(request, username)
+                ...
+            await login(request, user, secret_key=..., throttle=throttle, throttle_identity=username)
+    """
+
+    def __init__(
+        self,
+        *,
+        max_attempts: int = 5,
+        max_attempts_per_address: int = 50,
+        window: float = 300,
+        backend: ThrottleBackend | None = None,
+    ) -> None:
+        self.max_attempts = max_attempts
+        self.max_attempts_per_address = max_attempts_per_address
+        self.window = window
+        self.backend = backend or InMemoryThrottleBackend()
+
+    def _keys(self, connection: HTTPConnection, identity: str) -> list[tuple[str, int]]:
+        keys = [(f"identity:{identity}", self.max_attempts)]
+        if connection.client:
+            keys.append((f"address:{connection.client.host}", self.max_attempts_per_address))
+        return keys
+
+    async def is_allowed(self, connection: HTTPConnection, identity: str) -> bool:
+        """Test if another login attempt is allowed."""
+        try:
+            await self.check(connection, identity)
+        except TooManyAttempts:
+            return False
+        return True
+
+    async def check(self, connection: HTTPConnection, identity: str) -> None:
+        """Raise TooManyAttempts when identity or client address exceeded the limit."""
+        for key, limit in self._keys(connection, identity):
+            attempts, retry_after = await self.backend.count(key, self.window)
+            if attempts >= limit:
+                raise TooManyAttempts(retry_after)
+
+    async def record_failure(self, connection: HTTPConnection, identity: str) -> None:
+        """Count failed login attempt."""
+        for key, _ in self._keys(connection, identity):
+            await self.backend.hit(key, self.window)
+
+    async def reset(self, connection: HTTPConnection, identity: str) -> None:
+        """Forget failed attempts of the identity. Address counters are kept."""
+        await self.backend.reset(f"identity:{identity}")
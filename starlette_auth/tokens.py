@@ -0,0 +1,134 @@
+import functools
+import hmac
+import time
+import typing
+
+import itsdangerous
+from starlette.authentication import AuthCredentials, AuthenticationBackend, BaseUser
+from starlette.requests import HTTPConnection
+from starlette.responses import Response
+
+from starlette_auth.authentication import ByIdUserFinder, get_scopes, HasSessionAuthHash, LazyUser
+from starlette_auth.scopes import scope_registry
+
+TOKEN_SCOPE_KEY = "auth_token"
+TOKEN_SALT = "starlette_auth.token"
+
+
+class TokenPayload(typing.TypedDict):
+    u: str  # user id
+    s: list[str]  # scopes
+    h: str  # session auth hash
+
+
+def create_serializer(secret_key: str) -> itsdangerous.URLSafeTimedSerializer:
+    return itsdangerous.URLSafeTimedSerializer(secret_key, salt=TOKEN_SALT)
+
+
+def create_token(user: BaseUser, secret_key: str) -> str:
+    """Create signed token that contains user id, scopes and session auth hash.
+    Issue time is embedded by the serializer."""
+    payload: TokenPayload = {
+        "u": user.identity,
+        "s": get_scopes(user),
+        "h": user.get_session_auth_hash(secret_key) if isinstance(user, HasSessionAuthHash) else "",
+    }
+    return create_serializer(secret_key).dumps(payload)
+
+
+class SignedTokenBackend(AuthenticationBackend):
+    """Authenticate users by signed time-limited tokens.
+
+    The token carries user id and scopes, so requests are authenticated without calling `user_loader`.
+    The connection gets a `LazyUser`, call `ensure_user` when the full user object is needed.
+    Tokens older than `refresh_after` seconds are checked against the user loader
+    (the user must exist and its session auth hash must match) and reissued.
+
+    The current (or reissued) token is available as `connection.scope["auth_token"]`,
+    use `set_token_cookie` to send it back to the client.
+
+    Tokens are read from the cookie when `cookie_name` is set, and from the header otherwise:
+        Authorization: Bearer <token>
+    """
+
+    def __init__(
+        self,
+        user_loader: ByIdUserFinder,
+        secret_key: str,
+        *,
+        max_age: int = 3600,
+        refresh_after: int | None = None,
+        header: str = "authorization",
+        scheme: str = "bearer",
+        cookie_name: str | None = None,
+    ) -> None:
+        self.user_loader = user_loader
+        self.secret_key = secret_key
+        self.max_age = max_age
+        self.refresh_after = refresh_after
+        self.header = header
+        self.scheme = scheme.lower()
+        self.cookie_name = cookie_name
+        self.serializer = create_serializer(secret_key)
+
+    def issue(self, user: BaseUser) -> str:
+        """Create token for the user."""
+        return create_token(user, self.secret_key)
+
+    def read_token(self, conn: HTTPConnection) -> str | None:
+        if self.cookie_name:
+            return conn.cookies.get(self.cookie_name)
+
+        scheme, _, token = conn.headers.get(self.header, "").partition(" ")
+        return token if token and scheme.lower() == self.scheme else None
+
+    async def authenticate(self, conn: HTTPConnection) -> tuple[AuthCredentials, BaseUser] | None:
+        if not (token := self.read_token(conn)):
+            return None
+
+        try:
+            payload, issued_at = self.serializer.loads(token, max_age=self.max_age, return_timestamp=True)
+        except itsdangerous.BadData:
+            return None
+
+        payload = typing.cast(TokenPayload, payload)
+        if self.refresh_after is not None and time.time() - issued_at.timestamp() > self.refresh_after:
+            if not (user := await self.load_user(conn, payload)):
+                return None
+            conn.scope[TOKEN_SCOPE_KEY] = self.issue(user)
+            return scope_registry.credentials(get_scopes(user)), user
+
+        conn.scope[TOKEN_SCOPE_KEY] = token
+        return scope_registry.credentials(payload["s"]), LazyUser(
+            payload["u"], functools.partial(self.load_user, conn, payload)
+        )
+
+    async def load_user(self, conn: HTTPConnection, payload: TokenPayload) -> BaseUser | None:
+        """Load user and check that the token was issued for the current session auth hash."""
+        if user := await self.user_loader(conn, payload["u"]):
+            if isinstance(user, HasSessionAuthHash) and not hmac.compare_digest(
+                user.get_session_auth_hash(self.secret_key), payload["h"]
+            ):
+                # password has changed since the token was issued
+                return None
+            return user
+        return None
+
+
+def set_token_cookie(
+    response: Response,
+    connection: HTTPConnection,
+    cookie_name: str,
+    *,
+    max_age: int = 3600,
+    secure: bool = True,
+    samesite: typing.Literal["lax", "strict", "none"] = "lax",
+) -> None:
+    """Send current token to the client. Deletes the cookie after logout."""
+    if TOKEN_SCOPE_KEY not in connection.scope:
+        return
+
+    if token := connection.scope[TOKEN_SCOPE_KEY]:
+        response.set_cookie(cookie_name, token, max_age=max_age, secure=secure, httponly=True, samesite=samesite)
+    else:
+        response.delete_cookie(cookie_name, secure=secure, httponly=True, samesite=samesite)
@@ -0,0 +1,117 @@
+import asyncio
+import contextlib
+import typing
+
+from starlette.authentication import AuthenticationBackend, BaseUser
+from starlette.requests import HTTPConnection
+from starlette.status import WS_1008_POLICY_VIOLATION
+from starlette.websockets import WebSocket, WebSocketState
+
+from starlette_auth.authentication import ensure_user, LazyUser
+
+
+class WebSocketRevalidator:
+    """Periodically re-authenticate long-lived websocket connections.
+
+    Connections are spread over `slots` buckets of a timer wheel. A single task visits
+    one bucket every `interval / slots` seconds, so every connection is checked once per `interval`
+    and the work is spread evenly over time. A connection is checked by running `backend` again,
+    it is closed with 1008 (policy violation) when authentication fails or yields another user.
+    For SessionBackend this catches deleted users, password changes and revoked sessions.
+    Connections stay open when the backend raises, they are checked again in the next round.
+    Errors of single connections, e.g. a peer that is gone while being closed, do not stop the scheduler.
+
+    Usage:
+        revalidator = WebSocketRevalidator(SessionBackend(user_loader, secret_key="key"), interval=60)
+
+        async def websocket_endpoint(websocket):
+            await websocket.accept()
+            async with revalidator.watch(websocket):
+                async for message in websocket.iter_text():
+                    ...
+    """
+
+    def __init__(self, backend: AuthenticationBackend, *, interval: float = 60, slots: int = 60) -> None:
+        assert slots > 0, "slots must be positive"
+        self.backend = backend
+        self.interval = interval
+        self.wheel: list[set[WebSocket]] = [set() for _ in range(slots)]
+        self._slot_of: dict[WebSocket, int] = {}
+        self._position = 0
+        self._task: asyncio.Task[None] | None = None
+
+    def register(self, websocket: WebSocket) -> None:
+        """Start watching the connection. Its first check is one interval away."""
+        slot = (self._position - 1) % len(self.wheel)
+        self.wheel[slot].add(websocket)
+        self._slot_of[websocket] = slot
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def unregister(self, websocket: WebSocket) -> None:
+        if (slot := self._slot_of.pop(websocket, None)) is not None:
+            self.wheel[slot].discard(websocket)
+
+    @contextlib.asynccontextmanager
+    async def watch(self, websocket: WebSocket) -> typing.AsyncGenerator[None, None]:
+        self.register(websocket)
+        try:
+            yield
+        finally:
+            self.unregister(websocket)
+
+    async def tick(self) -> None:
+        """Check connections of the current bucket and advance the wheel."""
+        bucket = list(self.wheel[self._position])
+        self._position = (self._position + 1) % len(self.wheel)
+        if bucket:
+            await asyncio.gather(*[self.revalidate(websocket) for websocket in bucket], return_exceptions=True)
+
+    async def revalidate(self, websocket: WebSocket) -> bool:
+        """Re-authenticate the connection and close it if it is no longer valid."""
+        if websocket.client_state == WebSocketState.DISCONNECTED:
+            self.unregister(websocket)
+            return False
+
+        user = typing.cast(BaseUser, websocket.scope.get("user"))
+        try:
+            result = await self.backend.authenticate(websocket)
+        except Exception:
+            # do not drop connections because of temporary failures, e.g. database outage
+            return True
+
+        if result and isinstance(result[1], LazyUser):
+            # lazy backends defer the checks of deleted users and password changes to loading
+            conn = HTTPConnection({**websocket.scope, "auth": result[0], "user": result[1]})
+            try:
+                await ensure_user(conn)
+            except Exception:
+                return True
+            result = (conn.auth, conn.user) if conn.user.is_authenticated else None
+
+        if result and result[1].identity == user.identity:
+            websocket.scope["auth"], websocket.scope["user"] = result
+            return True
+
+        self.unregister(websocket)
+        with contextlib.suppress(Exception):  # already closed, or the peer is gone
+            await websocket.close(WS_1008_POLICY_VIOLATION)
+        return False
+
+    async def close(self) -> None:
+        """Stop the scheduler."""
+        if self._task:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    def __len__(self) -> int:
+        return len(self._slot_of)
+
+    async def _run(self) -> None:
+        delay = self.interval / len(self.wheel)
+        while self._slot_of:
+            await asyncio.sleep(delay)
+            with contextlib.suppress(Exception):
+                await self.tick()
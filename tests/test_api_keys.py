@@ -0,0 +1,101 @@
+from unittest import mock
+
+import pytest
+from starlette.authentication import AuthCredentials, AuthenticationBackend, BaseUser
+from starlette.requests import HTTPConnection
+
+from starlette_auth import APIKeyBackend, APIKeyRecord, generate_api_key, InMemoryAPIKeySource, MultiBackend
+from starlette_auth.api_keys import hash_api_key
+from tests.conftest import Clock, User
+
+
+def _connection(header: str, value: str) -> HTTPConnection:
+    return HTTPConnection({"type": "http", "headers": [(header.encode(), value.encode())]})
+
+
+def test_generate_api_key() -> None:
+    key, digest = generate_api_key()
+    assert key != digest
+    assert hash_api_key(key) == digest
+
+
+async def test_api_key_backend_authenticates_by_key() -> None:
+    key, digest = generate_api_key()
+    source = InMemoryAPIKeySource([APIKeyRecord(digest=digest, user=User("bot"), scopes=("read",))])
+    backend = APIKeyBackend(source)
+
+    result = await backend.authenticate(_connection("authorization", f"ApiKey {key}"))
+    assert result
+    assert result[0].scopes == ["read"]
+    assert result[1] == User("bot")
+
+    assert not await backend.authenticate(_connection("authorization", "ApiKey invalid"))
+    assert not await backend.authenticate(_connection("authorization", f"Bearer {key}"))
+    assert not await backend.authenticate(HTTPConnection({"type": "http", "headers": []}))
+
+
+async def test_api_key_backend_reads_custom_header() -> None:
+    key, digest = generate_api_key()
+    backend = APIKeyBackend(InMemoryAPIKeySource([APIKeyRecord(digest, User("bot"))]), header="X-API-Key", scheme=None)
+    assert await backend.authenticate(_connection("x-api-key", key))
+
+
+async def test_api_key_backend_refreshes_index_incrementally() -> None:
+    clock = Clock()
+    first_key, first_digest = generate_api_key()
+    second_key, second_digest = generate_api_key()
+    source = InMemoryAPIKeySource([APIKeyRecord(first_digest, User("first"))])
+    backend = APIKeyBackend(source, refresh_interval=10, clock=clock)
+    assert await backend.authenticate(_connection("authorization", f"ApiKey {first_key}"))
+
+    source.add(APIKeyRecord(second_digest, User("second")))
+    source.delete(first_digest)
+    assert not await backend.authenticate(_connection("authorization", f"ApiKey {second_key}"))
+
+    clock.now = 20
+    with mock.patch.object(source, "fetch_changes", wraps=source.fetch_changes) as fetch_changes:
+        assert await backend.authenticate(_connection("authorization", f"ApiKey {second_key}"))
+        assert not await backend.authenticate(_connection("authorization", f"ApiKey {first_key}"))
+        fetch_changes.assert_called_once_with(1)
+    assert len(backend) == 1
+
+
+async def test_api_key_backend_serves_stale_index_when_source_fails(caplog: pytest.LogCaptureFixture) -> None:
+    clock = Clock()
+    key, digest = generate_api_key()
+    source = InMemoryAPIKeySource([APIKeyRecord(digest, User("bot"))])
+    backend = APIKeyBackend(source, refresh_interval=10, clock=clock)
+    assert await backend.authenticate(_connection("authorization", f"ApiKey {key}"))
+
+    clock.now = 20
+    with mock.patch.object(source, "fetch_changes", side_effect=ConnectionError) as fetch_changes:
+        assert await backend.authenticate(_connection("authorization", f"ApiKey {key}"))
+        assert await backend.authenticate(_connection("authorization", f"ApiKey {key}"))
+        fetch_changes.assert_called_once()
+    assert "Failed to refresh API keys" in caplog.text
+
+    # retried after the refresh interval
+    clock.now = 30
+    with mock.patch.object(source, "fetch_changes", wraps=source.fetch_changes) as fetch_changes:
+        assert await backend.authenticate(_connection("authorization", f"ApiKey {key}"))
+        fetch_changes.assert_called_once()
+
+    # explicit refresh reports the error
+    clock.now = 40
+    with mock.patch.object(source, "fetch_changes", side_effect=ConnectionError):
+        with pytest.raises(ConnectionError):
+            await backend.refresh()
+
+
+async def test_api_key_backend_in_multi_backend() -> None:
+    class _SessionBackend(AuthenticationBackend):
+        async def authenticate(self, conn: HTTPConnection) -> tuple[AuthCredentials, BaseUser] | None:
+            return AuthCredentials(), User("session")
+
+    key, digest = generate_api_key()
+    api_key_backend = APIKeyBackend(InMemoryAPIKeySource([APIKeyRecord(digest, User("bot"))]))
+    backend = MultiBackend([api_key_backend, _SessionBackend()])
+    assert backend.select_backends(HTTPConnection({"type": "http", "headers": []})) == [1]
+
+    result = await backend.authenticate(_connection("authorization", f"ApiKey {key}"))
+    assert result and result[1] == User("bot")
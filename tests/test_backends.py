@@ -1,8 +1,19 @@
+import asyncio
+import copy
+
+import pytest
 from starlette.authentication import AuthCredentials, AuthenticationBackend, BaseUser
 from starlette.requests import HTTPConnection
 
-from starlette_auth import MultiBackend, SessionBackend
-from starlette_auth.authentication import SESSION_HASH, SESSION_KEY, update_session_auth_hash
+from starlette_auth import (
+    BackendCondition,
+    ConditionalBackend,
+    ensure_user,
+    LazyUser,
+    MultiBackend,
+    SessionBackend,
+)
+from starlette_auth.authentication import get_scopes, SESSION_HASH, SESSION_KEY, update_session_auth_hash
 from tests.conftest import User, UserWithSessionHash
 
 
@@ -121,3 +132,161 @@ async def test_session_backend_validates_fixed_invalid_session_hash() -> None:
     assert not await backend.authenticate(conn)
     update_session_auth_hash(conn, user, "key!")
     assert await backend.authenticate(conn)
+
+
+async def test_session_backend_lazy_mode() -> None:
+    user = UserWithSessionHash(username="root", password="password")
+    calls = 0
+
+    async def user_loader(conn: HTTPConnection, user_id: str) -> BaseUser | None:
+        nonlocal calls
+        calls += 1
+        return user if user_id == user.identity else None
+
+    backend = SessionBackend(user_loader=user_loader, secret_key="key!", lazy=True)
+    conn = HTTPConnection({"type": "http"})
+    conn.scope["session"] = {SESSION_KEY: "root", SESSION_HASH: user.get_session_auth_hash("key!")}
+    result = await backend.authenticate(conn)
+    assert result
+    credentials, lazy_user = result
+    assert isinstance(lazy_user, LazyUser)
+    assert lazy_user.identity == "root"
+    assert lazy_user.is_authenticated
+    assert calls == 0
+
+    conn.scope["auth"], conn.scope["user"] = result
+    assert await ensure_user(conn) == user
+    assert conn.user == user
+    assert lazy_user.username == "root"
+    await ensure_user(conn)
+    assert calls == 1
+
+
+async def test_session_backend_lazy_mode_with_invalid_hash() -> None:
+    user = UserWithSessionHash(username="root", password="password")
+
+    async def user_loader(conn: HTTPConnection, user_id: str) -> BaseUser | None:
+        return user
+
+    backend = SessionBackend(user_loader=user_loader, secret_key="key!", lazy=True)
+    conn = HTTPConnection({"type": "http"})
+    conn.scope["session"] = {SESSION_KEY: "root", SESSION_HASH: "bad hash"}
+    result = await backend.authenticate(conn)
+    assert result
+    conn.scope["auth"], conn.scope["user"] = result
+
+    assert not (await ensure_user(conn)).is_authenticated
+    assert not conn.user.is_authenticated
+    assert not result[1].is_authenticated
+    assert result[1].display_name == "root"
+    assert not hasattr(result[1], "password")
+
+
+def test_lazy_user_requires_resolution() -> None:
+    async def loader() -> BaseUser | None:  # pragma: no cover
+        return None
+
+    lazy_user = LazyUser("root", loader)
+    assert not lazy_user.is_resolved
+    assert lazy_user.display_name == "root"
+    with pytest.raises(RuntimeError):
+        assert lazy_user.user
+    with pytest.raises(AttributeError):
+        assert lazy_user.password
+    assert get_scopes(lazy_user) == []
+    assert copy.deepcopy(lazy_user).identity == "root"
+
+
+async def test_lazy_user_proxies_attributes_of_loaded_user() -> None:
+    async def loader() -> BaseUser | None:
+        return UserWithSessionHash(username="root", password="password")
+
+    lazy_user = LazyUser("root", loader)
+    await lazy_user.resolve()
+    assert lazy_user.password == "password"
+    assert lazy_user.display_name == "root"
+
+
+class _HeaderBackend(_DummyBackend):
+    condition = BackendCondition(header="authorization")
+
+
+async def test_multi_backend_skips_backends_with_unmatched_conditions() -> None:
+    session_backend = _DummyBackend(User("session"))
+    backend = MultiBackend(
+        [
+            _HeaderBackend(User("token")),
+            ConditionalBackend(_DummyBackend(User("cookie")), cookie="remember"),
+            ConditionalBackend(_DummyBackend(User("api")), path_prefix="/api"),
+            session_backend,
+        ]
+    )
+
+    conn = HTTPConnection({"type": "http", "path": "/", "headers": []})
+    assert backend.select_backends(conn) == [3]
+    assert (result := await backend.authenticate(conn)) and result[1] == User("session")
+
+    conn = HTTPConnection({"type": "http", "path": "/", "headers": [(b"authorization", b"Bearer token")]})
+    assert backend.select_backends(conn) == [0, 3]
+    assert (result := await backend.authenticate(conn)) and result[1] == User("token")
+
+    conn = HTTPConnection({"type": "http", "path": "/api/users", "headers": [(b"cookie", b"remember=1")]})
+    assert backend.select_backends(conn) == [1, 2, 3]
+    assert (result := await backend.authenticate(conn)) and result[1] == User("cookie")
+
+
+async def test_conditional_backend() -> None:
+    backend = ConditionalBackend(_DummyBackend(User("root")), header="X-Token")
+    assert not await backend.authenticate(HTTPConnection({"type": "http", "headers": []}))
+    assert await backend.authenticate(HTTPConnection({"type": "http", "headers": [(b"x-token", b"1")]}))
+
+
+async def test_multi_backend_race_strategy_respects_order() -> None:
+    class _SlowBackend(_DummyBackend):
+        async def authenticate(self, conn: HTTPConnection) -> tuple[AuthCredentials, BaseUser] | None:
+            await asyncio.sleep(0.01)
+            return await super().authenticate(conn)
+
+    backend = MultiBackend(
+        [_DummyBackend(None), _SlowBackend(User("slow")), _DummyBackend(User("fast"))],
+        strategy="race",
+    )
+    result = await backend.authenticate(HTTPConnection({"type": "http"}))
+    assert result
+    assert result[1] == User("slow")
+
+    backend = MultiBackend([_DummyBackend(None), _DummyBackend(None)], strategy="race")
+    assert await backend.authenticate(HTTPConnection({"type": "http"})) is None
+
+
+async def test_multi_backend_collects_timings() -> None:
+    backend = MultiBackend([_DummyBackend(None), _DummyBackend(User("root"))])
+    await backend.authenticate(HTTPConnection({"type": "http"}))
+    await backend.authenticate(HTTPConnection({"type": "http"}))
+
+    assert [timing.name for timing in backend.timings] == ["_DummyBackend", "_DummyBackend"]
+    assert backend.timings[0].calls == 2
+    assert backend.timings[0].hits == 0
+    assert backend.timings[1].hits == 2
+    assert backend.timings[1].average_time >= 0
+
+
+async def test_session_backend_forgets_invalid_users() -> None:
+    user = UserWithSessionHash(username="root", password="password")
+
+    async def user_loader(conn: HTTPConnection, user_id: str) -> BaseUser | None:
+        return user if user_id == user.identity else None
+
+    backend = SessionBackend(user_loader=user_loader, secret_key="key!", forget_invalid_users=True)
+    conn = HTTPConnection({"type": "http", "session": {SESSION_KEY: "deleted", SESSION_HASH: "hash", "keep": 1}})
+    assert not await backend.authenticate(conn)
+    assert conn.session == {"keep": 1}
+
+    conn = HTTPConnection({"type": "http", "session": {SESSION_KEY: "root", SESSION_HASH: "bad hash"}})
+    assert not await backend.authenticate(conn)
+    assert conn.session == {}
+
+    backend = SessionBackend(user_loader=user_loader, secret_key="key!")
+    conn = HTTPConnection({"type": "http", "session": {SESSION_KEY: "deleted"}})
+    assert not await backend.authenticate(conn)
+    assert conn.session == {SESSION_KEY: "deleted"}
@@ -0,0 +1,182 @@
+import asyncio
+
+from starlette.authentication import BaseUser
+from starlette.requests import HTTPConnection
+
+from starlette_auth import CachedUserLoader, SessionBackend
+from starlette_auth.authentication import SESSION_KEY
+from tests.conftest import Clock, User
+
+
+class _CountingLoader:
+    def __init__(self) -> None:
+        self.calls = 0
+
+    async def __call__(self, conn: HTTPConnection, user_id: str) -> BaseUser | None:
+        self.calls += 1
+        await asyncio.sleep(0)
+        return User(username=user_id) if user_id != "missing" else None
+
+
+async def test_cached_user_loader_caches_users() -> None:
+    loader = _CountingLoader()
+    cache = CachedUserLoader(loader)
+    conn = HTTPConnection({"type": "http"})
+
+    assert await cache(conn, "root") == User(username="root")
+    assert await cache(conn, "root") == User(username="root")
+    assert loader.calls == 1
+
+
+async def test_cached_user_loader_does_not_cache_missing_users() -> None:
+    loader = _CountingLoader()
+    cache = CachedUserLoader(loader)
+    conn = HTTPConnection({"type": "http"})
+
+    assert await cache(conn, "missing") is None
+    assert await cache(conn, "missing") is None
+    assert loader.calls == 2
+
+
+async def test_cached_user_loader_expires_entries() -> None:
+    clock = Clock()
+    loader = _CountingLoader()
+    cache = CachedUserLoader(loader, ttl=10, clock=clock)
+    conn = HTTPConnection({"type": "http"})
+
+    await cache(conn, "root")
+    clock.now = 9
+    await cache(conn, "root")
+    assert loader.calls == 1
+
+    clock.now = 20
+    await cache(conn, "root")
+    assert loader.calls == 2
+
+
+async def test_cached_user_loader_evicts_least_recently_used() -> None:
+    loader = _CountingLoader()
+    cache = CachedUserLoader(loader, max_entries=2)
+    conn = HTTPConnection({"type": "http"})
+
+    await cache(conn, "one")
+    await cache(conn, "two")
+    await cache(conn, "one")  # "two" becomes least recently used
+    await cache(conn, "three")
+    assert len(cache) == 2
+    assert cache.get("one")
+    assert cache.get("two") is None
+    assert cache.get("three")
+
+
+async def test_cached_user_loader_invalidate_and_clear() -> None:
+    loader = _CountingLoader()
+    cache = CachedUserLoader(loader)
+    conn = HTTPConnection({"type": "http"})
+
+    await cache(conn, "one")
+    await cache(conn, "two")
+    cache.invalidate("one")
+    assert cache.get("one") is None
+    assert cache.get("two")
+
+    cache.clear()
+    assert len(cache) == 0
+
+
+async def test_cached_user_loader_coalesces_concurrent_misses() -> None:
+    loader = _CountingLoader()
+    cache = CachedUserLoader(loader)
+    conn = HTTPConnection({"type": "http"})
+
+    users = await asyncio.gather(*[cache(conn, "root") for _ in range(10)])
+    assert loader.calls == 1
+    assert all(user == User(username="root") for user in users)
+
+
+class _BlockingLoader:
+    def __init__(self) -> None:
+        self.calls = 0
+        self.release = asyncio.Event()
+
+    async def __call__(self, conn: HTTPConnection, user_id: str) -> BaseUser | None:
+        self.calls += 1
+        await self.release.wait()
+        return User(username=user_id)
+
+
+async def test_cached_user_loader_survives_cancellation_of_first_caller() -> None:
+    loader = _BlockingLoader()
+    cache = CachedUserLoader(loader)
+    conn = HTTPConnection({"type": "http"})
+
+    first = asyncio.create_task(cache(conn, "root"))
+    second = asyncio.create_task(cache(conn, "root"))
+    await asyncio.sleep(0.01)
+    first.cancel()
+    await asyncio.sleep(0.01)
+    loader.release.set()
+
+    assert await second == User(username="root")
+    assert first.cancelled()
+    assert loader.calls == 1
+    assert len(cache) == 1
+
+
+async def test_cached_user_loader_does_not_cache_loads_invalidated_in_flight() -> None:
+    loader = _BlockingLoader()
+    cache = CachedUserLoader(loader)
+    conn = HTTPConnection({"type": "http"})
+
+    pending = asyncio.create_task(cache(conn, "root"))
+    await asyncio.sleep(0.01)
+    assert loader.calls == 1
+    cache.invalidate("root")
+    loader.release.set()
+
+    assert await pending == User(username="root")
+    assert len(cache) == 0
+    await cache(conn, "root")
+    assert len(cache) == 1
+    assert loader.calls == 2
+
+
+async def test_cached_user_loader_with_session_backend() -> None:
+    loader = _CountingLoader()
+    backend = SessionBackend(user_loader=CachedUserLoader(loader), secret_key="key!")
+    conn = HTTPConnection({"type": "http", "session": {SESSION_KEY: "root"}})
+
+    assert await backend.authenticate(conn)
+    assert await backend.authenticate(conn)
+    assert loader.calls == 1
+
+
+async def test_cached_user_loader_caches_missing_users() -> None:
+    clock = Clock()
+    loader = _CountingLoader()
+    cache = CachedUserLoader(loader, negative_ttl=5, clock=clock)
+    conn = HTTPConnection({"type": "http"})
+
+    assert await cache(conn, "missing") is None
+    assert await cache(conn, "missing") is None
+    assert loader.calls == 1
+
+    clock.now = 10
+    assert await cache(conn, "missing") is None
+    assert loader.calls == 2
+
+    cache.invalidate("missing")
+    assert await cache(conn, "missing") is None
+    assert loader.calls == 3
+
+
+async def test_cached_user_loader_limits_missing_users() -> None:
+    loader = _CountingLoader()
+    cache = CachedUserLoader(loader, negative_ttl=5, max_negative_entries=1)
+    cache.set_missing("one")
+    cache.set_missing("two")
+    assert not cache.is_known_missing("one")
+    assert cache.is_known_missing("two")
+
+    cache.clear()
+    assert not cache.is_known_missing("two")
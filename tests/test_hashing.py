@@ -0,0 +1,100 @@
+import dataclasses
+import hashlib
+import hmac
+import typing
+
+from starlette.requests import HTTPConnection
+
+from starlette_auth import SessionBackend
+from starlette_auth.authentication import SESSION_COMPACT, SESSION_HASH, SESSION_KEY, verify_session_auth_hash
+from starlette_auth.hashing import compact_digest, SessionAuthHasher
+from tests.conftest import UserWithSessionHash
+
+
+@dataclasses.dataclass
+class UserWithBlake2bHash(UserWithSessionHash):
+    session_auth_hasher: typing.ClassVar[SessionAuthHasher] = SessionAuthHasher("blake2b")
+
+
+def test_sha256_hash_is_compatible_with_hmac() -> None:
+    key = hashlib.sha256(b"starlette_dispatch.key!").digest()
+    expected = hmac.new(key, msg=b"password", digestmod=hashlib.sha256).hexdigest()
+    assert SessionAuthHasher().hash("key!", "password") == expected
+
+
+def test_blake2b_hash_is_prefixed() -> None:
+    hasher = SessionAuthHasher("blake2b")
+    digest = hasher.hash("key!", "password")
+    assert digest.startswith("b2$")
+    assert hasher.verify("key!", "password", digest)
+    assert not hasher.verify("key!", "another", digest)
+    assert not hasher.verify("another", "password", digest)
+
+
+def test_hasher_verifies_any_algorithm() -> None:
+    sha256 = SessionAuthHasher("sha256")
+    blake2b = SessionAuthHasher("blake2b")
+    assert blake2b.verify("key!", "password", sha256.hash("key!", "password"))
+    assert sha256.verify("key!", "password", blake2b.hash("key!", "password"))
+    assert not sha256.verify("key!", "password", "")
+
+
+def test_hasher_needs_update() -> None:
+    sha256 = SessionAuthHasher("sha256")
+    blake2b = SessionAuthHasher("blake2b")
+    assert blake2b.needs_update(sha256.hash("key!", "password"))
+    assert not blake2b.needs_update(blake2b.hash("key!", "password"))
+    assert sha256.needs_update(blake2b.hash("key!", "password"))
+
+
+def test_hasher_memoizes_digests() -> None:
+    hasher = SessionAuthHasher(max_entries=2)
+    assert hasher.hash("key!", "one") == hasher.hash("key!", "one")
+    hasher.hash("key!", "two")
+    hasher.hash("key!", "three")
+    assert len(hasher._digests) == 2
+
+    hasher.clear()
+    assert not hasher._digests
+
+
+def test_verify_session_auth_hash_migrates_outdated_hash() -> None:
+    user = UserWithBlake2bHash(username="root", password="password")
+    legacy_hash = SessionAuthHasher("sha256").hash("key!", "password")
+    conn = HTTPConnection({"type": "http", "session": {SESSION_KEY: "root", SESSION_HASH: legacy_hash}})
+
+    assert verify_session_auth_hash(conn, user, "key!")
+    assert conn.session[SESSION_HASH] == user.get_session_auth_hash("key!")
+    assert conn.session[SESSION_HASH].startswith("b2$")
+
+
+async def test_session_backend_accepts_legacy_hash() -> None:
+    user = UserWithBlake2bHash(username="root", password="password")
+
+    async def user_loader(conn: HTTPConnection, user_id: str) -> UserWithBlake2bHash | None:
+        return user
+
+    backend = SessionBackend(user_loader=user_loader, secret_key="key!")
+    legacy_hash = SessionAuthHasher("sha256").hash("key!", "password")
+    conn = HTTPConnection({"type": "http", "session": {SESSION_KEY: "root", SESSION_HASH: legacy_hash}})
+    assert await backend.authenticate(conn)
+
+    conn = HTTPConnection({"type": "http", "session": {SESSION_KEY: "root", SESSION_HASH: "bad hash"}})
+    assert not await backend.authenticate(conn)
+
+
+def test_verify_accepts_compact_digests() -> None:
+    for hasher in (SessionAuthHasher("sha256"), SessionAuthHasher("blake2b")):
+        digest = compact_digest(hasher.hash("key!", "password"))
+        assert len(digest.removeprefix("b2$")) == 22
+        assert hasher.verify("key!", "password", digest)
+        assert not hasher.verify("key!", "changed", digest)
+
+
+def test_verify_session_auth_hash_migrates_outdated_compact_hash() -> None:
+    user = UserWithBlake2bHash(username="root", password="password")
+    legacy_hash = compact_digest(SessionAuthHasher("sha256").hash("key!", "password"))
+    conn = HTTPConnection({"type": "http", "session": {SESSION_COMPACT: f"1.{legacy_hash}.root"}})
+
+    assert verify_session_auth_hash(conn, user, "key!")
+    assert conn.session == {SESSION_COMPACT: f"1.{compact_digest(user.get_session_auth_hash('key!'))}.root"}
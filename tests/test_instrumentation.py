@@ -0,0 +1,109 @@
+from starlette.applications import Starlette
+from starlette.authentication import AuthCredentials, AuthenticationBackend, BaseUser
+from starlette.middleware import Middleware
+from starlette.middleware.authentication import AuthenticationMiddleware
+from starlette.middleware.sessions import SessionMiddleware
+from starlette.requests import HTTPConnection, Request
+from starlette.responses import PlainTextResponse, Response
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from starlette_auth import CachedUserLoader, login, LoginRequiredMiddleware, logout, MultiBackend, SessionBackend
+from starlette_auth.authentication import SESSION_HASH, SESSION_KEY
+from starlette_auth.instrumentation import (
+    add_observer,
+    AuthEvent,
+    AuthEventType,
+    emit,
+    MetricsObserver,
+    observe,
+    observers,
+    remove_observer,
+)
+from tests.conftest import User, UserWithSessionHash
+
+
+def test_add_and_remove_observer() -> None:
+    events: list[AuthEvent] = []
+    add_observer(events.append)
+    emit(AuthEventType.LOGIN, 0.5, source="test")
+    remove_observer(events.append)
+    remove_observer(events.append)  # removing twice is not an error
+    emit(AuthEventType.LOGIN)
+
+    assert events == [AuthEvent(type=AuthEventType.LOGIN, duration=0.5, labels={"source": "test"})]
+    assert not observers
+
+
+async def test_session_backend_emits_events() -> None:
+    user = UserWithSessionHash(username="root", password="password")
+
+    async def user_loader(conn: HTTPConnection, user_id: str) -> BaseUser | None:
+        return user if user_id == "root" else None
+
+    backend = SessionBackend(user_loader=CachedUserLoader(user_loader), secret_key="key!")
+    with observe(MetricsObserver()) as metrics:
+        session = {SESSION_KEY: "root", SESSION_HASH: user.get_session_auth_hash("key!")}
+        await backend.authenticate(HTTPConnection({"type": "http", "session": session}))
+        await backend.authenticate(HTTPConnection({"type": "http", "session": session}))
+        await backend.authenticate(HTTPConnection({"type": "http", "session": {SESSION_KEY: "missing"}}))
+        await backend.authenticate(HTTPConnection({"type": "http", "session": {SESSION_KEY: "root"}}))
+
+    assert metrics.count(AuthEventType.USER_LOADED, found="yes") == 3
+    assert metrics.count(AuthEventType.USER_LOADED, found="no") == 1
+    assert metrics.count(AuthEventType.CACHE_HIT, cache="user") == 2
+    assert metrics.count(AuthEventType.CACHE_MISS, cache="user") == 2
+    assert metrics.count(AuthEventType.SESSION_HASH_INVALID) == 1
+
+
+async def test_multi_backend_emits_events() -> None:
+    class _Backend(AuthenticationBackend):
+        async def authenticate(self, conn: HTTPConnection) -> tuple[AuthCredentials, BaseUser] | None:
+            return AuthCredentials(), User("root")
+
+    with observe(MetricsObserver()) as metrics:
+        await MultiBackend([_Backend()]).authenticate(HTTPConnection({"type": "http"}))
+    assert metrics.count(AuthEventType.BACKEND_CALLED, backend="_Backend", result="hit") == 1
+
+
+def test_login_logout_and_redirect_emit_events() -> None:
+    async def login_view(request: Request) -> Response:
+        await login(request, User(username="root"), secret_key="key!")
+        await logout(request)
+        return PlainTextResponse("ok")
+
+    app = Starlette(
+        routes=[Route("/", lambda request: PlainTextResponse("")), Route("/login", login_view, name="login")],
+        middleware=[
+            Middleware(SessionMiddleware, secret_key="key!"),
+            Middleware(AuthenticationMiddleware, backend=MultiBackend([])),
+            Middleware(LoginRequiredMiddleware, public_paths=["/login"]),
+        ],
+    )
+    client = TestClient(app)
+    with observe(MetricsObserver()) as metrics:
+        client.get("/", follow_redirects=False)
+        client.get("/login")
+
+    assert metrics.count(AuthEventType.REDIRECT, type="http") == 1
+    assert metrics.count(AuthEventType.LOGIN) == 1
+    assert metrics.count(AuthEventType.LOGOUT) == 1
+
+
+def test_metrics_observer_renders_prometheus_format() -> None:
+    metrics = MetricsObserver(buckets=(0.1, 1.0))
+    metrics(AuthEvent(type=AuthEventType.USER_LOADED, duration=0.05, labels={"found": "yes"}))
+    metrics(AuthEvent(type=AuthEventType.USER_LOADED, duration=0.5, labels={"found": "yes"}))
+    metrics(AuthEvent(type=AuthEventType.REDIRECT, labels={"type": "http"}))
+
+    assert metrics.render() == (
+        "# TYPE starlette_auth_events_total counter\n"
+        'starlette_auth_events_total{event="redirect",type="http"} 1\n'
+        'starlette_auth_events_total{event="user_loaded",found="yes"} 2\n'
+        "# TYPE starlette_auth_event_duration_seconds histogram\n"
+        'starlette_auth_event_duration_seconds_bucket{event="user_loaded",found="yes",le="0.1"} 1\n'
+        'starlette_auth_event_duration_seconds_bucket{event="user_loaded",found="yes",le="1.0"} 2\n'
+        'starlette_auth_event_duration_seconds_bucket{event="user_loaded",found="yes",le="+Inf"} 2\n'
+        'starlette_auth_event_duration_seconds_sum{event="user_loaded",found="yes"} 0.55\n'
+        'starlette_auth_event_duration_seconds_count{event="user_loaded",found="yes"} 2\n'
+    )
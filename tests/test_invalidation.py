@@ -0,0 +1,139 @@
+import asyncio
+import json
+import pathlib
+import typing
+from unittest import mock
+
+import pytest
+from starlette.requests import HTTPConnection
+
+from starlette_auth import CachedUserLoader, InProcessInvalidationBus, LocalSocketInvalidationBus, logout
+from starlette_auth.authentication import update_session_auth_hash
+from starlette_auth.invalidation import InvalidationBus, set_default_bus
+from tests.conftest import User, UserWithSessionHash
+
+
+class _Collector:
+    def __init__(self) -> None:
+        self.batches: list[list[str]] = []
+
+    def __call__(self, keys: typing.Sequence[str]) -> None:
+        self.batches.append(list(keys))
+
+
+@pytest.fixture
+def default_bus() -> typing.Generator[InvalidationBus, None, None]:
+    bus = InProcessInvalidationBus(delay=0)
+    set_default_bus(bus)
+    yield bus
+    set_default_bus(None)
+
+
+async def test_in_process_bus_batches_and_coalesces_keys() -> None:
+    bus = InProcessInvalidationBus(delay=0.01, max_batch_size=2)
+    collector = _Collector()
+    bus.subscribe(collector)
+
+    bus.publish("user:1")
+    bus.publish("user:2")
+    bus.publish("user:1")
+    bus.publish("user:3")
+    assert collector.batches == []
+
+    await asyncio.sleep(0.02)
+    assert collector.batches == [["user:1", "user:2"], ["user:3"]]
+
+    bus.unsubscribe(collector)
+    bus.publish("user:1")
+    await bus.close()
+    assert len(collector.batches) == 2
+
+
+async def test_bus_accepts_keys_from_other_threads() -> None:
+    bus = InProcessInvalidationBus(delay=0)
+    collector = _Collector()
+    bus.subscribe(collector)
+    await asyncio.to_thread(bus.publish, "user:1")
+    await asyncio.sleep(0.01)
+    assert collector.batches == [["user:1"]]
+    await bus.close()
+
+
+def test_bus_requires_event_loop() -> None:
+    bus = InProcessInvalidationBus()
+    with pytest.raises(RuntimeError):
+        bus.publish("user:1")
+
+
+async def test_cached_user_loader_applies_invalidations_of_other_nodes() -> None:
+    bus = InProcessInvalidationBus(delay=0)
+    user_loader = mock.AsyncMock(return_value=User(username="root"))
+    local = CachedUserLoader(user_loader, bus=bus)
+    remote = CachedUserLoader(user_loader, bus=bus)
+    conn = HTTPConnection({"type": "http"})
+    await local(conn, "root")
+    await remote(conn, "root")
+    assert len(local) == len(remote) == 1
+
+    remote.invalidate("root")
+    assert len(remote) == 0
+    assert len(local) == 1
+    await bus.flush()
+    assert len(local) == 0
+
+
+async def test_update_session_auth_hash_and_logout_publish(default_bus: InvalidationBus) -> None:
+    collector = _Collector()
+    default_bus.subscribe(collector)
+    user = UserWithSessionHash(username="root", password="password")
+    conn = HTTPConnection({"type": "http", "session": {}, "user": user})
+
+    update_session_auth_hash(conn, user, "key!")
+    await logout(conn)
+    await logout(conn)  # anonymous user
+    await default_bus.flush()
+    assert collector.batches == [["user:root"]]
+
+
+async def test_local_socket_bus_delivers_to_other_nodes(tmp_path: pathlib.Path) -> None:
+    first = LocalSocketInvalidationBus(tmp_path, node_id="first", delay=0)
+    second = LocalSocketInvalidationBus(tmp_path, node_id="second", delay=0)
+    first_collector, second_collector = _Collector(), _Collector()
+    first.subscribe(first_collector)
+    second.subscribe(second_collector)
+    await first.start()
+    await second.start()
+    try:
+        first.publish("user:1")
+        first.publish("user:1")
+        await first.flush()
+        await asyncio.sleep(0.01)
+        assert first_collector.batches == [["user:1"]]
+        assert second_collector.batches == [["user:1"]]
+
+        # replayed batches are ignored
+        assert first._socket
+        replay = {"node": "first", "boot": first.boot_id, "seq": 1, "keys": ["user:1"]}
+        first._socket.sendto(json.dumps(replay).encode(), str(second.path))
+        first._socket.sendto(b"garbage", str(second.path))
+        await asyncio.sleep(0.01)
+        assert second_collector.batches == [["user:1"]]
+
+        # a restarted node starts its sequence again
+        restarted = {"node": "first", "boot": "restarted", "seq": 1, "keys": ["user:2"]}
+        first._socket.sendto(json.dumps(restarted).encode(), str(second.path))
+        await asyncio.sleep(0.01)
+        assert second_collector.batches == [["user:1"], ["user:2"]]
+    finally:
+        await first.close()
+        await second.close()
+
+    assert list(tmp_path.iterdir()) == []
+
+
+async def test_local_socket_bus_restarts_after_crash(tmp_path: pathlib.Path) -> None:
+    (tmp_path / "node.sock").touch()  # the previous process crashed without close()
+    bus = LocalSocketInvalidationBus(tmp_path, node_id="node", delay=0)
+    await bus.start()
+    await bus.close()
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,73 @@
+import asyncio
+
+from starlette.authentication import BaseUser
+from starlette.requests import HTTPConnection
+
+from starlette_auth import BatchUserLoader, SessionBackend
+from starlette_auth.authentication import SESSION_KEY
+from tests.conftest import User
+
+
+class _BulkLoader:
+    def __init__(self) -> None:
+        self.batches: list[list[str]] = []
+
+    async def __call__(self, ids: list[str]) -> dict[str, BaseUser]:
+        self.batches.append(ids)
+        return {user_id: User(username=user_id) for user_id in ids if user_id != "missing"}
+
+
+async def test_batch_user_loader_loads_ids_in_one_batch() -> None:
+    bulk_loader = _BulkLoader()
+    loader = BatchUserLoader(bulk_loader)
+    conn = HTTPConnection({"type": "http"})
+
+    users = await asyncio.gather(loader(conn, "one"), loader(conn, "two"), loader(conn, "one"))
+    assert list(users) == [User(username="one"), User(username="two"), User(username="one")]
+    assert bulk_loader.batches == [["one", "two"]]
+
+
+async def test_batch_user_loader_resolves_missing_ids_to_none() -> None:
+    loader = BatchUserLoader(_BulkLoader())
+    conn = HTTPConnection({"type": "http"})
+
+    users = await asyncio.gather(loader(conn, "one"), loader(conn, "missing"))
+    assert list(users) == [User(username="one"), None]
+
+
+async def test_batch_user_loader_respects_max_batch_size() -> None:
+    bulk_loader = _BulkLoader()
+    loader = BatchUserLoader(bulk_loader, max_batch_size=2)
+    conn = HTTPConnection({"type": "http"})
+
+    await asyncio.gather(*[loader(conn, str(index)) for index in range(5)])
+    assert bulk_loader.batches == [["0", "1"], ["2", "3"], ["4"]]
+    assert loader.stats.batches == 3
+    assert loader.stats.loaded_ids == 5
+    assert loader.stats.max_batch_size == 2
+
+
+async def test_batch_user_loader_propagates_errors() -> None:
+    async def load_many(ids: list[str]) -> dict[str, BaseUser]:
+        raise ValueError("boom")
+
+    loader = BatchUserLoader(load_many)
+    conn = HTTPConnection({"type": "http"})
+
+    results = await asyncio.gather(loader(conn, "one"), loader(conn, "two"), return_exceptions=True)
+    assert all(isinstance(result, ValueError) for result in results)
+    assert loader.stats.batches == 1
+
+
+async def test_batch_user_loader_with_session_backend() -> None:
+    bulk_loader = _BulkLoader()
+    backend = SessionBackend(user_loader=BatchUserLoader(bulk_loader), secret_key="key!")
+
+    results = await asyncio.gather(
+        *[
+            backend.authenticate(HTTPConnection({"type": "http", "session": {SESSION_KEY: user_id}}))
+            for user_id in ["one", "two", "three"]
+        ]
+    )
+    assert all(results)
+    assert bulk_loader.batches == [["one", "two", "three"]]
@@ -6,11 +6,15 @@ from starlette.authentication import AuthCredentials, AuthenticationBackend, Bas
 from starlette.middleware import Middleware
 from starlette.middleware.authentication import AuthenticationMiddleware
 from starlette.requests import HTTPConnection, Request
-from starlette.routing import Route
-from starlette.testclient import TestClient
-from starlette.types import Message
-
-from starlette_auth import LoginRequiredMiddleware
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route, WebSocketRoute
+from starlette.status import WS_1008_POLICY_VIOLATION
+from starlette.testclient import TestClient, WebSocketDisconnect
+from starlette.types import Message, Receive, Scope, Send
+from starlette.websockets import WebSocket
+
+from starlette_auth import LoginRequiredMiddleware, SessionBackend
+from starlette_auth.authentication import build_redirect_location, SESSION_KEY
 from tests.conftest import User
 
 
@@ -110,3 +114,104 @@ async def test_login_calls_next_app_on_success(user: User) -> None:
     app = LoginRequiredMiddleware(base_app)
     await app({"type": "websocket", "user": user}, receive, send)
     base_app.assert_called_once()
+
+
+def test_login_required_middleware_resolves_lazy_user(user: User) -> None:
+    async def user_loader(conn: HTTPConnection, user_id: str) -> BaseUser | None:
+        return user if user_id == user.identity else None
+
+    async def set_session(scope: Scope, receive: Receive, send: Send) -> None:
+        scope["session"] = {SESSION_KEY: scope["query_string"].decode()}
+        await app(scope, receive, send)
+
+    app = Starlette(
+        routes=[Route("/", lambda request: PlainTextResponse(request.user.identity))],
+        middleware=[
+            Middleware(AuthenticationMiddleware, backend=SessionBackend(user_loader, secret_key="key!", lazy=True)),
+            Middleware(LoginRequiredMiddleware, redirect_url="/login"),
+        ],
+    )
+    client = TestClient(set_session)
+    assert client.get("/?root").text == "root"
+    assert client.get("/?missing", follow_redirects=False).status_code == 302
+
+
+def test_login_required_middleware_allows_public_paths(user: User) -> None:
+    app = Starlette(
+        routes=[
+            Route("/", view),
+            Route("/login", lambda request: PlainTextResponse("login"), name="login"),
+            Route("/static/{path:path}", lambda request: PlainTextResponse("static")),
+        ],
+        middleware=[
+            Middleware(AuthenticationMiddleware, backend=_DummyLoginBackend(user)),
+            Middleware(LoginRequiredMiddleware, public_paths=["/login", "/static/*"]),
+        ],
+    )
+    client = TestClient(app)
+    assert client.get("/login").text == "login"
+    assert client.get("/static/app.css").text == "static"
+    assert client.get("/login/other", follow_redirects=False).status_code == 302
+    assert client.get("/", follow_redirects=False).status_code == 302
+
+
+def test_login_required_middleware_caches_redirect_url(user: User) -> None:
+    app = Starlette(routes=[Route("/login", view, name="login")])
+    middleware = LoginRequiredMiddleware(app)
+    with mock.patch.object(app, "url_path_for", wraps=app.url_path_for) as url_path_for:
+        assert middleware.get_redirect_url(app) == "/login"
+        assert middleware.get_redirect_url(app) == "/login"
+        assert url_path_for.call_count == 1
+
+        # changing routes invalidates the cache
+        app.router.routes.insert(0, Route("/security/login", view, name="login"))
+        assert middleware.get_redirect_url(app) == "/security/login"
+        assert url_path_for.call_count == 2
+
+
+@pytest.mark.parametrize(
+    "redirect_url, path, query_string, location",
+    [
+        ("/login", "/", b"", "/login?next=%2F"),
+        ("/login", "/items", b"page=2&sort=name", "/login?next=%2Fitems%3Fpage%3D2%26sort%3Dname"),
+        ("/login", "/a b/ü", b"", "/login?next=%2Fa+b%2F%C3%BC"),
+        ("/login?lang=en", "/items", b"", "/login?lang=en&next=%2Fitems"),
+        ("/login#frag", "/p", b"", "/login?next=%2Fp#frag"),
+        ("/login?lang=en#frag", "/p", b"", "/login?lang=en&next=%2Fp#frag"),
+    ],
+)
+def test_build_redirect_location(redirect_url: str, path: str, query_string: bytes, location: str) -> None:
+    assert build_redirect_location(redirect_url, {"path": path, "query_string": query_string}) == location
+
+
+def test_login_required_middleware_redirect_keeps_query(user: User) -> None:
+    app = Starlette(
+        routes=[Route("/", view)],
+        middleware=[
+            Middleware(AuthenticationMiddleware, backend=_DummyLoginBackend(user)),
+            Middleware(LoginRequiredMiddleware, redirect_url="/login"),
+        ],
+    )
+    client = TestClient(app)
+    response = client.get("/?page=2", follow_redirects=False)
+    assert response.status_code == 302
+    assert response.headers["location"] == "/login?next=%2F%3Fpage%3D2"
+    assert response.content == b""
+
+
+def test_login_required_middleware_closes_anonymous_websockets(user: User) -> None:
+    async def endpoint(websocket: WebSocket) -> None:  # pragma: no cover
+        await websocket.accept()
+
+    app = Starlette(
+        routes=[WebSocketRoute("/ws", endpoint)],
+        middleware=[
+            Middleware(AuthenticationMiddleware, backend=_DummyLoginBackend(user)),
+            Middleware(LoginRequiredMiddleware, redirect_url="/login"),
+        ],
+    )
+    client = TestClient(app)
+    with pytest.raises(WebSocketDisconnect) as ex:
+        with client.websocket_connect("/ws"):
+            pass  # pragma: no cover
+    assert ex.value.code == WS_1008_POLICY_VIOLATION
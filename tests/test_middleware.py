@@ -0,0 +1,337 @@
+import time
+import typing
+from unittest import mock
+
+import pytest
+from starlette.applications import Starlette
+from starlette.authentication import AuthCredentials, AuthenticationBackend, AuthenticationError, BaseUser
+from starlette.middleware import Middleware
+from starlette.requests import HTTPConnection, Request
+from starlette.responses import PlainTextResponse
+from starlette.middleware.authentication import AuthenticationMiddleware
+from starlette.middleware.sessions import SessionMiddleware
+from starlette.routing import Mount, Route, WebSocketRoute
+from starlette.status import WS_1008_POLICY_VIOLATION
+from starlette.testclient import TestClient, WebSocketDisconnect
+from starlette.websockets import WebSocket
+
+from starlette_auth import (
+    AuthMiddleware,
+    AuthPolicy,
+    login,
+    LoginScopes,
+    ScopeRequirementsMiddleware,
+    SessionBackend,
+)
+from starlette_auth.scopes import scope_registry
+from tests.conftest import User
+
+
+class _HeaderBackend(AuthenticationBackend):
+    def __init__(self, header: str) -> None:
+        self.header = header
+        self.calls = 0
+
+    async def authenticate(self, conn: HTTPConnection) -> tuple[AuthCredentials, BaseUser] | None:
+        self.calls += 1
+        if (value := conn.headers.get(self.header)) == "error":
+            raise AuthenticationError("Invalid credentials.")
+        return (AuthCredentials([self.header]), User(username=value)) if value else None
+
+
+def view(request: Request) -> PlainTextResponse:
+    return PlainTextResponse(f"{request.user.is_authenticated}:{','.join(request.auth.scopes)}")
+
+
+async def websocket_view(websocket: WebSocket) -> None:
+    await websocket.accept()
+    await websocket.send_text(websocket.user.identity)
+    await websocket.close()
+
+
+@pytest.fixture
+def session_backend() -> _HeaderBackend:
+    return _HeaderBackend("x-session")
+
+
+@pytest.fixture
+def token_backend() -> _HeaderBackend:
+    return _HeaderBackend("x-token")
+
+
+def _client(session_backend: _HeaderBackend, token_backend: _HeaderBackend, **kwargs: typing.Any) -> TestClient:
+    app = Starlette(
+        routes=[
+            Route("/", view),
+            Route("/login", view, name="login"),
+            Route("/static/app.js", view),
+            Route("/api/users", view),
+            Route("/account", view),
+            WebSocketRoute("/ws", websocket_view),
+        ],
+        middleware=[
+            Middleware(
+                AuthMiddleware,
+                session_backends=[session_backend],
+                token_backends=[token_backend],
+                policies={
+                    "/static/*": AuthPolicy.ANONYMOUS,
+                    "/api/*": AuthPolicy.TOKEN,
+                    "/account": AuthPolicy.SESSION,
+                },
+                **kwargs,
+            )
+        ],
+    )
+    return TestClient(app)
+
+
+def test_auth_middleware_uses_backends_of_path_policy(
+    session_backend: _HeaderBackend, token_backend: _HeaderBackend
+) -> None:
+    client = _client(session_backend, token_backend)
+    headers = {"x-session": "root", "x-token": "root"}
+
+    assert client.get("/static/app.js", headers=headers).text == "False:"
+    assert session_backend.calls == token_backend.calls == 0
+
+    assert client.get("/api/users", headers=headers).text == "True:x-token"
+    assert client.get("/api/users", headers={"x-session": "root"}).text == "False:"
+    assert session_backend.calls == 0
+
+    assert client.get("/account", headers=headers).text == "True:x-session"
+    assert client.get("/account", headers={"x-token": "root"}).text == "False:"
+    assert token_backend.calls == 2
+
+    # default policy tries session backends, then token backends
+    assert client.get("/", headers={"x-token": "root"}).text == "True:x-token"
+
+
+def test_auth_middleware_default_policy(session_backend: _HeaderBackend, token_backend: _HeaderBackend) -> None:
+    client = _client(session_backend, token_backend, default_policy=AuthPolicy.ANONYMOUS)
+    assert client.get("/", headers={"x-session": "root"}).text == "False:"
+    assert session_backend.calls == 0
+
+
+def test_auth_middleware_requires_login(session_backend: _HeaderBackend, token_backend: _HeaderBackend) -> None:
+    client = _client(session_backend, token_backend, login_required=True, public_paths=["/login"])
+
+    response = client.get("/account?tab=1", follow_redirects=False)
+    assert response.status_code == 302
+    assert response.headers["location"] == "/login?next=%2Faccount%3Ftab%3D1"
+
+    assert client.get("/account", headers={"x-session": "root"}).status_code == 200
+    assert client.get("/login").status_code == 200
+    assert client.get("/static/app.js").status_code == 200
+
+    with pytest.raises(WebSocketDisconnect) as ex:
+        with client.websocket_connect("/ws"):
+            pass  # pragma: no cover
+    assert ex.value.code == WS_1008_POLICY_VIOLATION
+
+    with client.websocket_connect("/ws", headers={"x-token": "root"}) as websocket:
+        assert websocket.receive_text() == "root"
+
+
+def test_auth_middleware_handles_authentication_errors(
+    session_backend: _HeaderBackend, token_backend: _HeaderBackend
+) -> None:
+    client = _client(session_backend, token_backend)
+    response = client.get("/", headers={"x-session": "error"})
+    assert response.status_code == 400
+    assert response.text == "Invalid credentials."
+
+    with pytest.raises(WebSocketDisconnect) as ex:
+        with client.websocket_connect("/ws", headers={"x-session": "error"}):
+            pass  # pragma: no cover
+    assert ex.value.code == 1000
+
+
+def test_auth_middleware_first_matching_policy_wins() -> None:
+    middleware = AuthMiddleware(
+        PlainTextResponse(""),
+        policies={"/api/public": AuthPolicy.ANONYMOUS, "/api/*": AuthPolicy.TOKEN},
+        default_policy=AuthPolicy.SESSION,
+    )
+    assert middleware.get_policy("/api/public") == AuthPolicy.ANONYMOUS
+    assert middleware.get_policy("/api/public/nested") == AuthPolicy.TOKEN
+    assert middleware.get_policy("/") == AuthPolicy.SESSION
+
+
+class _ScopesBackend(AuthenticationBackend):
+    async def authenticate(self, conn: HTTPConnection) -> tuple[AuthCredentials, BaseUser] | None:
+        if "x-scopes" not in conn.headers:
+            return None
+        return scope_registry.credentials(filter(None, conn.headers["x-scopes"].split(","))), User(username="root")
+
+
+def _scopes_client() -> TestClient:
+    app = Starlette(
+        routes=[
+            Route("/login", view, name="login"),
+            Route("/users", view, name="users", methods=["GET", "POST", "DELETE"]),
+            Route("/password", view, name="change_password"),
+            Route("/public", view, name="public"),
+            Mount("/admin", routes=[Route("/settings", view, name="settings")], name="admin"),
+            WebSocketRoute("/ws", websocket_view, name="ws"),
+        ],
+        middleware=[
+            Middleware(AuthenticationMiddleware, backend=_ScopesBackend()),
+            Middleware(
+                ScopeRequirementsMiddleware,
+                requirements={
+                    "users": {"POST": ["users:write"], "delete": ["users:write", "admin"], "*": ["users:read"]},
+                    "change_password": [LoginScopes.FRESH],
+                    "admin:settings": "admin",
+                    "ws": ["chat"],
+                },
+            ),
+        ],
+    )
+    return TestClient(app)
+
+
+@pytest.mark.parametrize(
+    "method, path, scopes, status_code",
+    [
+        ("GET", "/users", "users:read", 200),
+        ("GET", "/users", "users:write", 403),
+        ("HEAD", "/users", "", 403),
+        ("HEAD", "/users", "users:read", 200),
+        ("POST", "/users", "users:write", 200),
+        ("POST", "/users", "users:read", 403),
+        ("DELETE", "/users", "users:write", 403),
+        ("DELETE", "/users", "users:write,admin", 200),
+        ("GET", "/admin/settings", "admin", 200),
+        ("GET", "/admin/settings", "", 403),
+        ("HEAD", "/admin/settings", "", 403),
+        ("GET", "/public", "", 200),
+        ("GET", "/password", LoginScopes.FRESH, 200),
+    ],
+)
+def test_scope_requirements_middleware(method: str, path: str, scopes: str, status_code: int) -> None:
+    response = _scopes_client().request(method, path, headers={"x-scopes": scopes})
+    assert response.status_code == status_code
+
+
+def test_scope_requirements_middleware_redirects_to_relogin() -> None:
+    client = _scopes_client()
+    response = client.get("/password", headers={"x-scopes": LoginScopes.REMEMBERED}, follow_redirects=False)
+    assert response.status_code == 302
+    assert response.headers["location"] == "/login?next=%2Fpassword"
+
+
+def test_scope_requirements_middleware_closes_websockets() -> None:
+    client = _scopes_client()
+    with pytest.raises(WebSocketDisconnect) as ex:
+        with client.websocket_connect("/ws", headers={"x-scopes": "users:read"}):
+            pass  # pragma: no cover
+    assert ex.value.code == WS_1008_POLICY_VIOLATION
+
+    with client.websocket_connect("/ws", headers={"x-scopes": "chat"}) as websocket:
+        assert websocket.receive_text() == "root"
+
+
+def test_scope_requirements_middleware_head_uses_get_requirement() -> None:
+    middleware = ScopeRequirementsMiddleware(
+        PlainTextResponse(""),
+        requirements={"users": {"GET": ["users:read"]}, "feed": {"GET": ["feed"], "HEAD": []}},
+    )
+    assert middleware.requirements["users"][0]["HEAD"] == {"users:read"}
+    assert middleware.requirements["feed"][0]["HEAD"] == frozenset()
+
+
+def test_scope_requirements_middleware_does_not_modify_routes() -> None:
+    client = _scopes_client()
+    app = typing.cast(Starlette, client.app)
+    endpoints = [getattr(route, "app", None) for route in app.router.routes]
+    client.get("/users", headers={"x-scopes": "users:read"})
+    assert [getattr(route, "app", None) for route in app.router.routes] == endpoints
+
+    # routes shared by applications get requirements of each application
+    shared = Starlette(
+        routes=app.router.routes, middleware=[Middleware(AuthenticationMiddleware, backend=_ScopesBackend())]
+    )
+    assert TestClient(shared).get("/users").status_code == 200
+    assert client.get("/users").status_code == 403
+
+
+class _AdminUser(User):
+    def get_scopes(self) -> list[str]:
+        return ["admin"] if self.username == "admin" else []
+
+
+async def _session_user_loader(conn: HTTPConnection, user_id: str) -> BaseUser | None:
+    return _AdminUser(username=user_id)
+
+
+def test_scope_requirements_middleware_grants_fresh_scope_after_login() -> None:
+    async def login_view(request: Request) -> PlainTextResponse:
+        await login(request, User(username="root"), secret_key="key!")
+        return PlainTextResponse("ok")
+
+    app = Starlette(
+        routes=[
+            Route("/login", login_view, name="login"),
+            Route("/secret", view, name="secret"),
+        ],
+        middleware=[
+            Middleware(SessionMiddleware, secret_key="key!"),
+            Middleware(
+                AuthenticationMiddleware,
+                backend=SessionBackend(_session_user_loader, secret_key="key!", fresh_max_age=60),
+            ),
+            Middleware(ScopeRequirementsMiddleware, requirements={"secret": [LoginScopes.FRESH]}),
+        ],
+    )
+    client = TestClient(app)
+    assert client.get("/secret", follow_redirects=False).headers["location"] == "/login?next=%2Fsecret"
+
+    client.get("/login")
+    assert client.get("/secret").status_code == 200
+
+    with mock.patch("time.time", return_value=time.time() + 120):
+        response = client.get("/secret", follow_redirects=False)
+    assert response.status_code == 302
+    assert response.headers["location"] == "/login?next=%2Fsecret"
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_scope_requirements_middleware_loads_lazy_users(lazy: bool) -> None:
+    async def login_view(request: Request) -> PlainTextResponse:
+        await login(request, _AdminUser(username=request.query_params["username"]), secret_key="key!")
+        return PlainTextResponse("ok")
+
+    app = Starlette(
+        routes=[Route("/login", login_view, name="login"), Route("/admin", view, name="admin")],
+        middleware=[
+            Middleware(SessionMiddleware, secret_key="key!"),
+            Middleware(
+                AuthenticationMiddleware,
+                backend=SessionBackend(_session_user_loader, secret_key="key!", lazy=lazy),
+            ),
+            Middleware(ScopeRequirementsMiddleware, requirements={"admin": ["admin"]}),
+        ],
+    )
+    client = TestClient(app)
+    client.get("/login", params={"username": "admin"})
+    assert client.get("/admin").status_code == 200
+
+    client.get("/login", params={"username": "root"})
+    assert client.get("/admin").status_code == 403
+
+
+@pytest.mark.parametrize("name", ["user", "settings", "admin:users"])
+def test_scope_requirements_middleware_rejects_unknown_routes(name: str) -> None:
+    app = Starlette(
+        routes=[
+            Route("/users", view, name="users"),
+            Mount("/admin", routes=[Route("/settings", view, name="settings")], name="admin"),
+        ],
+        middleware=[Middleware(ScopeRequirementsMiddleware, requirements={"users": ["admin"], name: ["admin"]})],
+    )
+    with pytest.raises(ValueError, match=f"unknown routes: {name}."):
+        with TestClient(app):
+            pass  # pragma: no cover
+    with pytest.raises(ValueError, match=f"unknown routes: {name}."):
+        TestClient(app).get("/users")
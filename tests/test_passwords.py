@@ -0,0 +1,93 @@
+import asyncio
+import base64
+import concurrent.futures
+import hashlib
+import threading
+
+import pytest
+
+from starlette_auth import HashingOverloaded, PasswordVerifier, PBKDF2Hasher, ScryptHasher
+
+
+@pytest.fixture
+def verifier() -> PasswordVerifier:
+    return PasswordVerifier([ScryptHasher(n=2**4), PBKDF2Hasher(iterations=10)])
+
+
+def test_hashers_use_django_formats() -> None:
+    digest = base64.b64encode(hashlib.pbkdf2_hmac("sha256", b"password", b"salt", 1000)).decode()
+    assert PBKDF2Hasher(iterations=1000).encode("password", "salt") == f"pbkdf2_sha256$1000$salt${digest}"
+    assert ScryptHasher(n=2**4).encode("password", "salt").startswith("scrypt$16$salt$8$1$")
+
+
+def test_hasher_verifies_other_parameters() -> None:
+    encoded = PBKDF2Hasher(iterations=10).encode("password", "salt")
+    hasher = PBKDF2Hasher(iterations=20)
+    assert hasher.verify("password", encoded)
+    assert not hasher.verify("wrong", encoded)
+    assert not hasher.verify("password", "scrypt$16$salt$8$1$hash")
+    assert hasher.must_update(encoded)
+    assert hasher.must_update("garbage")
+    assert not hasher.must_update(hasher.encode("password", "salt"))
+
+
+async def test_password_verifier_hashes_and_verifies(verifier: PasswordVerifier) -> None:
+    encoded = await verifier.hash("password")
+    assert encoded.startswith("scrypt$")
+    assert await verifier.verify("password", encoded)
+    assert not await verifier.verify("wrong", encoded)
+    assert await verifier.verify_and_update("password", encoded) == (True, None)
+    assert await verifier.verify_and_update("wrong", encoded) == (False, None)
+    await verifier.close()
+
+
+async def test_password_verifier_rehashes_outdated_hashes(verifier: PasswordVerifier) -> None:
+    valid, new_hash = await verifier.verify_and_update("password", PBKDF2Hasher(iterations=10).encode("password", "s"))
+    assert valid
+    assert new_hash and new_hash.startswith("scrypt$16$")
+
+    valid, new_hash = await verifier.verify_and_update("password", ScryptHasher(n=2**3).encode("password", "s"))
+    assert valid
+    assert new_hash and new_hash.startswith("scrypt$16$")
+
+
+async def test_password_verifier_verifies_dummy_hash_for_unknown_users(verifier: PasswordVerifier) -> None:
+    calls: list[str] = []
+    hasher = verifier.preferred
+    original_verify = hasher.verify
+
+    def verify(password: str, encoded: str) -> bool:
+        calls.append(encoded)
+        return original_verify(password, encoded)
+
+    hasher.verify = verify  # type: ignore[method-assign]
+    assert not await verifier.verify("password", None)
+    assert not await verifier.verify("password", "md5$unknown")
+    assert len(calls) == 2
+    assert calls[0] == calls[1]
+    assert calls[0].startswith("scrypt$")
+
+
+async def test_password_verifier_limits_queue_depth() -> None:
+    release = threading.Event()
+
+    class _SlowHasher(PBKDF2Hasher):
+        def encode(self, password: str, salt: str) -> str:
+            release.wait()
+            return super().encode(password, salt)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+        verifier = PasswordVerifier([_SlowHasher(iterations=1)], executor=executor, max_concurrency=1, max_queue=1)
+        running = asyncio.create_task(verifier.hash("password"))
+        await asyncio.sleep(0.01)
+        queued = asyncio.create_task(verifier.hash("password"))
+        await asyncio.sleep(0.01)
+        assert verifier.queue_depth == 1
+
+        with pytest.raises(HashingOverloaded):
+            await verifier.hash("password")
+
+        release.set()
+        assert all(await asyncio.gather(running, queued))
+        assert verifier.queue_depth == 0
+        await verifier.close()
@@ -0,0 +1,274 @@
+import asyncio
+from unittest import mock
+
+from starlette.applications import Starlette
+from starlette.authentication import BaseUser
+from starlette.middleware import Middleware
+from starlette.middleware.authentication import AuthenticationMiddleware
+from starlette.middleware.sessions import SessionMiddleware
+from starlette.requests import HTTPConnection, Request
+from starlette.responses import PlainTextResponse, Response
+from starlette.routing import Route
+from starlette.testclient import TestClient
+from starlette.types import Receive, Scope, Send
+from starsessions import CookieStore, load_session, SessionMiddleware as StarsessionSessionMiddleware
+
+from starlette_auth import (
+    InMemoryGenerationStore,
+    InMemoryRememberMeStore,
+    is_confirmed,
+    login,
+    LoginScopes,
+    logout,
+    MultiBackend,
+    RememberMeBackend,
+    SessionBackend,
+    SessionGenerations,
+    set_remember_me_cookie,
+)
+from starlette_auth.authentication import SESSION_KEY
+from starlette_auth.remember_me import REMEMBER_ME_SCOPE_KEY
+from tests.conftest import Clock, User, UserWithSessionHash
+
+
+async def user_loader(conn: HTTPConnection, user_id: str) -> BaseUser | None:
+    return User(username=user_id)
+
+
+def _connection(cookie: str = "") -> HTTPConnection:
+    return HTTPConnection({"type": "http", "headers": [(b"cookie", f"remember_me={cookie}".encode())], "session": {}})
+
+
+async def test_remember_me_backend_authenticates_and_rotates_token() -> None:
+    store = InMemoryRememberMeStore()
+    backend = RememberMeBackend(store, user_loader, secret_key="key!")
+    cookie = await backend.remember(_connection(), User(username="root"))
+
+    conn = _connection(cookie)
+    result = await backend.authenticate(conn)
+    assert result
+    credentials, user = result
+    assert user == User(username="root")
+    assert LoginScopes.REMEMBERED in credentials.scopes
+    assert conn.session[SESSION_KEY] == "root"
+
+    new_cookie = conn.scope[REMEMBER_ME_SCOPE_KEY]
+    assert new_cookie != cookie
+    assert new_cookie.split(":")[0] == cookie.split(":")[0]
+    assert all(new_cookie.split(":")[1] not in token.token_hash for token in store.tokens.values())
+    assert await backend.authenticate(_connection(new_cookie))
+
+
+async def test_remember_me_backend_detects_stolen_tokens() -> None:
+    store = InMemoryRememberMeStore()
+    backend = RememberMeBackend(store, user_loader, secret_key="key!")
+    stolen_cookie = await backend.remember(_connection(), User(username="root"))
+    await backend.remember(_connection(), User(username="root"))
+    await backend.remember(_connection(), User(username="admin"))
+
+    # the attacker uses the cookie first, then the victim comes with the old token
+    assert await backend.authenticate(_connection(stolen_cookie))
+    assert not await backend.authenticate(_connection(stolen_cookie))
+    assert [token.user_id for token in store.tokens.values()] == ["admin"]
+
+
+async def test_remember_me_backend_rejects_invalid_cookies() -> None:
+    clock_value = 1000.0
+    backend = RememberMeBackend(
+        InMemoryRememberMeStore(), user_loader, secret_key="key!", max_age=10, clock=lambda: clock_value
+    )
+    cookie = await backend.remember(_connection(), User(username="root"))
+
+    assert not await backend.authenticate(HTTPConnection({"type": "http", "headers": []}))
+    assert not await backend.authenticate(_connection("garbage"))
+    assert not await backend.authenticate(_connection("unknown:token"))
+
+    clock_value = 2000.0
+    assert not await backend.authenticate(_connection(cookie))
+
+
+async def test_remember_me_backend_writes_last_use_in_batches() -> None:
+    clock = Clock(1000.0)
+    store = InMemoryRememberMeStore()
+    backend = RememberMeBackend(store, user_loader, secret_key="key!", flush_interval=0.05, clock=clock)
+    first = await backend.remember(_connection(), User(username="first"))
+    second = await backend.remember(_connection(), User(username="second"))
+
+    clock.now = 1001.0
+    conn = _connection(first)
+    await backend.authenticate(conn)
+    await asyncio.sleep(0.01)  # first use starts the flush
+    clock.now = 1001.02
+    await backend.authenticate(_connection(second))
+    await asyncio.sleep(0.01)
+    assert [token.last_used_at for token in store.tokens.values()] == [1001.0, 1000.0]
+
+    # the timer flushes without further requests
+    await asyncio.sleep(0.05)
+    assert [token.last_used_at for token in store.tokens.values()] == [1001.0, 1001.02]
+
+    clock.now = 1010.0
+    await backend.authenticate(_connection(conn.scope[REMEMBER_ME_SCOPE_KEY]))
+    await backend.close()
+    assert [token.last_used_at for token in store.tokens.values()] == [1010.0, 1001.02]
+
+
+def test_remember_me_flow() -> None:
+    backend = RememberMeBackend(InMemoryRememberMeStore(), user_loader, secret_key="key!")
+
+    async def login_view(request: Request) -> Response:
+        user = User(username="root")
+        await login(request, user, secret_key="key!")
+        await backend.remember(request, user)
+        response = PlainTextResponse("ok")
+        set_remember_me_cookie(response, request, backend, secure=False)
+        return response
+
+    async def logout_view(request: Request) -> Response:
+        await logout(request)
+        await backend.forget(request)
+        response = PlainTextResponse("ok")
+        set_remember_me_cookie(response, request, backend, secure=False)
+        return response
+
+    async def profile_view(request: Request) -> Response:
+        response = PlainTextResponse(f"{request.user.is_authenticated} {is_confirmed(request)}")
+        set_remember_me_cookie(response, request, backend, secure=False)
+        return response
+
+    app = Starlette(
+        routes=[Route("/login", login_view), Route("/logout", logout_view), Route("/profile", profile_view)],
+        middleware=[
+            Middleware(SessionMiddleware, secret_key="key!"),
+            Middleware(
+                AuthenticationMiddleware,
+                backend=MultiBackend([SessionBackend(user_loader, secret_key="key!"), backend]),
+            ),
+        ],
+    )
+    client = TestClient(app)
+    client.get("/login")
+    assert client.cookies.get("remember_me")
+
+    client.cookies.delete("session")  # browser closed
+    assert client.get("/profile").text == "True False"
+
+    client.get("/logout")
+    assert not client.cookies.get("remember_me")
+    assert client.get("/profile").text == "False False"
+
+
+def test_remember_me_backend_logs_users_with_session_auth_hash_in() -> None:
+    store = InMemoryRememberMeStore()
+    user = UserWithSessionHash(username="root", password="password")
+
+    async def hash_user_loader(conn: HTTPConnection, user_id: str) -> BaseUser | None:
+        return user if user_id == user.identity else None
+
+    backend = RememberMeBackend(store, hash_user_loader, secret_key="key!")
+
+    async def remember_view(request: Request) -> Response:
+        await backend.remember(request, user)
+        response = PlainTextResponse("ok")
+        set_remember_me_cookie(response, request, backend, secure=False)
+        return response
+
+    async def profile_view(request: Request) -> Response:
+        response = PlainTextResponse(f"{request.user.is_authenticated} {is_confirmed(request)}")
+        set_remember_me_cookie(response, request, backend, secure=False)
+        return response
+
+    app = Starlette(
+        routes=[Route("/remember", remember_view), Route("/profile", profile_view)],
+        middleware=[
+            Middleware(SessionMiddleware, secret_key="key!"),
+            Middleware(
+                AuthenticationMiddleware,
+                backend=MultiBackend([SessionBackend(hash_user_loader, secret_key="key!"), backend]),
+            ),
+        ],
+    )
+    client = TestClient(app)
+    client.get("/remember")
+    cookie = client.cookies.get("remember_me")
+
+    assert client.get("/profile").text == "True False"
+    rotated_cookie = client.cookies.get("remember_me")
+    assert rotated_cookie != cookie
+
+    # the session authenticates following requests, the token is not rotated again
+    with mock.patch.object(store, "save") as save:
+        assert client.get("/profile").text == "True False"
+        assert client.get("/profile").text == "True False"
+        save.assert_not_called()
+    assert client.cookies.get("remember_me") == rotated_cookie
+
+
+async def test_remember_me_backend_regenerates_session_id() -> None:
+    backend = RememberMeBackend(InMemoryRememberMeStore(), user_loader, secret_key="key!")
+    cookie = await backend.remember(_connection(), User(username="root"))
+
+    async def app(scope: Scope, receive: Receive, send: Send) -> None:
+        request = Request(scope, receive, send)
+        await load_session(request)
+        assert await backend.authenticate(request)
+        assert request.session[SESSION_KEY] == "root"
+        await Response("ok")(scope, receive, send)
+
+    with mock.patch("starsessions.regenerate_session_id") as fn:
+        client = TestClient(StarsessionSessionMiddleware(app, store=CookieStore(secret_key="key!")))
+        client.get("/", headers={"cookie": f"remember_me={cookie}"})
+        fn.assert_called_once()
+
+
+def test_remember_me_backend_respects_revoked_sessions() -> None:
+    store = InMemoryRememberMeStore()
+    generations = SessionGenerations(InMemoryGenerationStore())
+    backend = RememberMeBackend(store, user_loader, secret_key="key!", generations=generations)
+
+    async def login_view(request: Request) -> Response:
+        user = User(username="root")
+        await login(request, user, secret_key="key!", generations=generations)
+        await backend.remember(request, user)
+        response = PlainTextResponse("ok")
+        set_remember_me_cookie(response, request, backend, secure=False)
+        return response
+
+    async def profile_view(request: Request) -> Response:
+        response = PlainTextResponse(str(request.user.is_authenticated))
+        set_remember_me_cookie(response, request, backend, secure=False)
+        return response
+
+    app = Starlette(
+        routes=[Route("/login", login_view), Route("/profile", profile_view)],
+        middleware=[
+            Middleware(SessionMiddleware, secret_key="key!"),
+            Middleware(
+                AuthenticationMiddleware,
+                backend=MultiBackend(
+                    [SessionBackend(user_loader, secret_key="key!", generations=generations), backend]
+                ),
+            ),
+        ],
+    )
+    client = TestClient(app)
+    client.get("/login")
+    client.cookies.delete("session")
+    assert client.get("/profile").text == "True"
+    cookie = client.cookies.get("remember_me")
+    with mock.patch.object(store, "save") as save:
+        assert client.get("/profile").text == "True"
+        save.assert_not_called()
+    assert client.cookies.get("remember_me") == cookie
+
+    # revoke deletes the tokens of the user
+    asyncio.run(generations.revoke("root"))
+    assert store.tokens == {}
+    assert client.get("/profile").text == "False"
+
+    # tokens issued before revoke_all are rejected and deleted
+    client.get("/login")
+    client.cookies.delete("session")
+    asyncio.run(generations.revoke_all())
+    assert client.get("/profile").text == "False"
+    assert store.tokens == {}
@@ -0,0 +1,78 @@
+from unittest import mock
+
+from starlette.authentication import BaseUser
+from starlette.requests import HTTPConnection
+
+from starlette_auth import InMemoryGenerationStore, login, SessionBackend, SessionGenerations
+from starlette_auth.authentication import SESSION_KEY
+from starlette_auth.revocation import SESSION_GENERATION
+from tests.conftest import Clock, User
+
+
+async def user_loader(conn: HTTPConnection, user_id: str) -> BaseUser | None:
+    return User(username=user_id)
+
+
+async def _login(generations: SessionGenerations, username: str = "root") -> HTTPConnection:
+    conn = mock.MagicMock(session={}, scope={})
+    await login(conn, User(username=username), secret_key="key!", generations=generations)
+    return HTTPConnection({"type": "http", "session": conn.session})
+
+
+async def test_login_stores_generations() -> None:
+    generations = SessionGenerations(InMemoryGenerationStore())
+    conn = await _login(generations)
+    assert conn.session[SESSION_GENERATION] == [0, 0]
+
+
+async def test_revoke_user_sessions() -> None:
+    generations = SessionGenerations(InMemoryGenerationStore())
+    backend = SessionBackend(user_loader, secret_key="key!", generations=generations)
+    root_conn = await _login(generations, "root")
+    admin_conn = await _login(generations, "admin")
+    assert await backend.authenticate(root_conn)
+
+    await generations.revoke("root")
+    assert not await backend.authenticate(root_conn)
+    assert await backend.authenticate(admin_conn)
+
+    # login after revocation works
+    assert await backend.authenticate(await _login(generations, "root"))
+
+
+async def test_revoke_all_sessions() -> None:
+    generations = SessionGenerations(InMemoryGenerationStore())
+    backend = SessionBackend(user_loader, secret_key="key!", generations=generations)
+    root_conn = await _login(generations, "root")
+    admin_conn = await _login(generations, "admin")
+
+    await generations.revoke_all()
+    assert not await backend.authenticate(root_conn)
+    assert not await backend.authenticate(admin_conn)
+
+
+async def test_sessions_without_generation_are_valid_until_revoked() -> None:
+    generations = SessionGenerations(InMemoryGenerationStore())
+    backend = SessionBackend(user_loader, secret_key="key!", generations=generations)
+    conn = HTTPConnection({"type": "http", "session": {SESSION_KEY: "root"}})
+    assert await backend.authenticate(conn)
+
+    await generations.revoke("root")
+    assert not await backend.authenticate(conn)
+
+
+async def test_generations_are_cached() -> None:
+    clock = Clock()
+    store = InMemoryGenerationStore()
+    generations = SessionGenerations(store, refresh_interval=10, clock=clock)
+    conn = await _login(generations)
+
+    # revoked by another process
+    await store.increment("root")
+    with mock.patch.object(store, "get_many", wraps=store.get_many) as get_many:
+        assert await generations.is_valid(conn, "root")
+        get_many.assert_not_called()
+
+        clock.now = 20
+        assert not await generations.is_valid(conn, "root")
+        get_many.assert_called_once()
@@ -1,7 +1,18 @@
-from starlette.authentication import AuthCredentials
-from starlette.requests import Request
+import copy
+import pickle
+
+import pytest
+from starlette.applications import Starlette
+from starlette.authentication import AuthCredentials, AuthenticationBackend, BaseUser, requires
+from starlette.middleware import Middleware
+from starlette.middleware.authentication import AuthenticationMiddleware
+from starlette.requests import HTTPConnection, Request
+from starlette.responses import PlainTextResponse, Response
+from starlette.routing import Route
+from starlette.testclient import TestClient
 
 from starlette_auth.authentication import confirm_login, is_confirmed, LoginScopes
+from starlette_auth.scopes import scope_registry, ScopeRegistry, Scopes
 from tests.conftest import User
 
 
@@ -64,3 +75,65 @@ def test_confirm_login_when_already_confirmed(user: User) -> None:
     )
     confirm_login(request)
     assert is_confirmed(request)
+
+
+def test_confirm_login_replaces_shared_credentials(user: User) -> None:
+    credentials = scope_registry.credentials(["admin", LoginScopes.REMEMBERED])
+    request = Request({"type": "http", "headers": {}, "session": {}, "user": user, "auth": credentials})
+    confirm_login(request)
+    assert is_confirmed(request)
+    assert request.auth.scopes == ["admin", LoginScopes.FRESH]
+    assert credentials.scopes == ["admin", LoginScopes.REMEMBERED]
+
+
+def test_scopes_are_immutable_sets() -> None:
+    scopes = Scopes(["read", "write", "read"])
+    assert scopes == ["read", "write"]
+    assert "write" in scopes
+    assert "admin" not in scopes
+    assert scopes.members == frozenset({"read", "write"})
+    with pytest.raises(TypeError):
+        scopes.append("admin")
+    with pytest.raises(TypeError):
+        scopes[0] = "admin"
+
+
+def test_scopes_and_credentials_can_be_copied_and_pickled() -> None:
+    credentials = scope_registry.credentials(["read", "write"])
+    assert copy.copy(credentials.scopes) is credentials.scopes
+    assert copy.deepcopy(credentials.scopes) is credentials.scopes
+    assert copy.deepcopy(credentials).scopes == ["read", "write"]
+
+    restored = pickle.loads(pickle.dumps(credentials))
+    assert isinstance(restored.scopes, Scopes)
+    assert restored.scopes == ["read", "write"]
+    assert restored.scopes.members == {"read", "write"}
+
+
+def test_scope_registry_shares_credentials() -> None:
+    registry = ScopeRegistry(max_entries=2)
+    assert registry.credentials(["read", "write"]) is registry.credentials(["write", "read"])
+    assert registry.credentials(iter(["read"])) is registry.credentials(("read",))
+    assert registry.credentials([]) is not registry.credentials([])  # cache is full
+    assert len(registry) == 2
+
+    registry.clear()
+    assert len(registry) == 0
+
+
+def test_shared_credentials_work_with_requires() -> None:
+    @requires(["read"])
+    async def view(request: Request) -> Response:
+        return PlainTextResponse("ok")
+
+    class _Backend(AuthenticationBackend):
+        async def authenticate(self, conn: HTTPConnection) -> tuple[AuthCredentials, BaseUser] | None:
+            return scope_registry.credentials(conn.query_params.getlist("scope")), User(username="root")
+
+    app = Starlette(
+        routes=[Route("/", view)],
+        middleware=[Middleware(AuthenticationMiddleware, backend=_Backend())],
+    )
+    client = TestClient(app)
+    assert client.get("/?scope=read&scope=write").status_code == 200
+    assert client.get("/?scope=write").status_code == 403
@@ -0,0 +1,179 @@
+import dataclasses
+import json
+import typing
+from unittest import mock
+
+import pytest
+from starlette.authentication import AuthCredentials
+from starlette.middleware.sessions import SessionMiddleware
+from starlette.requests import HTTPConnection, Request
+from starlette.responses import Response
+from starlette.testclient import TestClient
+from starlette.types import Receive, Scope, Send
+
+from starlette_auth import confirm_login, login, LoginScopes, logout, session_write_stats, SessionBackend
+from starlette_auth.authentication import (
+    read_session_auth,
+    SESSION_COMPACT,
+    SESSION_HASH,
+    SESSION_KEY,
+    SESSION_LOGIN_AT,
+    update_session_auth_hash,
+    validate_session_auth_hash,
+    write_session_auth,
+)
+from starlette_auth.hashing import compact_digest
+from starlette_auth.sessions import clear_session, pop_session_value, set_session_value
+from tests.conftest import User, UserWithSessionHash
+
+
+@pytest.fixture(autouse=True)
+def reset_stats() -> None:
+    session_write_stats.reset()
+
+
+def test_set_session_value() -> None:
+    session: dict[str, object] = {}
+    assert set_session_value(session, "key", "value")
+    assert not set_session_value(session, "key", "value")
+    assert set_session_value(session, "key", "another")
+    assert session == {"key": "another"}
+    assert session_write_stats.performed == 2
+    assert session_write_stats.avoided == 1
+
+
+def test_pop_session_value_and_clear_session() -> None:
+    session: dict[str, object] = {"key": "value"}
+    assert pop_session_value(session, "key")
+    assert not pop_session_value(session, "key")
+    assert not clear_session(session)
+
+    session["key"] = "value"
+    assert clear_session(session)
+    assert session == {}
+
+
+async def test_login_does_not_rewrite_unchanged_session() -> None:
+    user = UserWithSessionHash(username="root", password="password")
+    conn = HTTPConnection({"type": "http", "session": {}})
+    await login(conn, user, secret_key="key!")
+    assert session_write_stats.performed == 3
+
+    await login(conn, user, secret_key="key!")
+    assert session_write_stats.performed == 3
+    assert session_write_stats.avoided == 2
+
+    update_session_auth_hash(conn, user, "key!")
+    assert session_write_stats.performed == 3
+
+
+async def test_confirm_login_and_logout_avoid_writes(user: User) -> None:
+    conn = HTTPConnection(
+        {
+            "type": "http",
+            "session": {SESSION_KEY: user.identity, SESSION_HASH: ""},
+            "user": user,
+            "auth": AuthCredentials([LoginScopes.REMEMBERED]),
+        }
+    )
+    confirm_login(conn)
+    assert session_write_stats.performed == 1  # only the time of the fresh login
+
+    await logout(conn)
+    await logout(conn)
+    assert session_write_stats.performed == 2
+    assert session_write_stats.avoided == 2
+
+
+def test_repeated_login_does_not_send_cookie() -> None:
+    async def app(scope: Scope, receive: Receive, send: Send) -> None:
+        request = Request(scope, receive, send)
+        await login(request, User(username="root"), secret_key="key!")
+        await Response("ok")(scope, receive, send)
+
+    client = TestClient(SessionMiddleware(app, secret_key="key!"))
+    assert "set-cookie" in client.get("/").headers
+    assert "set-cookie" not in client.get("/").headers
+
+
+def _auth_data(session: typing.Mapping[str, typing.Any]) -> dict[str, typing.Any]:
+    return {key: value for key, value in session.items() if key != SESSION_LOGIN_AT}
+
+
+async def test_login_stores_compact_session() -> None:
+    user = UserWithSessionHash(username="root", password="password")
+    conn = HTTPConnection({"type": "http", "session": {SESSION_KEY: "root", SESSION_HASH: "stale"}})
+    await login(conn, user, secret_key="key!", compact_session=True)
+
+    digest = compact_digest(user.get_session_auth_hash("key!"))
+    assert _auth_data(conn.session) == {SESSION_COMPACT: f"1.{digest}.root"}
+    assert read_session_auth(conn.session) == ("root", digest)
+    assert validate_session_auth_hash(conn, user.get_session_auth_hash("key!"))
+
+    # the format is kept by other helpers
+    confirm_login(conn)
+    update_session_auth_hash(conn, user, "key!")
+    assert _auth_data(conn.session) == {SESSION_COMPACT: f"1.{digest}.root"}
+
+    user.password = "changed"
+    update_session_auth_hash(conn, user, "key!")
+    assert _auth_data(conn.session) == {SESSION_COMPACT: f"1.{compact_digest(user.get_session_auth_hash('key!'))}.root"}
+
+    # login without the flag keeps the format, the flag converts the session back
+    await login(conn, user, secret_key="key!")
+    assert _auth_data(conn.session) == {SESSION_COMPACT: f"1.{compact_digest(user.get_session_auth_hash('key!'))}.root"}
+    await login(conn, user, secret_key="key!", compact_session=False)
+    assert _auth_data(conn.session) == {SESSION_KEY: "root", SESSION_HASH: user.get_session_auth_hash("key!")}
+
+
+@dataclasses.dataclass
+class UserWithCustomSessionHash(UserWithSessionHash):
+    def get_session_auth_hash(self, secret_key: str) -> str:
+        return "custom:" + self.password * 20
+
+
+async def test_login_stores_compact_session_for_non_hex_hash() -> None:
+    user = UserWithCustomSessionHash(username="root", password="password")
+    conn = HTTPConnection({"type": "http", "session": {}})
+    await login(conn, user, secret_key="key!", compact_session=True)
+
+    digest = compact_digest(user.get_session_auth_hash("key!"))
+    assert len(digest) == 22
+    assert _auth_data(conn.session) == {SESSION_COMPACT: f"1.{digest}.root"}
+    assert validate_session_auth_hash(conn, user.get_session_auth_hash("key!"))
+
+    backend = SessionBackend(mock.AsyncMock(return_value=user), secret_key="key!", compact_session=True)
+    assert await backend.authenticate(conn)
+    user.password = "changed"
+    assert not await backend.authenticate(conn)
+
+
+async def test_session_backend_migrates_sessions_to_compact_format() -> None:
+    user = UserWithSessionHash(username="root", password="password")
+    backend = SessionBackend(mock.AsyncMock(return_value=user), secret_key="key!", compact_session=True)
+    session_auth_hash = user.get_session_auth_hash("key!")
+    conn = HTTPConnection({"type": "http", "session": {SESSION_KEY: "root", SESSION_HASH: session_auth_hash}})
+    assert await backend.authenticate(conn)
+    assert conn.session == {SESSION_COMPACT: f"1.{compact_digest(session_auth_hash)}.root"}
+    assert await backend.authenticate(conn)
+
+    # invalid sessions are not migrated
+    conn = HTTPConnection({"type": "http", "session": {SESSION_KEY: "root", SESSION_HASH: "bad"}})
+    assert not await backend.authenticate(conn)
+    assert SESSION_COMPACT not in conn.session
+
+    user.password = "changed"
+    conn = HTTPConnection({"type": "http", "session": {SESSION_COMPACT: f"1.{compact_digest(session_auth_hash)}.root"}})
+    assert not await backend.authenticate(conn)
+
+    # unknown format versions are ignored
+    conn = HTTPConnection({"type": "http", "session": {SESSION_COMPACT: "9.hash.root"}})
+    assert not await backend.authenticate(conn)
+
+
+def test_compact_session_is_smaller() -> None:
+    user = UserWithSessionHash(username="root", password="password")
+    legacy = {SESSION_KEY: "root", SESSION_HASH: user.get_session_auth_hash("key!")}
+    compact: dict[str, typing.Any] = {}
+    write_session_auth(compact, "root", legacy[SESSION_HASH], compact=True)
+    assert len(json.dumps(compact)) * 2 < len(json.dumps(legacy))
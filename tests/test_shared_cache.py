@@ -0,0 +1,137 @@
+import json
+import multiprocessing
+import pathlib
+from unittest import mock
+
+import pytest
+from starlette.authentication import BaseUser
+from starlette.requests import HTTPConnection
+
+from starlette_auth import SharedCachedUserLoader, SharedUserCache
+from tests.conftest import Clock, User
+
+
+def _dumps(user: BaseUser) -> bytes:
+    return json.dumps({"username": user.identity}).encode()
+
+
+def _loads(data: bytes) -> BaseUser:
+    return User(**json.loads(data))
+
+
+def _worker(path: str, action: str, key: str) -> bytes | None:
+    with SharedUserCache(path, slots=64, slot_size=256) as cache:
+        if action == "set":
+            cache.set(key, f"from {key}".encode(), 60)
+        elif action == "invalidate":
+            cache.invalidate(key)
+        return cache.get(key)
+
+
+def test_shared_user_cache_stores_values(tmp_path: pathlib.Path) -> None:
+    clock = Clock(1000.0)
+    with SharedUserCache(tmp_path / "cache", slots=64, slot_size=256, clock=clock) as cache:
+        assert cache.set("1", b"one", 10)
+        assert cache.set("2", b"two", 20)
+        assert cache.get("1") == b"one"
+        assert cache.get("3") is None
+        assert len(cache) == 2
+
+        assert cache.set("1", b"uno", 10)
+        assert cache.get("1") == b"uno"
+        assert len(cache) == 2
+
+        cache.invalidate("1")
+        assert cache.get("1") is None
+        assert cache.get("2") == b"two"
+
+        clock.now += 20
+        assert cache.get("2") is None
+        assert len(cache) == 0
+
+        assert not cache.set("big", b"x" * 256, 10)
+
+
+def test_shared_user_cache_clear_bumps_epoch(tmp_path: pathlib.Path) -> None:
+    with SharedUserCache(tmp_path / "cache", slots=64, slot_size=256) as cache:
+        cache.set("1", b"one", 10)
+        cache.clear()
+        assert cache.epoch == 1
+        assert cache.get("1") is None
+        assert cache.set("1", b"one", 10)
+        assert cache.get("1") == b"one"
+
+
+def test_shared_user_cache_replaces_entry_that_expires_first(tmp_path: pathlib.Path) -> None:
+    with SharedUserCache(tmp_path / "cache", slots=2, slot_size=128) as cache:
+        cache.set("1", b"one", 10)
+        cache.set("2", b"two", 20)
+        cache.set("3", b"three", 30)
+        assert cache.get("1") is None
+        assert cache.get("2") == b"two"
+        assert cache.get("3") == b"three"
+
+
+def test_shared_user_cache_rejects_incompatible_file(tmp_path: pathlib.Path) -> None:
+    SharedUserCache(tmp_path / "cache", slots=64, slot_size=256).close()
+    with pytest.raises(ValueError, match="incompatible layout"):
+        SharedUserCache(tmp_path / "cache", slots=32, slot_size=256)
+
+
+def test_shared_user_cache_is_shared_between_processes(tmp_path: pathlib.Path) -> None:
+    path = str(tmp_path / "cache")
+    with SharedUserCache(path, slots=64, slot_size=256) as cache:
+        with multiprocessing.get_context("spawn").Pool(2) as pool:
+            assert pool.apply(_worker, (path, "set", "child")) == b"from child"
+            assert cache.get("child") == b"from child"
+
+            cache.set("parent", b"from parent", 60)
+            assert pool.apply(_worker, (path, "get", "parent")) == b"from parent"
+
+            assert pool.apply(_worker, (path, "invalidate", "parent")) is None
+            assert cache.get("parent") is None
+
+
+async def test_shared_cached_user_loader(tmp_path: pathlib.Path) -> None:
+    user_loader = mock.AsyncMock(side_effect=lambda conn, user_id: User(username=user_id) if user_id != "0" else None)
+    conn = HTTPConnection({"type": "http"})
+    with SharedUserCache(tmp_path / "cache", slots=64, slot_size=256) as cache:
+        loader = SharedCachedUserLoader(user_loader, cache, dumps=_dumps, loads=_loads)
+        assert await loader(conn, "root") == User(username="root")
+        assert await loader(conn, "root") == User(username="root")
+        assert user_loader.call_count == 1
+
+        # another worker sees the cached user
+        other_cache = SharedUserCache(cache.path, slots=64, slot_size=256)
+        other = SharedCachedUserLoader(user_loader, other_cache, dumps=_dumps, loads=_loads)
+        assert await other(conn, "root") == User(username="root")
+        assert user_loader.call_count == 1
+
+        other.invalidate("root")
+        assert await loader(conn, "root") == User(username="root")
+        assert user_loader.call_count == 2
+
+        loader.clear()
+        assert await other(conn, "0") is None
+        assert await other(conn, "root") == User(username="root")
+        assert user_loader.call_count == 4
+        other_cache.close()
+
+
+async def test_shared_cached_user_loader_skips_users_invalidated_while_loading(tmp_path: pathlib.Path) -> None:
+    conn = HTTPConnection({"type": "http"})
+    with SharedUserCache(tmp_path / "cache", slots=64, slot_size=256) as cache:
+        other_cache = SharedUserCache(cache.path, slots=64, slot_size=256)
+
+        async def user_loader(conn: HTTPConnection, user_id: str) -> BaseUser | None:
+            other_cache.invalidate(user_id)  # another worker changes the user meanwhile
+            return User(username=user_id)
+
+        loader = SharedCachedUserLoader(user_loader, cache, dumps=_dumps, loads=_loads)
+        assert await loader(conn, "root") == User(username="root")
+        assert cache.get("root") is None
+
+        assert not cache.set("root", b"stale", 60, invalidations=cache.invalidations - 1)
+        assert cache.set("root", b"fresh", 60, invalidations=cache.invalidations)
+        assert cache.get("root") == b"fresh"
+        other_cache.close()
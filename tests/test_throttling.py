@@ -0,0 +1,87 @@
+import pytest
+from starlette.requests import HTTPConnection
+
+from starlette_auth import InMemoryThrottleBackend, login, LoginThrottle, TooManyAttempts
+from tests.conftest import Clock, User
+
+
+def _connection(address: str = "127.0.0.1") -> HTTPConnection:
+    return HTTPConnection({"type": "http", "client": (address, 1234), "session": {}})
+
+
+async def test_in_memory_backend_sliding_window() -> None:
+    clock = Clock()
+    backend = InMemoryThrottleBackend(clock=clock)
+    for _ in range(4):
+        await backend.hit("key", window=10)
+    assert (await backend.count("key", window=10))[0] == 4
+
+    clock.now = 15  # half of the previous window is still within the sliding window
+    assert (await backend.count("key", window=10))[0] == 2
+    await backend.hit("key", window=10)
+    assert (await backend.count("key", window=10))[0] == 3
+
+    clock.now = 100
+    assert (await backend.count("key", window=10))[0] == 0
+
+    await backend.reset("key")
+    assert await backend.count("key", window=10) == (0, 0)
+
+
+async def test_in_memory_backend_evicts_expired_keys() -> None:
+    clock = Clock()
+    backend = InMemoryThrottleBackend(shards=1, max_keys_per_shard=2, clock=clock)
+    await backend.hit("one", window=10)
+    await backend.hit("two", window=10)
+    clock.now = 30
+    await backend.hit("three", window=10)
+    assert list(backend._shards[0]) == ["three"]
+
+
+async def test_in_memory_backend_evicts_least_recently_hit_keys() -> None:
+    clock = Clock()
+    backend = InMemoryThrottleBackend(shards=1, max_keys_per_shard=3, clock=clock)
+    for key in ["one", "two", "three"]:
+        await backend.hit(key, window=10)
+    await backend.hit("one", window=10)
+
+    await backend.hit("four", window=10)
+    assert list(backend._shards[0]) == ["three", "one", "four"]
+    assert await backend.count("two", window=10) == (0.0, 0.0)
+
+
+async def test_login_throttle_limits_identity() -> None:
+    throttle = LoginThrottle(max_attempts=2, window=60)
+    conn = _connection()
+    await throttle.record_failure(conn, "root")
+    await throttle.check(conn, "root")
+    await throttle.record_failure(conn, "root")
+
+    assert not await throttle.is_allowed(conn, "root")
+    assert await throttle.is_allowed(conn, "admin")
+    with pytest.raises(TooManyAttempts) as ex:
+        await throttle.check(conn, "root")
+    assert 0 < ex.value.retry_after <= 60
+
+
+async def test_login_throttle_limits_address() -> None:
+    throttle = LoginThrottle(max_attempts=100, max_attempts_per_address=2)
+    await throttle.record_failure(_connection("10.0.0.1"), "one")
+    await throttle.record_failure(_connection("10.0.0.1"), "two")
+    assert not await throttle.is_allowed(_connection("10.0.0.1"), "three")
+    assert await throttle.is_allowed(_connection("10.0.0.2"), "three")
+
+
+async def test_login_checks_and_resets_throttle() -> None:
+    throttle = LoginThrottle(max_attempts=2)
+    conn = _connection()
+    await throttle.record_failure(conn, "root")
+    await login(conn, User(username="root"), secret_key="key!", throttle=throttle)
+    assert (await throttle.backend.count("identity:root", throttle.window))[0] == 0
+
+    await throttle.record_failure(conn, "root@example.com")
+    await throttle.record_failure(conn, "root@example.com")
+    with pytest.raises(TooManyAttempts):
+        await login(
+            conn, User(username="root"), secret_key="key!", throttle=throttle, throttle_identity="root@example.com"
+        )
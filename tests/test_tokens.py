@@ -0,0 +1,127 @@
+import time
+from unittest import mock
+
+from starlette.applications import Starlette
+from starlette.authentication import BaseUser
+from starlette.middleware import Middleware
+from starlette.middleware.authentication import AuthenticationMiddleware
+from starlette.middleware.sessions import SessionMiddleware
+from starlette.requests import HTTPConnection, Request
+from starlette.responses import PlainTextResponse, Response
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from starlette_auth import ensure_user, LazyUser, login, logout, set_token_cookie, SignedTokenBackend
+from starlette_auth.tokens import create_token, TOKEN_SCOPE_KEY
+from tests.conftest import User, UserWithSessionHash
+
+
+class UserWithScopes(UserWithSessionHash):
+    def get_scopes(self) -> list[str]:
+        return ["read"]
+
+
+def _connection(token: str, header: str = "Bearer") -> HTTPConnection:
+    return HTTPConnection({"type": "http", "headers": [(b"authorization", f"{header} {token}".encode())]})
+
+
+async def test_signed_token_backend_authenticates_without_loader() -> None:
+    user_loader = mock.AsyncMock()
+    backend = SignedTokenBackend(user_loader, secret_key="key!")
+    token = create_token(UserWithScopes(username="root", password="password"), "key!")
+
+    conn = _connection(token)
+    result = await backend.authenticate(conn)
+    assert result
+    credentials, user = result
+    assert credentials.scopes == ["read"]
+    assert isinstance(user, LazyUser)
+    assert user.identity == "root"
+    assert conn.scope[TOKEN_SCOPE_KEY] == token
+    user_loader.assert_not_called()
+
+
+async def test_signed_token_backend_loads_user_on_demand() -> None:
+    user = UserWithSessionHash(username="root", password="password")
+
+    async def user_loader(conn: HTTPConnection, user_id: str) -> BaseUser | None:
+        return user
+
+    backend = SignedTokenBackend(user_loader, secret_key="key!")
+    conn = _connection(create_token(user, "key!"))
+    conn.scope["auth"], conn.scope["user"] = await backend.authenticate(conn) or (None, None)
+    assert await ensure_user(conn) == user
+
+    # password change invalidates issued tokens
+    conn = _connection(create_token(user, "key!"))
+    conn.scope["auth"], conn.scope["user"] = await backend.authenticate(conn) or (None, None)
+    user.password = "changed"
+    assert not (await ensure_user(conn)).is_authenticated
+
+
+async def test_signed_token_backend_rejects_invalid_tokens() -> None:
+    backend = SignedTokenBackend(mock.AsyncMock(), secret_key="key!", max_age=10)
+    token = create_token(User(username="root"), "key!")
+
+    assert not await backend.authenticate(HTTPConnection({"type": "http", "headers": []}))
+    assert not await backend.authenticate(_connection("garbage"))
+    assert not await backend.authenticate(_connection(create_token(User(username="root"), "another key")))
+    assert not await backend.authenticate(_connection(token, header="Basic"))
+    bare_header = HTTPConnection({"type": "http", "headers": [(b"authorization", token.encode())]})
+    assert not await backend.authenticate(bare_header)
+    with mock.patch("time.time", return_value=time.time() + 60):
+        assert not await backend.authenticate(_connection(token))
+
+
+async def test_signed_token_backend_refreshes_old_tokens() -> None:
+    user = UserWithScopes(username="root", password="password")
+
+    async def user_loader(conn: HTTPConnection, user_id: str) -> BaseUser | None:
+        return user
+
+    backend = SignedTokenBackend(user_loader, secret_key="key!", refresh_after=10)
+    token = create_token(user, "key!")
+    with mock.patch("time.time", return_value=time.time() + 60):
+        conn = _connection(token)
+        result = await backend.authenticate(conn)
+    assert result
+    assert result[1] == user
+    assert conn.scope[TOKEN_SCOPE_KEY] != token
+
+    user.password = "changed"
+    with mock.patch("time.time", return_value=time.time() + 60):
+        assert not await backend.authenticate(_connection(token))
+
+
+def test_login_issues_and_logout_clears_token_cookie() -> None:
+    async def login_view(request: Request) -> Response:
+        await login(request, User(username="root"), secret_key="key!", issue_token=True)
+        response = PlainTextResponse("ok")
+        set_token_cookie(response, request, "token", secure=False)
+        return response
+
+    async def logout_view(request: Request) -> Response:
+        await logout(request)
+        response = PlainTextResponse("ok")
+        set_token_cookie(response, request, "token", secure=False)
+        return response
+
+    def profile_view(request: Request) -> Response:
+        return PlainTextResponse(request.user.identity if request.user.is_authenticated else "anonymous")
+
+    backend = SignedTokenBackend(mock.AsyncMock(), secret_key="key!", cookie_name="token")
+    app = Starlette(
+        routes=[Route("/login", login_view), Route("/logout", logout_view), Route("/profile", profile_view)],
+        middleware=[
+            Middleware(SessionMiddleware, secret_key="key!"),
+            Middleware(AuthenticationMiddleware, backend=backend),
+        ],
+    )
+    client = TestClient(app)
+    client.get("/login")
+    assert client.cookies.get("token")
+    assert client.get("/profile").text == "root"
+
+    client.get("/logout")
+    assert not client.cookies.get("token")
+    assert client.get("/profile").text == "anonymous"
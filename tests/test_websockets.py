@@ -0,0 +1,144 @@
+import asyncio
+
+from starlette.authentication import BaseUser
+from starlette.requests import HTTPConnection
+from starlette.status import WS_1008_POLICY_VIOLATION
+from starlette.types import Message
+from starlette.websockets import WebSocket, WebSocketState
+
+from starlette_auth import SessionBackend, WebSocketRevalidator
+from starlette_auth.authentication import SESSION_HASH, SESSION_KEY
+from tests.conftest import User, UserWithSessionHash
+
+users: dict[str, BaseUser] = {}
+
+
+async def user_loader(conn: HTTPConnection, user_id: str) -> BaseUser | None:
+    return users.get(user_id)
+
+
+async def _websocket(user: UserWithSessionHash) -> tuple[WebSocket, list[Message]]:
+    messages: list[Message] = []
+
+    async def receive() -> Message:
+        return {"type": "websocket.connect"}
+
+    async def send(message: Message) -> None:
+        messages.append(message)
+
+    scope = {
+        "type": "websocket",
+        "path": "/ws",
+        "headers": [],
+        "user": user,
+        "session": {SESSION_KEY: user.identity, SESSION_HASH: user.get_session_auth_hash("key!")},
+    }
+    websocket = WebSocket(scope, receive, send)
+    await websocket.accept()
+    return websocket, messages
+
+
+async def test_revalidator_closes_invalid_connections() -> None:
+    root = UserWithSessionHash(username="root", password="password")
+    admin = UserWithSessionHash(username="admin", password="password")
+    users.update(root=root, admin=admin)
+    revalidator = WebSocketRevalidator(SessionBackend(user_loader, secret_key="key!"), slots=1)
+    root_socket, root_messages = await _websocket(root)
+    admin_socket, admin_messages = await _websocket(admin)
+    revalidator.register(root_socket)
+    revalidator.register(admin_socket)
+    await revalidator.close()
+
+    await revalidator.tick()
+    assert len(revalidator) == 2
+
+    users["root"] = UserWithSessionHash(username="root", password="changed")
+    await revalidator.tick()
+    assert len(revalidator) == 1
+    assert root_messages[-1] == {"type": "websocket.close", "code": WS_1008_POLICY_VIOLATION, "reason": ""}
+    assert admin_messages[-1]["type"] == "websocket.accept"
+
+
+async def test_revalidator_spreads_connections_over_wheel() -> None:
+    user = UserWithSessionHash(username="root", password="password")
+    users["root"] = user
+    revalidator = WebSocketRevalidator(SessionBackend(user_loader, secret_key="key!"), slots=3)
+    first, _ = await _websocket(user)
+    revalidator.register(first)
+    await revalidator.tick()
+    second, _ = await _websocket(user)
+    revalidator.register(second)
+    await revalidator.close()
+
+    assert [len(bucket) for bucket in revalidator.wheel] == [1, 0, 1]
+    del users["root"]
+    await revalidator.tick()  # empty bucket
+    assert len(revalidator) == 2
+    await revalidator.tick()
+    assert len(revalidator) == 1
+    await revalidator.tick()
+    assert len(revalidator) == 0
+
+
+async def test_revalidator_keeps_connections_on_backend_errors() -> None:
+    async def failing_loader(conn: HTTPConnection, user_id: str) -> BaseUser | None:
+        raise ConnectionError
+
+    revalidator = WebSocketRevalidator(SessionBackend(failing_loader, secret_key="key!"))
+    websocket, _ = await _websocket(UserWithSessionHash(username="root", password="password"))
+    assert await revalidator.revalidate(websocket)
+
+
+async def test_revalidator_forgets_disconnected_sockets() -> None:
+    revalidator = WebSocketRevalidator(SessionBackend(user_loader, secret_key="key!"))
+    websocket, _ = await _websocket(UserWithSessionHash(username="root", password="password"))
+    async with revalidator.watch(websocket):
+        assert len(revalidator) == 1
+        websocket.client_state = WebSocketState.DISCONNECTED
+        assert not await revalidator.revalidate(websocket)
+        assert len(revalidator) == 0
+    await revalidator.close()
+
+
+async def test_revalidator_runs_in_background() -> None:
+    users["root"] = User(username="root")
+    revalidator = WebSocketRevalidator(SessionBackend(user_loader, secret_key="key!"), interval=0.01, slots=2)
+    websocket, messages = await _websocket(UserWithSessionHash(username="root", password="password"))
+    revalidator.register(websocket)
+    del users["root"]
+    await asyncio.sleep(0.05)
+    assert messages[-1]["type"] == "websocket.close"
+    await revalidator.close()
+
+
+async def test_revalidator_survives_failing_close() -> None:
+    users.clear()
+    revalidator = WebSocketRevalidator(SessionBackend(user_loader, secret_key="key!"), interval=0.01, slots=1)
+    broken, _ = await _websocket(UserWithSessionHash(username="broken", password="password"))
+    working, messages = await _websocket(UserWithSessionHash(username="root", password="password"))
+
+    async def send(message: Message) -> None:
+        raise OSError("connection reset")
+
+    broken._send = send
+    assert not await revalidator.revalidate(broken)
+
+    revalidator.register(broken)
+    revalidator.register(working)
+    await asyncio.sleep(0.03)
+    assert len(revalidator) == 0
+    assert messages[-1]["type"] == "websocket.close"
+    await revalidator.close()
+
+
+async def test_revalidator_loads_users_of_lazy_backends() -> None:
+    user = UserWithSessionHash(username="root", password="password")
+    users["root"] = user
+    revalidator = WebSocketRevalidator(SessionBackend(user_loader, secret_key="key!", lazy=True))
+    websocket, messages = await _websocket(user)
+    assert await revalidator.revalidate(websocket)
+    assert websocket.scope["user"] == user
+
+    del users["root"]
+    assert not await revalidator.revalidate(websocket)
+    assert messages[-1] == {"type": "websocket.close", "code": WS_1008_POLICY_VIOLATION, "reason": ""}